@@ -0,0 +1,25 @@
+"""Micro-benchmarks for nsl.
+
+Each bench_*.py module may be run from the project root, e.g.:
+
+    python3 -m benchmarks.bench_inspect
+"""
+import timeit
+
+
+def run(label, func, *, number=100000, repeat=5):
+    """Print and return the best per-call time of func(), in seconds."""
+    timer = timeit.Timer(func)
+    best = min(timer.repeat(repeat, number)) / number
+    print('{:<70} {:>12.1f} ns'.format(label, best * 1e9))
+    return best
+
+
+def compare(label, baseline, other):
+    """Print how much faster "other" is than "baseline"."""
+    print('{:<70} {:>12.2f} x'.format(label, baseline / other))
+
+
+def throughput(label, seconds):
+    """Print the per-second rate for the given per-call time."""
+    print('{:<70} {:>12,.0f} /s'.format(label, 1 / seconds))
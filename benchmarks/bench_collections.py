@@ -0,0 +1,210 @@
+import pickle
+import tracemalloc
+
+from nsl.collections import as_namedtuple, clear_namedtuple_cache
+
+from . import run, compare, throughput
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+FIELDS = 'id name email created updated flags'
+
+
+def bench_as_namedtuple():
+    class Record:
+        pass
+
+    class RecordWithInit:
+        def __init__(self, *args, **kwargs):
+            pass
+
+    for cls in (Record, RecordWithInit):
+        name = cls.__name__
+
+        def cold():
+            clear_namedtuple_cache()
+            as_namedtuple(cls, FIELDS)
+        uncached = run('{}: as_namedtuple() (cold cache)'.format(name),
+                       cold, number=1000)
+        as_namedtuple(cls, FIELDS)
+        cached = run('{}: as_namedtuple() (warm cache)'.format(name),
+                     lambda: as_namedtuple(cls, FIELDS))
+        compare('{}: warm vs. cold'.format(name), uncached, cached)
+
+
+def bench_make_many():
+    count = 100000
+    rows = [(i, 'user{}'.format(i), 'user{}@example.com'.format(i),
+             1700000000 + i, 1700000000 + 2 * i, i % 8)
+            for i in range(count)]
+    print('{:<70} {:>12,}'.format('rows', count))
+
+    @as_namedtuple(FIELDS)
+    class Record:
+        pass
+
+    @as_namedtuple(FIELDS)
+    class RecordWithInit:
+        def __init__(self, *args):
+            pass
+
+    for cls in (Record, RecordWithInit):
+        name = cls.__name__
+        base = run('{}: [cls(*row) for row in rows]'.format(name),
+                   lambda: [cls(*row) for row in rows], number=5)
+        bulk = run('{}: cls._make_many(rows)'.format(name),
+                   lambda: cls._make_many(rows), number=5)
+        compare('{}: _make_many() vs. list comprehension'.format(name),
+                base, bulk)
+
+    records = Record._make_many(rows)
+    columns = Record._to_columns(records)
+    run('Record._to_columns(records)',
+        lambda: Record._to_columns(records), number=5)
+    run('Record._from_columns(**columns)',
+        lambda: Record._from_columns(**columns), number=5)
+    if numpy is not None:
+        array = Record._to_array(records)
+        run('Record._to_array(records)',
+            lambda: Record._to_array(records), number=5)
+        run('Record._from_array(array)',
+            lambda: Record._from_array(array), number=5)
+
+
+def _allocated(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def bench_table():
+    count = 1000000
+
+    @as_namedtuple('id created score flags name')
+    class Record:
+        pass
+
+    def rows():
+        return ((i, 1700000000 + i, i / 7, i % 8, 'name')
+                for i in range(count))
+    records, records_size = _allocated(lambda: Record._make_many(rows()))
+    table, table_size = _allocated(lambda: Record.Table(rows()))
+    print('{:<70} {:>12,}'.format('records', count))
+    print('{:<70} {:>12,} B'.format('list of records', records_size))
+    print('{:<70} {:>12,} B'.format('Record.Table', table_size))
+    compare('Record.Table vs. list of records (memory)',
+            records_size, table_size)
+
+    base = run('iterate over list of records',
+               lambda: sum(1 for _ in records), number=3)
+    itertable = run('iterate over Record.Table',
+                    lambda: sum(1 for _ in table), number=3)
+    compare('Record.Table vs. list of records (iteration)', base, itertable)
+
+    base = run('sum(r.score for r in records)',
+               lambda: sum(r.score for r in records), number=3)
+    column = run('sum(table.column("score"))',
+                 lambda: sum(table.column('score')), number=3)
+    compare('column() vs. list of records (one field)', base, column)
+
+
+def bench_options():
+    # A Python __new__() filling in defaults and converting/checking
+    # values, as was needed before as_namedtuple() had options.
+    @as_namedtuple('id name score flags')
+    class Handwritten:
+        def __new__(cls, id, name, score, flags=0):
+            score = float(score)
+            if not isinstance(name, str):
+                raise TypeError('name must be str')
+            return super().__new__(cls, id, name, score, flags)
+
+    @as_namedtuple('id name score flags')
+    class Plain:
+        pass
+
+    @as_namedtuple('id name score flags', defaults={'flags': 0})
+    class Defaults:
+        pass
+
+    @as_namedtuple('id name score flags', defaults={'flags': 0},
+                   converters={'score': float}, types={'name': str},
+                   validate=True)
+    class Validated:
+        pass
+
+    @as_namedtuple('id name score flags', defaults={'flags': 0},
+                   converters={'score': float}, types={'name': str},
+                   validate=False)
+    class Unvalidated:
+        pass
+
+    base = run('Python __new__() (defaults, convert, check)',
+               lambda: Handwritten(1, 'spam', 1.5))
+    run('no options, all args', lambda: Plain(1, 'spam', 1.5, 0))
+    run('defaults=', lambda: Defaults(1, 'spam', 1.5))
+    validated = run('defaults=, converters=, types=, validate=True',
+                    lambda: Validated(1, 'spam', 1.5))
+    unvalidated = run('defaults=, converters=, types=, validate=False',
+                      lambda: Unvalidated(1, 'spam', 1.5))
+    compare('validate=True vs. Python __new__()', base, validated)
+    compare('validate=False vs. Python __new__()', base, unvalidated)
+
+
+@as_namedtuple('id created score flags',
+               types={'id': int, 'created': int, 'score': float,
+                      'flags': int})
+class Measurement:
+    pass
+
+
+def bench_serialization():
+    count = 100000
+    records = [Measurement(i, 1700000000 + i, i / 7, i % 8)
+               for i in range(count)]
+    codec = Measurement._codec(flags='B')
+    proto = pickle.HIGHEST_PROTOCOL
+    pickled = pickle.dumps(records, proto)
+    packed = codec.pack_many(records)
+    print('{:<70} {:>12,}'.format('records', count))
+    print('{:<70} {:>12,} B'.format('pickle payload', len(pickled)))
+    print('{:<70} {:>12,} B'.format(
+        'pickle payload (plain tuples)',
+        len(pickle.dumps([tuple(r) for r in records], proto))))
+    print('{:<70} {:>12,} B'.format('pack_many() payload', len(packed)))
+    compare('pack_many() vs. pickle (size)', len(pickled), len(packed))
+
+    dumps = run('pickle.dumps(records)',
+                lambda: pickle.dumps(records, proto), number=5)
+    pack = run('codec.pack_many(records)',
+               lambda: codec.pack_many(records), number=5)
+    buffer = bytearray(len(packed))
+    pack_into = run('codec.pack_many(records, buffer)',
+                    lambda: codec.pack_many(records, buffer), number=5)
+    loads = run('pickle.loads(data)',
+                lambda: pickle.loads(pickled), number=5)
+    unpack = run('codec.unpack_many(memoryview(data))',
+                 lambda: codec.unpack_many(memoryview(packed)), number=5)
+    throughput('pickle.dumps() records', dumps / count)
+    throughput('pack_many() records', pack / count)
+    throughput('pickle.loads() records', loads / count)
+    throughput('unpack_many() records', unpack / count)
+    compare('pack_many() vs. pickle.dumps()', dumps, pack)
+    compare('pack_many(buffer) vs. pickle.dumps()', dumps, pack_into)
+    compare('unpack_many() vs. pickle.loads()', loads, unpack)
+
+
+if __name__ == '__main__':
+    bench_as_namedtuple()
+    bench_make_many()
+    bench_table()
+    bench_options()
+    bench_serialization()
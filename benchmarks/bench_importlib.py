@@ -0,0 +1,197 @@
+import os.path
+import sys
+import tempfile
+
+from nsl.importlib import (
+        load_from_source, CodeCache, load_many, lazy_load_from_source,
+        copy_module,
+        )
+
+from . import run, compare
+
+
+# A large module: lots of small functions and a big literal.
+FUNCTION = '''
+def func{0}(a, b=None, *args, **kwargs):
+    """Do thing {0}."""
+    if b is None:
+        b = [a] * {0}
+    return sum(b) + len(args) + len(kwargs)
+'''
+SOURCE = ''.join(FUNCTION.format(i) for i in range(2000)) + \
+    'DATA = {}\n'.format({str(i): list(range(10)) for i in range(500)})
+
+
+def bench_load_from_source():
+    with tempfile.TemporaryDirectory(prefix='bench_importlib_') as tmpdir:
+        filename = os.path.join(tmpdir, 'big.py')
+        with open(filename, 'w') as outfile:
+            outfile.write(SOURCE)
+        print('{:<70} {:>12,} B'.format('module source size', len(SOURCE)))
+
+        def compile_every_time():
+            dont_write = sys.dont_write_bytecode
+            sys.dont_write_bytecode = True
+            try:
+                load_from_source('big', coldfile, cache=False)
+            finally:
+                sys.dont_write_bytecode = dont_write
+        # This one never gets a __pycache__ entry.
+        coldfile = os.path.join(tmpdir, 'bigcold.py')
+        os.link(filename, coldfile)
+        cold = run('cold: compiled every time', compile_every_time,
+                   number=10)
+
+        # Make sure the .pyc gets written.
+        dont_write = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        try:
+            load_from_source('big', filename, cache=False)
+        finally:
+            sys.dont_write_bytecode = dont_write
+        pyc = run('cache=False (stdlib, from __pycache__)',
+                  lambda: load_from_source('big', filename, cache=False),
+                  number=10)
+
+        cache_dir = os.path.join(tmpdir, 'codecache')
+        CodeCache(cache_dir=cache_dir).get_code(filename)
+        disk = run('new CodeCache(cache_dir) (warm disk)',
+                   lambda: load_from_source(
+                       'big', filename, cache=CodeCache(cache_dir=cache_dir)),
+                   number=10)
+
+        cache = CodeCache()
+        cache.get_code(filename)
+        warm = run('warm in-memory CodeCache',
+                   lambda: load_from_source('big', filename, cache=cache),
+                   number=10)
+        compare('warm vs. cold', cold, warm)
+        compare('warm vs. __pycache__', pyc, warm)
+        compare('warm disk vs. cold', cold, disk)
+
+
+def bench_load_many():
+    # Many small plugin modules.
+    count = 200
+    with tempfile.TemporaryDirectory(prefix='bench_importlib_') as tmpdir:
+        specs = []
+        for i in range(count):
+            name = 'plugin{}'.format(i)
+            filename = os.path.join(tmpdir, name + '.py')
+            with open(filename, 'w') as outfile:
+                outfile.write(''.join(FUNCTION.format(j) for j in range(50)))
+            specs.append((name, filename))
+        print('{:<70} {:>12,}'.format('modules', count))
+
+        def one_at_a_time():
+            for name, filename in specs:
+                load_from_source(name, filename, cache=CodeCache())
+        serial = run('load_from_source() one at a time (cold)',
+                     one_at_a_time, number=1)
+        default = run('load_many() (cold)',
+                      lambda: load_many(specs, cache=CodeCache()), number=1)
+        threads = run('load_many() with 4 threads (cold)',
+                      lambda: load_many(specs, cache=CodeCache(), workers=4),
+                      number=1)
+        procs = run('load_many() with processes (cold)',
+                    lambda: load_many(specs, cache=CodeCache(),
+                                      processes=True),
+                    number=1)
+        cache = CodeCache(count)
+        load_many(specs, cache=cache)
+        warm = run('load_many() (warm cache)',
+                   lambda: load_many(specs, cache=cache), number=1)
+        print('{:<70} {:>12}'.format('CPUs', os.cpu_count()))
+        compare('load_many() vs. one at a time', serial, default)
+        compare('threads vs. one at a time', serial, threads)
+        compare('processes vs. one at a time', serial, procs)
+        compare('warm vs. one at a time', serial, warm)
+
+
+def bench_lazy_startup():
+    # A CLI that loads all its plugins at startup but uses only a few.
+    count = 200
+    used = 10
+    with tempfile.TemporaryDirectory(prefix='bench_importlib_') as tmpdir:
+        specs = []
+        for i in range(count):
+            name = 'plugin{}'.format(i)
+            filename = os.path.join(tmpdir, name + '.py')
+            with open(filename, 'w') as outfile:
+                outfile.write(''.join(FUNCTION.format(j) for j in range(50)))
+            specs.append((name, filename))
+        print('{:<70} {:>12,}'.format('modules (used)', count)
+              + ' ({})'.format(used))
+
+        def startup(load, cache):
+            modules = [load(name, filename, cache=cache)
+                       for name, filename in specs]
+            for module in modules[:used]:
+                module.func1(1)
+        for label, cache in [('cold', None), ('warm', CodeCache(count))]:
+            if cache is not None:
+                startup(load_from_source, cache)
+
+            def eager():
+                startup(load_from_source, cache or CodeCache())
+
+            def lazy():
+                startup(lazy_load_from_source, cache or CodeCache())
+            eager_time = run('eager load_from_source() ({})'.format(label),
+                             eager, number=1)
+            lazy_time = run('lazy_load_from_source() ({})'.format(label),
+                            lazy, number=1)
+            compare('lazy vs. eager ({})'.format(label),
+                    eager_time, lazy_time)
+
+
+# A module that does some real work at import time.
+SETUP_SOURCE = ''.join(FUNCTION.format(i) for i in range(200)) + \
+    'TABLE = {str(i): [j * j for j in range(20)] for i in range(5000)}\n'
+
+
+def bench_copy_module():
+    with tempfile.TemporaryDirectory(prefix='bench_importlib_') as tmpdir:
+        for name, source in [('bigcopy', SOURCE), ('setupcopy', SETUP_SOURCE)]:
+            with open(os.path.join(tmpdir, name + '.py'), 'w') as outfile:
+                outfile.write(source)
+        # Make sure the .pyc files get written.
+        dont_write = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        sys.path.insert(0, tmpdir)
+        try:
+            import bigcopy
+            import setupcopy
+        finally:
+            sys.dont_write_bytecode = dont_write
+            sys.path.remove(tmpdir)
+            sys.modules.pop('bigcopy', None)
+            sys.modules.pop('setupcopy', None)
+
+        for module, deep in [(bigcopy, 'DATA'), (setupcopy, 'TABLE')]:
+            name = module.__name__
+            reexec = run('{}: copy_module() (re-exec from __pycache__)'
+                         .format(name),
+                         lambda: copy_module(module), number=10)
+            code = run('{}: copy_module(clone="code")'.format(name),
+                       lambda: copy_module(module, clone='code'), number=10)
+            shallow = run('{}: copy_module(clone="namespace")'.format(name),
+                          lambda: copy_module(module, clone='namespace'),
+                          number=10)
+            deepcopied = run('{}: copy_module(clone="namespace", deep=[{!r}])'
+                             .format(name, deep),
+                             lambda: copy_module(module, clone='namespace',
+                                                 deep=[deep]),
+                             number=10)
+            compare('{}: clone="code" vs. re-exec'.format(name),
+                    reexec, code)
+            compare('{}: clone="namespace" vs. re-exec'.format(name),
+                    reexec, shallow)
+            compare('{}: clone="namespace" (deep) vs. re-exec'.format(name),
+                    reexec, deepcopied)
+
+if __name__ == '__main__':
+    bench_load_from_source()
+    bench_load_many()
+    bench_lazy_startup()
+    bench_copy_module()
@@ -0,0 +1,57 @@
+from nsl.inspect import get_caller_module, find_caller_module
+
+from . import run, compare
+
+
+DEPTHS = (1, 5, 20)
+MODULE = 'benchmarks._called'
+
+# "depth" nested calls, all in one module (like a logging wrapper),
+# the innermost of which asks for the (external) caller's module.
+SOURCE = """
+def lookup0(how, depth):
+    if how == 'depth':
+        return find_caller_module(depth)
+    elif how == 'skip':
+        return find_caller_module(skip_modules={{'{}'}})
+    else:
+        return get_caller_module()
+""".format(MODULE)
+NESTED = """
+def lookup{}(how, depth):
+    return lookup{}(how, depth)
+"""
+
+
+def _build_lookup(depth):
+    source = SOURCE
+    for i in range(1, depth):
+        source += NESTED.format(i, i - 1)
+    ns = {
+            '__name__': MODULE,
+            'get_caller_module': get_caller_module,
+            'find_caller_module': find_caller_module,
+            }
+    exec(source, ns)
+    return ns['lookup{}'.format(depth - 1)]
+
+
+def main():
+    for depth in DEPTHS:
+        lookup = _build_lookup(depth)
+        assert lookup(None, depth) == __name__
+        assert lookup('depth', depth) == __name__
+        assert lookup('skip', depth) == __name__
+
+        base = run('get_caller_module(), depth {}'.format(depth),
+                   lambda: lookup(None, depth))
+        direct = run('find_caller_module(depth), depth {}'.format(depth),
+                     lambda: lookup('depth', depth))
+        skip = run('find_caller_module(skip_modules), depth {}'.format(depth),
+                   lambda: lookup('skip', depth))
+        compare('direct speedup, depth {}'.format(depth), base, direct)
+        compare('skip speedup, depth {}'.format(depth), base, skip)
+
+
+if __name__ == '__main__':
+    main()
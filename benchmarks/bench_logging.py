@@ -0,0 +1,337 @@
+import gzip
+import io
+import json
+import logging
+import logging.handlers
+import os
+import os.path
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from nsl.logging import (
+        BufferedFileHandler, CompiledFormatter, JSONFormatter, LoggerProxy,
+        RateLimitFilter, RotatingFileHandler, encode_record, decode_record,
+        PerThreadHandler, RingBufferHandler, compile_loggers, instrument,
+        lazy, LazyAdapter,
+        )
+
+from . import run, compare, throughput
+
+
+def _record(msg='spam %s', *args):
+    return logging.LogRecord('spam', logging.INFO, __file__, 1,
+                             msg, args or (42,), None)
+
+
+def bench_file_handlers():
+    record = _record()
+    with tempfile.TemporaryDirectory(prefix='bench_logging_') as tmpdir:
+        plain = logging.FileHandler(os.path.join(tmpdir, 'plain.log'))
+        buffered = BufferedFileHandler(os.path.join(tmpdir, 'buffered.log'))
+        try:
+            base = run('FileHandler.handle()', lambda: plain.handle(record))
+            fast = run('BufferedFileHandler.handle()',
+                       lambda: buffered.handle(record))
+            compare('buffered speedup', base, fast)
+        finally:
+            plain.close()
+            buffered.close()
+
+
+FORMATS = [
+        ('%(message)s', '%'),
+        ('%(levelname)-8s %(name)s: %(message)s', '%'),
+        ('%(asctime)s %(levelname)-8s %(name)s: %(message)s', '%'),
+        ('{asctime} {levelname:<8} {name}: {message}', '{'),
+        ('$asctime $levelname $name: $message', '$'),
+        ]
+
+
+def bench_formatters():
+    record = _record()
+    for fmt, style in FORMATS:
+        plain = logging.Formatter(fmt, style=style)
+        compiled = CompiledFormatter(fmt, style=style)
+        assert compiled.format(record) == plain.format(record)
+        base = run('Formatter: {}'.format(fmt),
+                   lambda: plain.format(record))
+        fast = run('CompiledFormatter: {}'.format(fmt),
+                   lambda: compiled.format(record))
+        compare('compiled speedup', base, fast)
+
+
+class NaiveJSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        record.message = record.getMessage()
+        return json.dumps(dict(vars(record)), default=str)
+
+
+def bench_json():
+    stdlib = json.JSONEncoder(separators=(',', ':'), default=str).encode
+    formatters = [
+            ('json.dumps(record.__dict__)', NaiveJSONFormatter()),
+            ('JSONFormatter (json)', JSONFormatter(encode=stdlib)),
+            ('JSONFormatter (default encoder)', JSONFormatter()),
+            ]
+    for extra in ({}, {'user': 'spam', 'request': 12345}):
+        record = _record()
+        vars(record).update(extra)
+        for name, formatter in formatters:
+            label = '{}, {} extra'.format(name, len(extra))
+            throughput(label, run(label, lambda: formatter.format(record)))
+
+
+def bench_disabled_calls():
+    logger = logging.getLogger('benchmarks.disabled')
+    logger.setLevel(logging.INFO)
+    proxy = LoggerProxy(logger)
+
+    def guarded():
+        if proxy.is_debug:
+            proxy.debug('spam %s', 42)
+
+    base = run('disabled Logger.debug()',
+               lambda: logger.debug('spam %s', 42), number=1000000)
+    run('disabled Logger.isEnabledFor(DEBUG)',
+        lambda: logger.isEnabledFor(logging.DEBUG), number=1000000)
+    fast = run('disabled LoggerProxy.debug()',
+               lambda: proxy.debug('spam %s', 42), number=1000000)
+    guard = run('disabled "if proxy.is_debug: ..."', guarded,
+                number=1000000)
+    noop = run('(baseline) empty lambda', lambda: None, number=1000000)
+    compare('proxy speedup', base - noop, fast - noop)
+    compare('guard speedup', base - noop, guard - noop)
+
+
+def bench_filters():
+    record = _record()
+    stream = io.StringIO()
+    plain = logging.StreamHandler(stream)
+    limited = logging.StreamHandler(stream)
+    limited.addFilter(RateLimitFilter(rate=10, burst=10))
+
+    def handle(handler):
+        handler.handle(record)
+        stream.seek(0)
+        stream.truncate()
+    base = run('repeated record, no filter', lambda: handle(plain))
+    fast = run('repeated record, RateLimitFilter', lambda: handle(limited))
+    compare('rate limit speedup', base, fast)
+
+
+def bench_codec():
+    record = _record()
+    encoded = encode_record(record)
+    # This is roughly what logging.handlers.SocketHandler sends.
+    pickled = pickle.dumps(dict(vars(record), args=None, msg='spam 42'))
+    print('{:<70} {:>12} B'.format('pickled record size', len(pickled)))
+    print('{:<70} {:>12} B'.format('encoded record size', len(encoded)))
+    run('pickle.dumps()', lambda: pickle.dumps(
+        dict(vars(record), args=None, msg=record.getMessage())))
+    run('encode_record()', lambda: encode_record(record))
+    run('pickle.loads() + makeLogRecord()',
+        lambda: logging.makeLogRecord(pickle.loads(pickled)))
+    run('decode_record()', lambda: decode_record(encoded))
+
+
+def bench_metrics():
+    record = _record()
+    stream = io.StringIO()
+    plain = logging.StreamHandler(stream)
+    instrumented = logging.StreamHandler(stream)
+    instrument(instrumented, 'bench')
+
+    def handle(handler):
+        handler.handle(record)
+        stream.seek(0)
+        stream.truncate()
+    base = run('StreamHandler.handle()', lambda: handle(plain))
+    slow = run('StreamHandler.handle(), instrumented',
+               lambda: handle(instrumented))
+    print('{:<70} {:>12.1f} ns'.format('instrumentation overhead',
+                                       (slow - base) * 1e9))
+
+
+def _log_from_threads(handler, nthreads, total):
+    record = _record()
+    count = total // nthreads
+    ready = threading.Barrier(nthreads + 1)
+
+    def log():
+        ready.wait()
+        for _ in range(count):
+            handler.handle(record)
+    threads = [threading.Thread(target=log) for _ in range(nthreads)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    logged = time.perf_counter() - start
+    handler.flush()
+    return logged / (count * nthreads), (time.perf_counter() - start)
+
+
+def bench_contention():
+    total = 64000
+    with open(os.devnull, 'w') as devnull:
+        for nthreads in (1, 8, 32, 64):
+            plain = logging.StreamHandler(devnull)
+            per_thread = PerThreadHandler(logging.StreamHandler(devnull))
+            try:
+                base, _ = _log_from_threads(plain, nthreads, total)
+                fast, drained = _log_from_threads(per_thread, nthreads, total)
+            finally:
+                per_thread.close()
+            throughput('{} threads, StreamHandler'.format(nthreads), base)
+            throughput('{} threads, PerThreadHandler'.format(nthreads),
+                       fast)
+            throughput('{} threads, PerThreadHandler incl. drain'
+                       .format(nthreads), drained / total)
+            compare('{} threads, per-thread speedup (logging threads)'
+                    .format(nthreads), base, fast)
+
+
+def bench_configure():
+    names = ['benchmarks.configure.mod{}'.format(i) for i in range(500)]
+    for name in names:
+        logging.getLogger(name)
+    handler = logging.NullHandler()
+
+    def one_at_a_time():
+        for name in names:
+            logger = logging.getLogger(name)
+            logger.setLevel(logging.INFO)
+            for old in list(logger.handlers):
+                logger.removeHandler(old)
+            logger.addHandler(handler)
+    config = {name: {'level': logging.INFO, 'handlers': [handler]}
+              for name in names}
+    compiled = compile_loggers(config)
+    base = run('500 loggers, setLevel() + addHandler() each',
+               one_at_a_time, number=20)
+    run('500 loggers, compile_loggers()',
+        lambda: compile_loggers(config), number=20)
+    fast = run('500 loggers, LoggerConfig.apply()', compiled.apply,
+               number=20)
+    compare('bulk apply speedup', base, fast)
+
+
+def bench_ring():
+    record = _record()
+    with tempfile.TemporaryDirectory(prefix='bench_logging_') as tmpdir:
+        plain = logging.FileHandler(os.path.join(tmpdir, 'plain.log'))
+        binary = RingBufferHandler(os.path.join(tmpdir, 'binary.ring'),
+                                   1024 * 1024)
+        text = RingBufferHandler(os.path.join(tmpdir, 'text.ring'),
+                                 1024 * 1024, binary=False)
+        try:
+            base = run('FileHandler.handle()', lambda: plain.handle(record))
+            fast = run('RingBufferHandler.handle() (binary)',
+                       lambda: binary.handle(record))
+            compare('ring speedup', base, fast)
+            fast = run('RingBufferHandler.handle() (text)',
+                       lambda: text.handle(record))
+            compare('ring speedup', base, fast)
+        finally:
+            for handler in (plain, binary, text):
+                handler.close()
+
+
+def bench_lazy():
+    # The logger lets DEBUG through but the handler only wants INFO,
+    # so the records get created and then dropped by the handler.
+    logger = logging.Logger('benchmarks.lazy', logging.DEBUG)
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    adapter = LazyAdapter(logger)
+    state = {str(i): list(range(20)) for i in range(50)}
+
+    base = run('filtered: logger.debug(msg, repr(state))',
+               lambda: logger.debug('state: %s', repr(state)),
+               number=10000)
+    fast = run('filtered: logger.debug(msg, lazy(repr, state))',
+               lambda: logger.debug('state: %s', lazy(repr, state)),
+               number=10000)
+    compare('lazy speedup', base, fast)
+    fast = run('filtered: adapter.debug(msg, lambda: repr(state))',
+               lambda: adapter.debug('state: %s', lambda: repr(state)),
+               number=10000)
+    compare('adapter speedup', base, fast)
+
+
+def _gzip_rotator(source, dest):
+    # The logging cookbook's way to compress with RotatingFileHandler.
+    with open(source, 'rb') as infile, gzip.open(dest + '.gz', 'wb') as out:
+        shutil.copyfileobj(infile, out)
+    os.remove(source)
+
+
+def _worst_latency(handler, record, count):
+    worst = total = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        handler.handle(record)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        worst = max(worst, elapsed)
+    return worst, total / count
+
+
+def bench_rotation():
+    record = _record('spam %s', 'x' * 1000)
+    maxbytes = 16 * 1024 * 1024
+    count = maxbytes // 1000 * 3
+    with tempfile.TemporaryDirectory(prefix='bench_logging_') as tmpdir:
+        stdlib = logging.handlers.RotatingFileHandler(
+                os.path.join(tmpdir, 'stdlib.log'),
+                maxBytes=maxbytes, backupCount=5)
+        stdlib.rotator = _gzip_rotator
+        ours = RotatingFileHandler(os.path.join(tmpdir, 'ours.log'),
+                                   maxbytes=maxbytes, compress='gzip')
+        for name, handler in [('logging.handlers.RotatingFileHandler + gzip',
+                               stdlib),
+                              ('RotatingFileHandler', ours)]:
+            try:
+                worst, mean = _worst_latency(handler, record, count)
+            finally:
+                handler.close()
+            print('{:<70} {:>12.1f} us'.format(
+                '{}, mean handle()'.format(name), mean * 1e6))
+            print('{:<70} {:>12.1f} ms'.format(
+                '{}, worst handle() (rollover)'.format(name), worst * 1e3))
+
+
+BENCHMARKS = [
+        bench_file_handlers,
+        bench_formatters,
+        bench_json,
+        bench_disabled_calls,
+        bench_filters,
+        bench_codec,
+        bench_metrics,
+        bench_contention,
+        bench_configure,
+        bench_ring,
+        bench_lazy,
+        bench_rotation,
+        ]
+
+
+def main(names=None):
+    for bench in BENCHMARKS:
+        if names and bench.__name__[len('bench_'):] not in names:
+            continue
+        print('# {}'.format(bench.__name__))
+        bench()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
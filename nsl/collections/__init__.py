@@ -1,2 +1,3 @@
-
-from ._ns import as_namedtuple  # noqa: F401
+from ._ns import as_namedtuple, clear_namedtuple_cache  # noqa: F401
+from ._struct import RecordCodec  # noqa: F401
+from ._table import RecordTable  # noqa: F401
@@ -1,15 +1,17 @@
 from collections import namedtuple
+import copyreg
 import functools
+from itertools import repeat, starmap
+
+from ._struct import _codec
+from ._table import _TableType
 
 
 #################################################
 # record types
 
-# XXX Add as_namedtuple() keyword args (for defaults).
 # XXX Add nt.as_subclass() classmethod.
-# XXX Add nt.with_defaults() classmethod.
 # XXX Support using as_namedtuple() with classes that have base classes.
-# XXX Ensure pickling works right.
 # XXX Add Namedtuple abstract base class.
 
 def _update_wrapper_ns(ns, wrapped):
@@ -21,28 +23,119 @@ def _update_wrapper_ns(ns, wrapped):
             pass
 
 
-def as_namedtuple(cls, fields=None):
-    """Turn a class into a namedtuple subclass."""
+NAMEDTUPLE_CACHE_SIZE = 256
+
+
+def as_namedtuple(cls, fields=None, *, defaults=None, converters=None,
+                  types=None, validate=None):
+    """Turn a class into a namedtuple subclass.
+
+    "defaults" is a mapping of field names to default values (or a
+    sequence of them, as for namedtuple()).  Only the last fields may
+    have defaults.
+
+    "converters" maps field names to functions that are called with
+    the value passed for the field, e.g. float, and the result is
+    stored instead.  "types" maps field names to a type (or tuple of
+    types) that the value must be an instance of, else TypeError is
+    raised.  That check is only done if "validate" is true, which by
+    default it is unless Python was run with -O.  Neither is applied to
+    a default value that isn't passed.
+
+    The converters and checks are compiled into the generated __new__(),
+    so creating a record is still a single call.
+
+    The same subclass is returned for the same class, fields (in any
+    form namedtuple() accepts) and options, up to NAMEDTUPLE_CACHE_SIZE
+    of the most recently used ones.
+    """
     if fields is None:
         # used as a class decorator
         fields = cls
-        return lambda cls: as_namedtuple(cls, fields)
+        return lambda cls: as_namedtuple(
+                cls, fields, defaults=defaults, converters=converters,
+                types=types, validate=validate)
 
     if not isinstance(cls, type):
         raise ValueError('expected a class, got {!r}'.format(cls))
 
+    # Normalize the fields the same way namedtuple() does.
+    if isinstance(fields, str):
+        fields = fields.replace(',', ' ').split()
+    fields = tuple(map(str, fields))
+
+    # Normalize the options.
+    defaults = _normalize_defaults(fields, defaults)
+    converters = _normalize_fieldmap(fields, converters, 'converters')
+    types = _normalize_fieldmap(fields, types, 'types')
+    if validate is None:
+        validate = __debug__
+    # Equal defaults of different types (e.g. 0, 0.0 and False) must
+    # not share a class, so their types are part of the key.
+    key = (cls, fields, defaults, tuple(map(type, defaults)),
+           converters, types, bool(validate))
+    try:
+        hash(key)
+    except TypeError:
+        # Some of the defaults can't be cached.
+        return _as_namedtuple.__wrapped__(*key)
+    return _as_namedtuple(*key)
+
+
+def clear_namedtuple_cache():
+    """Forget the classes built by as_namedtuple()."""
+    _as_namedtuple.cache_clear()
+
+
+def _normalize_defaults(fields, defaults):
+    if not defaults:
+        return ()
+    if not hasattr(defaults, 'items'):
+        defaults = tuple(defaults)
+        if len(defaults) > len(fields):
+            raise TypeError('got more default values than fields')
+        return defaults
+    unknown = [f for f in defaults if f not in fields]
+    if unknown:
+        raise ValueError('defaults for unknown fields {}'.format(unknown))
+    first = len(fields) - len(defaults)
+    if any(f not in defaults for f in fields[first:]):
+        raise ValueError('only the last fields may have defaults')
+    return tuple(defaults[f] for f in fields[first:])
+
+
+def _normalize_fieldmap(fields, mapping, kind):
+    if not mapping:
+        return ()
+    unknown = [f for f in mapping if f not in fields]
+    if unknown:
+        raise ValueError('{} for unknown fields {}'.format(kind, unknown))
+    return tuple((f, mapping[f]) for f in fields if f in mapping)
+
+
+@functools.lru_cache(NAMEDTUPLE_CACHE_SIZE)
+def _as_namedtuple(cls, fields, defaults, _defaulttypes, converters, types,
+                   validate):
     name = cls.__name__
 
     # Build the base classes for the subclass.
-    nt = namedtuple(name, fields)
+    nt = namedtuple(name, fields, defaults=defaults)
     base = nt
-    if cls.__init__ is not object.__init__:
-        # Ensure that cls.__init__ is called in sub._make() and sub._replace().
+    checks = converters or (types if validate else ())
+    if cls.__init__ is not object.__init__ or checks:
+        # Ensure that cls.__init__ (and the checks) is called in
+        # sub._make() and sub._replace().
         _make = functools.wraps(nt._make)(lambda c, it: c(*it))
         basens = {
                 '__slots__': (),
                 '_make': classmethod(_make),
                 }
+        if checks:
+            __new__ = _build_new(
+                    nt, defaults, converters, types if validate else ())
+            basens['__new__'] = __new__
+            if any(type(d) is _Missing for d in __new__.__defaults__ or ()):
+                basens['_replace'] = _build_replace(nt, __new__.__defaults__)
         _update_wrapper_ns(basens, nt)
         base = type(name, (base,), basens)
     bases = (cls, base)
@@ -51,14 +144,252 @@ def as_namedtuple(cls, fields=None):
     ns = {
             '__wraps__': cls,
             '__namedtuple__': nt,
+            '__validate__': validate,
+            '_field_converters': dict(converters),
+            '_field_types': dict(types),
             }
     if vars(cls).get('__slots__') is not None:
         ns['__slots__'] = ()
     _update_wrapper_ns(ns, cls)
     if cls.__doc__ is None:
         ns['__doc__'] = nt.__doc__
+    for attr, method in _BULK_METHODS.items():
+        if not hasattr(cls, attr):
+            ns[attr] = method
+    if not hasattr(cls, '_with_defaults'):
+        ns['_with_defaults'] = classmethod(_with_defaults)
+    if not hasattr(cls, '_codec'):
+        ns['_codec'] = classmethod(_codec)
+    if cls.__reduce__ is object.__reduce__ and \
+            cls.__reduce_ex__ is object.__reduce_ex__:
+        ns['__reduce__'] = _reduce
+    if 'Table' not in fields and not hasattr(cls, 'Table'):
+        ns['Table'] = _TableType()
 
     # Build the subclass.
     sub = type(name, bases, ns)
 
     return sub
+
+
+def _reduce(self):
+    cls = type(self)
+    if cls._field_converters or (cls.__validate__ and cls._field_types):
+        # Don't convert (or check) the values again when unpickling.
+        rv = (tuple.__new__, (cls, tuple(self)))
+    else:
+        # This is pickled the same as the default (the class, memoized,
+        # and the values), which is as small as it gets, but without
+        # the overhead of calling __getnewargs__() through copyreg.
+        rv = (copyreg.__newobj__, (cls, *self))
+    state = getattr(self, '__dict__', None)
+    return rv + (state,) if state else rv
+
+
+def _with_defaults(cls, **defaults):
+    """Return a copy of the record type with the given defaults added.
+
+    The other options are kept.  Like any defaults, they must be for
+    the last fields.
+    """
+    defaults = dict(cls._field_defaults, **defaults)
+    return as_namedtuple(cls.__wraps__, cls._fields, defaults=defaults,
+                         converters=cls._field_converters,
+                         types=cls._field_types, validate=cls.__validate__)
+
+
+def _build_new(nt, defaults, converters, types):
+    # Generate a __new__() like the one namedtuple() does, but with the
+    # converters and type checks inlined.
+    fields = nt._fields
+    first_default = len(fields) - len(defaults)
+    ns = {
+            '_tuple_new': tuple.__new__,
+            '_invalid': _invalid,
+            }
+    checks = {}
+    for field, converter in converters:
+        ns['_convert_' + field] = converter
+        checks.setdefault(field, []).append(
+                '{0} = _convert_{0}({0})'.format(field))
+    for field, type_ in types:
+        ns['_type_' + field] = type_
+        checks.setdefault(field, []).extend([
+                'if not isinstance({0}, _type_{0}):'.format(field),
+                "    _invalid(_cls, '{0}', {0}, _type_{0})".format(field),
+                ])
+    lines = []
+    newdefaults = list(defaults)
+    for index, field in enumerate(fields):
+        if field not in checks:
+            continue
+        if index < first_default:
+            lines.extend('    ' + line for line in checks[field])
+            continue
+        # A passed value is always checked, even if it is the default,
+        # so a sentinel tells whether it was passed.
+        default = defaults[index - first_default]
+        ns['_default_' + field] = default
+        ns['_missing_' + field] = newdefaults[index - first_default] = \
+            _Missing(default)
+        lines.append('    if {0} is _missing_{0}:'.format(field))
+        lines.append('        {0} = _default_{0}'.format(field))
+        lines.append('    else:')
+        lines.extend('        ' + line for line in checks[field])
+    source = 'def __new__(_cls, {0}):\n{1}\n' \
+             '    return _tuple_new(_cls, ({0},))\n'.format(
+                     ', '.join(fields), '\n'.join(lines))
+    exec(source, ns)
+    __new__ = ns['__new__']
+    __new__.__defaults__ = tuple(newdefaults) or None
+    __new__.__qualname__ = '{}.__new__'.format(nt.__name__)
+    __new__.__doc__ = nt.__new__.__doc__
+    return __new__
+
+
+def _build_replace(nt, newdefaults):
+    # Fields that still have their default (not converted or checked)
+    # and aren't being replaced are passed to __new__() as not given,
+    # so they don't get converted or checked now either.
+    fields = nt._fields
+    first_default = len(fields) - len(newdefaults)
+    missing = [(first_default + i, d) for i, d in enumerate(newdefaults)
+               if type(d) is _Missing]
+
+    def _replace(self, /, **kwargs):
+        cls = type(self)
+        unexpected = [f for f in kwargs if f not in fields]
+        if unexpected:
+            raise ValueError('Got unexpected field names: {!r}'
+                             .format(unexpected))
+        values = [kwargs[f] if f in kwargs else v
+                  for f, v in zip(fields, self)]
+        args = list(values)
+        for index, sentinel in missing:
+            if fields[index] not in kwargs and \
+                    values[index] is sentinel.default:
+                args[index] = sentinel
+        record = cls.__new__(cls, *args)
+        if cls.__init__ is not object.__init__ and isinstance(record, cls):
+            record.__init__(*values)
+        return record
+
+    _replace.__qualname__ = '{}._replace'.format(nt.__name__)
+    _replace.__doc__ = nt._replace.__doc__
+    return _replace
+
+
+class _Missing:
+    # The default for an argument that gets converted or checked.
+
+    __slots__ = ('default',)
+
+    def __init__(self, default):
+        self.default = default
+
+    def __repr__(self):
+        return repr(self.default)
+
+
+def _invalid(cls, field, value, type_):
+    if isinstance(type_, tuple):
+        expected = ' or '.join(t.__name__ for t in type_)
+    else:
+        expected = type_.__name__
+    raise TypeError('{}.{} must be {}, got {!r}'
+                    .format(cls.__name__, field, expected, value))
+
+
+#################################################
+# bulk construction and conversion
+
+def _make_many(cls, rows):
+    """Return a list of new records, one for each row (an iterable).
+
+    This is the same as [cls(*row) for row in rows], but if the class
+    doesn't override __new__() or __init__() then neither gets called,
+    which is much faster.
+    """
+    if cls.__new__ is cls.__namedtuple__.__new__ and \
+            cls.__init__ is object.__init__:
+        records = list(map(tuple.__new__, repeat(cls), rows))
+        size = len(cls._fields)
+        if any(map(size.__ne__, map(len, records))):
+            if cls._field_defaults:
+                # Some of the rows may rely on the defaults.
+                return list(starmap(cls, records))
+            bad = next(r for r in records if len(r) != size)
+            raise TypeError('expected {} fields, got {}'
+                            .format(size, len(bad)))
+        return records
+    return list(starmap(cls, rows))
+
+
+def _from_columns(cls, **columns):
+    """Return a list of new records made from the given columns.
+
+    Every field must be given, as an iterable of values.  They must all
+    have the same length.
+    """
+    if columns.keys() != set(cls._fields):
+        missing = [f for f in cls._fields if f not in columns]
+        unknown = [f for f in columns if f not in cls._fields]
+        raise TypeError('expected columns for exactly the fields {}, '
+                        'missing {}, unexpected {}'
+                        .format(cls._fields, missing, unknown))
+    rows = zip(*(columns[f] for f in cls._fields), strict=True)
+    return cls._make_many(rows)
+
+
+def _to_columns(cls, records):
+    """Return a dict mapping each field to a list of the records' values.
+    """
+    columns = zip(*records)
+    return {field: list(next(columns, ())) for field in cls._fields}
+
+
+def _from_array(cls, array):
+    """Return a list of new records made from a NumPy structured array.
+
+    The array must have a field for each of the records' fields.  This
+    works without importing NumPy.
+    """
+    names = array.dtype.names
+    if names is None:
+        raise TypeError('expected a structured array, got dtype {}'
+                        .format(array.dtype))
+    if names != cls._fields:
+        missing = [f for f in cls._fields if f not in names]
+        if missing:
+            raise ValueError('array is missing fields {}'.format(missing))
+        array = array[list(cls._fields)]
+    return cls._make_many(array.tolist())
+
+
+def _to_array(cls, records, dtype=None):
+    """Return a NumPy structured array holding the records.
+
+    If "dtype" isn't provided then the type of each field is inferred
+    from its values, as numpy.asarray() does.  This requires NumPy.
+    """
+    import numpy
+    if dtype is not None:
+        return numpy.array(list(records), dtype=dtype)
+    columns = _to_columns(cls, records)
+    arrays = [numpy.asarray(columns[f]) for f in cls._fields]
+    size = len(arrays[0]) if arrays else 0
+    array = numpy.empty(size, [(f, a.dtype)
+                               for f, a in zip(cls._fields, arrays)])
+    for field, values in zip(cls._fields, arrays):
+        array[field] = values
+    return array
+
+
+_BULK_METHODS = {
+        '_make_many': classmethod(_make_many),
+        '_from_columns': classmethod(_from_columns),
+        '_to_columns': classmethod(_to_columns),
+        '_from_array': classmethod(_from_array),
+        '_to_array': classmethod(_to_array),
+        }
+
@@ -0,0 +1,131 @@
+from itertools import chain, islice, repeat
+import struct
+
+
+# The struct formats for fields that have one of these types.
+_FORMATS = {
+        bool: '?',
+        int: 'q',
+        float: 'd',
+        }
+# Records are packed this many at a time, with a single struct call.
+PACK_BATCH = 1024
+
+
+class RecordCodec:
+    """A struct-based binary codec for records of one type.
+
+    Get one for an as_namedtuple() class with Record._codec().  Each
+    record is packed as the struct format made of its fields' formats,
+    in little-endian byte order with no padding, so every record takes
+    the same number of bytes ("size").  A field's format comes from
+    "formats" (a mapping of field names to struct format codes, e.g.
+    "i" or "16s") if it is there, and otherwise from the field's type
+    (see as_namedtuple()), which must be bool, int or float.
+
+    The unpacked records are made directly from the values, without
+    calling the record type's __new__() or __init__().
+    """
+
+    def __init__(self, record_type, formats=None):
+        formats = dict(formats or {})
+        fields = record_type._fields
+        unknown = [f for f in formats if f not in fields]
+        if unknown:
+            raise ValueError('formats for unknown fields {}'.format(unknown))
+        types = getattr(record_type, '_field_types', {})
+        codes = []
+        for field in fields:
+            code = formats.get(field)
+            if code is None:
+                code = _FORMATS.get(types.get(field))
+                if code is None:
+                    raise ValueError('no struct format for field {!r}'
+                                     .format(field))
+            codes.append(code)
+        self.record_type = record_type
+        self.format = '<' + ''.join(codes)
+        self._struct = struct.Struct(self.format)
+        self._batch = struct.Struct(
+                '<' + ''.join(codes) * PACK_BATCH)
+        self.size = self._struct.size
+
+    def __repr__(self):
+        return '{}({}, {!r})'.format(type(self).__name__,
+                                     self.record_type.__qualname__,
+                                     self.format)
+
+    def pack(self, record):
+        """Return the packed record."""
+        return self._struct.pack(*record)
+
+    def unpack(self, buffer, offset=0):
+        """Return the record packed in the buffer at the offset."""
+        return tuple.__new__(self.record_type,
+                             self._struct.unpack_from(buffer, offset))
+
+    def pack_many(self, records, buffer=None, offset=0):
+        """Pack the records one after the other and return the buffer.
+
+        If "buffer" (any writable buffer, e.g. a bytearray, memoryview
+        or mmap) is provided then the records are packed directly into
+        it, starting at "offset".  Otherwise a new bytearray is used.
+        """
+        if not hasattr(records, '__len__'):
+            records = list(records)
+        count = len(records)
+        if buffer is None:
+            buffer = bytearray(offset + count * self.size)
+        else:
+            with memoryview(buffer) as view:
+                if view.nbytes < offset + count * self.size:
+                    raise ValueError('buffer is too small for {} records'
+                                     .format(count))
+        records = iter(records)
+        full = count // PACK_BATCH
+        pack_into = self._batch.pack_into
+        step = self._batch.size
+        for _ in range(full):
+            pack_into(buffer, offset,
+                      *chain.from_iterable(islice(records, PACK_BATCH)))
+            offset += step
+        pack_into = self._struct.pack_into
+        for record in records:
+            pack_into(buffer, offset, *record)
+            offset += self.size
+        return buffer
+
+    def unpack_many(self, buffer, count=None, offset=0):
+        """Return a list of the records packed in the buffer.
+
+        They are read starting at "offset".  If "count" isn't provided
+        then the rest of the buffer must be whole records.  The buffer
+        isn't copied.
+        """
+        with memoryview(buffer) as orig, orig.cast('B') as view:
+            if count is None:
+                end = len(view)
+            else:
+                end = offset + count * self.size
+                if end > len(view):
+                    raise ValueError('buffer is too small for {} records'
+                                     .format(count))
+            with view[offset:end] as part:
+                return list(map(tuple.__new__, repeat(self.record_type),
+                                self._struct.iter_unpack(part)))
+
+
+def _codec(cls, **formats):
+    """Return a RecordCodec for the class.
+
+    Any keyword args are struct formats for the fields.  The codec is
+    reused for the same formats.
+    """
+    codecs = vars(cls).get('__codecs__')
+    if codecs is None:
+        codecs = cls.__codecs__ = {}
+    key = tuple(sorted(formats.items()))
+    codec = codecs.get(key)
+    if codec is None:
+        codec = codecs[key] = RecordCodec(cls, formats)
+    return codec
@@ -0,0 +1,232 @@
+import array
+from itertools import repeat
+import operator
+
+
+# The array typecodes used for columns that aren't given one.
+_TYPECODES = {
+        int: 'q',
+        float: 'd',
+        }
+_TYPES = {typecode: type_ for type_, typecode in _TYPECODES.items()}
+
+
+class RecordTable:
+    """A compact, list-like container of records of one type.
+
+    Get the table type for an as_namedtuple() class as "Record.Table".
+
+    The records aren't kept.  Instead each field is stored in its own
+    column, which saves the per-record object overhead.  A column is an
+    array.array if all its values are ints (typecode "q") or floats
+    ("d"), and a list otherwise.  If a value is added later that doesn't
+    fit then the column is switched to a list.  The typecode of a column
+    may also be set explicitly with "typecodes" (a mapping of field
+    names to typecodes, or to None for a list), in which case values
+    that don't fit fail as array.array does.
+
+    If the record type has converters or (validated) field types (see
+    as_namedtuple()) then rows that aren't already records of that type
+    are passed through it when added, so they get converted and checked
+    the same as when creating a record.
+
+    Indexing a table returns a new record (or, for a slice, a new
+    table).  Iterating over it does the same, so a table may be passed
+    to Record._make_many().  Use column() to get all of a field's values
+    at once.
+    """
+
+    __slots__ = ('_columns', '_fixed', '_types', '_size')
+
+    record_type = None
+    _convert = False
+
+    def __init__(self, records=(), *, typecodes=None):
+        if self.record_type is None:
+            raise TypeError('use the Table of a record type')
+        fields = self.record_type._fields
+        typecodes = dict(typecodes or {})
+        unknown = [f for f in typecodes if f not in fields]
+        if unknown:
+            raise ValueError('unknown fields {}'.format(unknown))
+        self._columns = []
+        self._fixed = []
+        for field in fields:
+            if field not in typecodes:
+                # It gets decided when the first values are added.
+                self._columns.append(None)
+                self._fixed.append(False)
+            elif typecodes[field] is None:
+                self._columns.append([])
+                self._fixed.append(True)
+            else:
+                self._columns.append(array.array(typecodes[field]))
+                self._fixed.append(True)
+        self._types = [None] * len(fields)
+        self._size = 0
+        self.extend(records)
+
+    def __repr__(self):
+        return '<{} ({} records)>'.format(type(self).__qualname__,
+                                          self._size)
+
+    def __reduce__(self):
+        return (_rebuild_table,
+                (self.record_type, self._columns, self._fixed, self._size))
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        if not self._size:
+            return iter(())
+        return map(tuple.__new__, repeat(self.record_type),
+                   zip(*self._columns))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            table = object.__new__(type(self))
+            table._columns = [c[index] if c is not None else None
+                              for c in self._columns]
+            table._fixed = list(self._fixed)
+            table._types = list(self._types)
+            table._size = len(range(*index.indices(self._size)))
+            return table
+        index = operator.index(index)
+        if not -self._size <= index < self._size:
+            raise IndexError('table index out of range')
+        return tuple.__new__(self.record_type,
+                             [c[index] for c in self._columns])
+
+    def __eq__(self, other):
+        if not isinstance(other, RecordTable):
+            return NotImplemented
+        if other.record_type is not self.record_type:
+            return False
+        return self._size == other._size and \
+            all(map(operator.eq, self, other))
+
+    __hash__ = None
+
+    def column(self, field):
+        """Return a copy of all the values of the field.
+
+        The copy is an array.array or a list, the same as the column.
+        """
+        try:
+            index = self.record_type._fields.index(field)
+        except ValueError:
+            raise KeyError(field) from None
+        column = self._columns[index]
+        return column[:] if column is not None else []
+
+    def to_records(self):
+        """Return a list of all the records."""
+        return list(self)
+
+    def append(self, record):
+        """Add a record (or any sequence of the field values)."""
+        if self._convert and type(record) is not self.record_type:
+            record = self.record_type(*record)
+        columns = self._columns
+        if len(record) != len(columns):
+            raise TypeError('expected {} fields, got {}'
+                            .format(len(columns), len(record)))
+        added = 0
+        try:
+            for column, value, type_ in zip(columns, record, self._types):
+                if type_ is not None and type(value) is not type_:
+                    raise TypeError
+                column.append(value)
+                added += 1
+        except (TypeError, OverflowError, AttributeError):
+            # Some column has to change (or the value is bad).
+            for column in columns[:added]:
+                column.pop()
+            self._extend_columns([(value,) for value in record], 1)
+        else:
+            self._size += 1
+
+    def extend(self, records):
+        """Add the records (or sequences of the field values)."""
+        if isinstance(records, RecordTable) and \
+                records.record_type is self.record_type:
+            self._extend_columns(records._columns, records._size)
+            return
+        rows = list(records)
+        if self._convert:
+            cls = self.record_type
+            rows = [row if type(row) is cls else cls(*row) for row in rows]
+        size = len(self._columns)
+        if any(map(size.__ne__, map(len, rows))):
+            bad = next(r for r in rows if len(r) != size)
+            raise TypeError('expected {} fields, got {}'
+                            .format(size, len(bad)))
+        self._extend_columns(list(zip(*rows)), len(rows))
+
+    def _extend_columns(self, columns, count):
+        if not count:
+            return
+        # Nothing is changed until all the values are known to fit.
+        prepared = [self._prepare(i, values)
+                    for i, values in enumerate(columns)]
+        for i, (column, values) in enumerate(prepared):
+            column.extend(values)
+            self._columns[i] = column
+            if type(column) is list or self._fixed[i]:
+                self._types[i] = None
+            else:
+                self._types[i] = _TYPES[column.typecode]
+        self._size += count
+
+    def _prepare(self, i, values):
+        # Return the column to use and the values to extend it with.
+        column = self._columns[i]
+        if type(column) is list:
+            return column, values
+        if column is None:
+            types = set(map(type, values))
+            typecode = _TYPECODES.get(types.pop()) if len(types) == 1 \
+                else None
+            if typecode is None:
+                return [], values
+            column = array.array(typecode)
+        if self._fixed[i]:
+            return column, array.array(column.typecode, values)
+        if set(map(type, values)) <= {_TYPES[column.typecode]}:
+            try:
+                return column, array.array(column.typecode, values)
+            except OverflowError:
+                pass
+        return list(column), values
+
+
+def _rebuild_table(record_type, columns, fixed, size):
+    table = object.__new__(record_type.Table)
+    table._columns = columns
+    table._fixed = fixed
+    table._types = [
+            None if type(c) is not array.array or f else _TYPES[c.typecode]
+            for c, f in zip(columns, fixed)]
+    table._size = size
+    return table
+
+
+class _TableType:
+    # The descriptor behind Record.Table.
+
+    def __get__(self, obj, cls):
+        table = vars(cls).get('__table__')
+        if table is None:
+            ns = {
+                    '__slots__': (),
+                    '__module__': cls.__module__,
+                    '__qualname__': cls.__qualname__ + '.Table',
+                    '__doc__': RecordTable.__doc__,
+                    'record_type': cls,
+                    '_convert': bool(cls._field_converters or (
+                        cls.__validate__ and cls._field_types)),
+                    }
+            table = type('Table', (RecordTable,), ns)
+            cls.__table__ = table
+        return table
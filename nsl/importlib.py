@@ -1,28 +1,607 @@
+import collections
+import concurrent.futures
+import copy
+import dis
+import hashlib
 import importlib
+import importlib.machinery
 import importlib.util
+import marshal
+import os
+import os.path
+import sys
+import threading
+import time
+import types
 
 
 __all__ = [
         'copy_module', 'load_from_source',
+        'CodeCache', 'clear_code_cache',
+        'load_many', 'LoadResult',
+        'lazy_load_from_source', 'materialize',
         ]
 
 
-def copy_module(module):
+def copy_module(module, *, cache=None, lazy=False, clone=None, deep=()):
     """Return a copy of an existing module.
 
-    sys.modules is not changed.
+    sys.modules is not changed.  By default the module's source file is
+    loaded again.  If "cache" is true then the module's compiled code is
+    reused from (and kept in) the code cache, as load_from_source()
+    does, instead of being loaded again each time.  If "lazy" is true
+    then the copy isn't executed until it is first used (see
+    lazy_load_from_source()).
+
+    "clone" may be used to avoid going back to the source file:
+
+    * "code" - execute the module's compiled code in a new module.  For
+      a module loaded from source the code is cached (unless "cache" is
+      false); otherwise the module's loader provides it, so frozen and
+      zipimported modules work too.
+    * "namespace" - don't execute anything, just give the new module a
+      snapshot of the module's namespace.  Functions defined in the
+      module are rebound to the new namespace.  Other values are shared,
+      except those named in "deep" (or all of them, if deep=True), which
+      are deep-copied.  This works for any module, even builtin ones.
     """
     if isinstance(module, str):
         module = importlib.import_module(module)
-    return load_from_source(module.__name__, module.__file__)
+    if clone is None:
+        cache = cache or False
+        if lazy:
+            return lazy_load_from_source(module.__name__, module.__file__,
+                                         cache=cache)
+        return load_from_source(module.__name__, module.__file__,
+                                cache=cache)
+    if lazy:
+        raise ValueError('"lazy" is not supported with "clone"')
+    if clone == 'code':
+        return _clone_code(module, True if cache is None else cache)
+    elif clone == 'namespace':
+        return _clone_namespace(module, deep)
+    else:
+        raise ValueError('unsupported clone {!r}'.format(clone))
+
+
+def _clone_code(module, cache):
+    spec = module.__spec__
+    if spec is None:
+        raise ValueError('module {!r} has no spec'.format(module.__name__))
+    clone = importlib.util.module_from_spec(spec)
+    if cache and isinstance(spec.loader,
+                            importlib.machinery.SourceFileLoader):
+        _exec_module(clone, spec, cache)
+        return clone
+    get_code = getattr(spec.loader, 'get_code', None)
+    code = get_code(spec.name) if get_code is not None else None
+    if code is None:
+        raise ValueError('module {!r} has no code to execute'
+                         .format(spec.name))
+    exec(code, clone.__dict__)
+    return clone
+
+
+def _clone_namespace(module, deep):
+    source = vars(module)
+    clone = types.ModuleType(module.__name__)
+    ns = vars(clone)
+    if deep is True:
+        deep = source.keys()
+    # Any reference to the module (or its namespace) in a deep-copied
+    # value should point to the clone instead.  Modules aren't copied.
+    memo = {id(module): clone, id(source): ns}
+    for value in source.values():
+        if isinstance(value, types.ModuleType) and value is not module:
+            memo[id(value)] = value
+    for name, value in source.items():
+        if type(value) is types.FunctionType and value.__globals__ is source:
+            value = _rebind_function(value, ns)
+        elif name in deep:
+            value = copy.deepcopy(value, memo)
+        ns[name] = value
+    return clone
 
 
-def load_from_source(name, filename):
-    """Return a module loaded from the given filename."""
+def _rebind_function(func, ns):
+    rebound = types.FunctionType(func.__code__, ns, func.__name__,
+                                 func.__defaults__, func.__closure__)
+    # The rest is only copied if set, which is relatively uncommon.
+    if func.__kwdefaults__:
+        rebound.__kwdefaults__ = func.__kwdefaults__
+    if func.__qualname__ != rebound.__qualname__:
+        rebound.__qualname__ = func.__qualname__
+    if func.__doc__ is not rebound.__doc__:
+        rebound.__doc__ = func.__doc__
+    if func.__dict__:
+        rebound.__dict__.update(func.__dict__)
+    if func.__annotations__:
+        rebound.__annotations__ = func.__annotations__
+    return rebound
+
+
+def load_from_source(name, filename, *, cache=True):
+    """Return a module loaded from the given filename.
+
+    By default the compiled code is kept in an in-memory cache (see
+    CodeCache), so loading the same unchanged file again skips reading
+    and compiling it.  "cache" may also be a CodeCache (e.g. one that
+    stores the code on disk too), or False to load the module the
+    normal way.  Only source files are cached; anything else (e.g. a
+    .pyc file or an extension module) is always loaded the normal way.
+    """
     spec = importlib.util.spec_from_file_location(name, filename)
     module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    _exec_module(module, spec, cache)
+    return module
+
+
+def _exec_module(module, spec, cache):
+    # Only source files are cached (not .pyc files or extensions).
+    if cache is False or not isinstance(
+            spec.loader, importlib.machinery.SourceFileLoader):
+        spec.loader.exec_module(module)
+        return
+    if cache is True:
+        cache = _code_cache
+    code = cache.get_code(spec.origin, spec.loader)
+    exec(code, module.__dict__)
+
+
+#################################################
+# lazy loading
+
+def lazy_load_from_source(name, filename, *, cache=True):
+    """Return a module that is loaded from the file when first used.
+
+    Nothing is read or executed until an attribute of the module is
+    first accessed (see importlib.util.LazyLoader).  Then it is loaded
+    like load_from_source() does, with the given "cache".  Unlike with
+    LazyLoader, that first access is thread-safe: any other thread
+    using the module meanwhile waits until it is done loading.
+
+    Use materialize() to load the module right away.
+    """
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    _LazyLoader(spec.loader, cache).exec_module(module)
+    return module
+
+
+def materialize(module):
+    """Finish loading a lazy module now, if not done yet, and return it.
+
+    Any other module is returned as-is.
+    """
+    if type(module) is _LazyModule:
+        _materialize(module)
     return module
 
 
+class _LazyLoader(importlib.util.LazyLoader):
+
+    def __init__(self, loader, cache):
+        super().__init__(loader)
+        self.cache = cache
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        super().exec_module(module)
+        spec.loader_state.update(
+                cache=self.cache, lock=threading.RLock(), thread=None)
+        # Replace LazyLoader's module type with our thread-safe one.
+        module.__class__ = _LazyModule
+
+
+class _LazyModule(types.ModuleType):
+    """A module that is loaded when its attributes are first used."""
+
+    def __getattribute__(self, attr):
+        if _loading_here(self):
+            # This is the module's own code, so don't wait on it.
+            return types.ModuleType.__getattribute__(self, attr)
+        _materialize(self)
+        return getattr(self, attr)
+
+    def __delattr__(self, attr):
+        if _loading_here(self):
+            types.ModuleType.__delattr__(self, attr)
+            return
+        # Like LazyLoader, fail if the attribute doesn't exist.
+        self.__getattribute__(attr)
+        delattr(self, attr)
+
+
+def _loader_state(module):
+    spec = types.ModuleType.__getattribute__(module, '__spec__')
+    return spec, spec.loader_state
+
+
+def _loading_here(module):
+    _, state = _loader_state(module)
+    return state['thread'] == threading.get_ident()
+
+
+def _materialize(module):
+    spec, state = _loader_state(module)
+    with state['lock']:
+        if type(module) is not _LazyModule or state['thread'] is not None:
+            # It is already loaded or we are loading it.
+            return
+        state['thread'] = threading.get_ident()
+        # As LazyLoader does, keep any attributes set before loading.
+        ns = types.ModuleType.__getattribute__(module, '__dict__')
+        before = state['__dict__']
+        updated = {k: v for k, v in ns.items()
+                   if k not in before or before[k] is not v}
+        try:
+            _exec_module(module, spec, state['cache'])
+        finally:
+            # Even if it failed, since the module is now partly loaded.
+            module.__class__ = state['__class__']
+            state['thread'] = None
+        ns.update(updated)
+
+
+#################################################
+# the code cache
+
+CODE_CACHE_SIZE = 128
+
+
+class CodeCache:
+    """A cache of compiled module code, keyed by source filename.
+
+    An entry is used as long as the file's mtime and size are the same.
+    If either changed then the source is read and its hash compared, so
+    a file that was only touched isn't compiled again.  At most
+    "maxsize" entries are kept, dropping the least recently used.
+
+    If "cache_dir" is provided then the compiled code is also stored
+    there, marshalled (much like __pycache__), so other processes can
+    skip compiling too.  Those files are validated with the source
+    hash and the interpreter's bytecode magic number.
+    """
+
+    def __init__(self, maxsize=CODE_CACHE_SIZE, *, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Forget all the cached code (but leave any files alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_code(self, filename, loader=None):
+        """Return the code object for the source file."""
+        return self._get_entry(filename, loader)[3]
+
+    def _get_entry(self, filename, loader=None):
+        filename = os.path.abspath(filename)
+        st = os.stat(filename)
+        entry = self._lookup(filename)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry
+
+        if loader is None:
+            loader = importlib.machinery.SourceFileLoader(
+                    os.path.basename(filename), filename)
+        source = loader.get_data(filename)
+        source_hash = importlib.util.source_hash(source)
+        if entry is not None and entry[2] == source_hash:
+            code = entry[3]
+        else:
+            code = self._load_code(filename, source_hash)
+            if code is None:
+                code = loader.source_to_code(source, filename)
+                self._store_code(filename, source_hash, code)
+
+        entry = (st.st_mtime_ns, st.st_size, source_hash, code)
+        self._add(filename, entry)
+        return entry
+
+    def _lookup(self, filename, st=None):
+        # Return the entry, if any.  If "st" is provided then only an
+        # entry that is still current is returned.
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None:
+                self._entries.move_to_end(filename)
+        if st is not None and entry is not None:
+            if entry[:2] != (st.st_mtime_ns, st.st_size):
+                return None
+        return entry
+
+    def _add(self, filename, entry):
+        with self._lock:
+            self._entries[filename] = entry
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _cache_filename(self, filename):
+        key = hashlib.sha1(os.fsencode(filename)).hexdigest()
+        base = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(self.cache_dir, '{}.{}.pyc'.format(base, key))
+
+    def _load_code(self, filename, source_hash):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._cache_filename(filename), 'rb') as infile:
+                data = infile.read()
+        except OSError:
+            return None
+        header = importlib.util.MAGIC_NUMBER + source_hash
+        if data[:len(header)] != header:
+            return None
+        try:
+            return marshal.loads(memoryview(data)[len(header):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def _store_code(self, filename, source_hash, code):
+        if self.cache_dir is None:
+            return
+        cachefile = self._cache_filename(filename)
+        tmp = '{}.{}.tmp'.format(cachefile, os.getpid())
+        data = importlib.util.MAGIC_NUMBER + source_hash + marshal.dumps(code)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, 'wb') as outfile:
+                outfile.write(data)
+            os.replace(tmp, cachefile)
+        except OSError:
+            # Like the import system, we don't fail if we can't write.
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+_code_cache = CodeCache()
+
+
+def clear_code_cache():
+    """Forget all the code cached by load_from_source()."""
+    _code_cache.clear()
+
+
+#################################################
+# loading many modules at once
+
+class LoadResult(collections.namedtuple('LoadResult',
+                                        'name filename module error '
+                                        'compile_time exec_time')):
+    """The outcome of loading one module with load_many().
+
+    "module" is None if loading failed, in which case "error" is the
+    exception.  The times are in seconds; "compile_time" covers reading
+    (or getting from the cache) and compiling the source.
+    """
+
+
+def load_many(specs, *, cache=True, register=False, workers=None,
+              processes=False):
+    """Load many modules from source and return a LoadResult for each.
+
+    "specs" is a mapping of module names to filenames, or a sequence of
+    (name, filename) pairs.  First all the sources are read and
+    compiled (or their code is taken from the cache).  Then the modules
+    are executed one at a time in the current thread.  A module that imports another
+    module in the batch (at the top level) is executed after it, unless
+    they import each other; otherwise the given order is kept.
+
+    A module that fails to compile or execute doesn't stop the rest of
+    the batch.  Its error is reported in its LoadResult, and any module
+    that depends on it is not executed (the error is an ImportError).
+
+    The results are in the order the modules were executed.  If
+    "register" is true then each module is added to sys.modules before
+    it is executed, as the import system does, so the modules can import
+    one another.  "cache" is the same as for load_from_source().
+
+    By default the sources are compiled one at a time in the current
+    thread.  If "workers" is given then they are compiled concurrently,
+    using a pool of that many threads, or processes if "processes" is
+    true (then "workers" defaults to the number of CPUs).  Threads only
+    help with reading the files, since compiling holds the GIL.  A
+    process pool compiles in parallel, but the code must then be sent
+    back (marshalled), so it only pays off with several idle CPUs and
+    large modules that aren't cached yet.
+    """
+    if hasattr(specs, 'items'):
+        specs = specs.items()
+    specs = [(name, os.path.abspath(filename)) for name, filename in specs]
+    results = {}
+    for name, filename in specs:
+        if name in results:
+            raise ValueError('duplicate module name {!r}'.format(name))
+        results[name] = LoadResult(name, filename, None, None, 0.0, 0.0)
+    if cache is True:
+        cache = _code_cache
+
+    codes = _compile_many(specs, cache, workers, processes, results)
+
+    # Scanning the bytecode is relatively slow, so it is skipped if the
+    # module can't be importing any of the batch.
+    parts = {''}
+    for name in results:
+        parts.update(name.split('.'))
+    deps = {}
+    for name, filename in specs:
+        if name not in codes:
+            continue
+        deps[name] = []
+        if parts.isdisjoint(n.partition('.')[0] for n in codes[name].co_names):
+            continue
+        ispkg = os.path.basename(filename) == '__init__.py'
+        deps[name] = [dep for dep in _top_level_imports(
+                          codes[name], name, ispkg)
+                      if dep != name and dep in results]
+    failed = set()
+    loaded = []
+    for name in _exec_order(specs, deps):
+        result = results[name]
+        if name not in codes:
+            failed.add(name)
+            loaded.append(result)
+            continue
+        missing = [dep for dep in deps[name] if dep in failed]
+        if missing:
+            failed.add(name)
+            error = ImportError('{!r} not executed because {} failed'
+                                .format(name, ', '.join(missing)),
+                                name=name)
+            loaded.append(result._replace(error=error))
+            continue
+        spec = importlib.util.spec_from_file_location(name, result.filename)
+        module = importlib.util.module_from_spec(spec)
+        if register:
+            sys.modules[name] = module
+        start = _clock()
+        try:
+            exec(codes[name], module.__dict__)
+        except Exception as exc:
+            if register:
+                sys.modules.pop(name, None)
+            failed.add(name)
+            result = result._replace(error=exc)
+        else:
+            result = result._replace(module=module)
+        loaded.append(result._replace(exec_time=_clock() - start))
+    return loaded
+
+
+_clock = time.perf_counter
+
+
+def _compile_many(specs, cache, workers, processes, results):
+    # Return {name: code} for the modules that compiled.  The results
+    # are updated with the compile times and errors.
+    codes = {}
+    if workers is None and not processes:
+        for name, filename in specs:
+            result = results[name]
+            try:
+                code, elapsed = _compile(name, filename, cache)
+            except Exception as exc:
+                results[name] = result._replace(error=exc)
+                continue
+            codes[name] = code
+            results[name] = result._replace(compile_time=elapsed)
+        return codes
+    if processes:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(
+                workers, thread_name_prefix='nsl.importlib-load')
+    with executor:
+        pending = {}
+        for name, filename in specs:
+            if not processes:
+                future = executor.submit(_compile, name, filename, cache)
+            else:
+                try:
+                    entry = cache and cache._lookup(filename,
+                                                    os.stat(filename))
+                except OSError:
+                    entry = None
+                if entry:
+                    codes[name] = entry[3]
+                    continue
+                cache_dir = cache.cache_dir if cache else None
+                future = executor.submit(_compile_marshalled, name, filename,
+                                         cache_dir)
+            pending[future] = name
+        for future in concurrent.futures.as_completed(pending):
+            name = pending[future]
+            result = results[name]
+            try:
+                code, elapsed = future.result()
+            except Exception as exc:
+                results[name] = result._replace(error=exc)
+                continue
+            if processes:
+                entry = code
+                code = marshal.loads(entry[3])
+                if cache:
+                    cache._add(result.filename, entry[:3] + (code,))
+            codes[name] = code
+            results[name] = result._replace(compile_time=elapsed)
+    return codes
+
+
+def _compile(name, filename, cache):
+    start = _clock()
+    if cache:
+        code = cache.get_code(filename)
+    else:
+        code = importlib.machinery.SourceFileLoader(
+                name, filename).get_code(name)
+    return code, _clock() - start
+
+
+def _compile_marshalled(name, filename, cache_dir):
+    # This runs in a worker process.
+    start = _clock()
+    entry = CodeCache(1, cache_dir=cache_dir)._get_entry(filename)
+    entry = entry[:3] + (marshal.dumps(entry[3]),)
+    return entry, _clock() - start
+
+
+def _top_level_imports(code, name, ispkg=False):
+    # Yield the absolute names of the modules imported by the module's
+    # own code (not its functions), e.g. "a", "a.b" and "a.b.c" for
+    # "from a.b import c".
+    package = name if ispkg else name.rpartition('.')[0]
+    consts = [0, None]
+    for instr in dis.get_instructions(code):
+        if instr.opname == 'LOAD_CONST':
+            consts = [consts[-1], instr.argval]
+            continue
+        if instr.opname != 'IMPORT_NAME':
+            continue
+        level, fromlist = consts
+        if not isinstance(level, int):
+            level = 0
+        try:
+            resolved = importlib.util.resolve_name(
+                    '.' * level + instr.argval, package)
+        except (ImportError, ValueError):
+            continue
+        parts = resolved.split('.')
+        for i in range(1, len(parts) + 1):
+            yield '.'.join(parts[:i])
+        if isinstance(fromlist, tuple):
+            for attr in fromlist:
+                if attr != '*':
+                    yield '{}.{}'.format(resolved, attr)
+
+
+def _exec_order(specs, deps):
+    # Order the modules so each comes after the modules it depends on,
+    # keeping the given order otherwise.  A cycle is broken where it
+    # was found.
+    order = []
+    done = set()
+    active = set()
+
+    def visit(name):
+        if name in done or name in active:
+            return
+        active.add(name)
+        for dep in deps.get(name, ()):
+            visit(dep)
+        active.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name, _ in specs:
+        visit(name)
+    return order
+
+
 # XXX Add import_from_source?
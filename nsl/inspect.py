@@ -1,8 +1,9 @@
 import inspect
+import sys
 
 
 __all__ = [
-        'get_caller_module',
+        'get_caller_module', 'find_caller_module',
         ]
 
 
@@ -24,6 +25,10 @@ def get_caller_module(called=None, *, external=True):
     from __main__ or module body).  None is also the result if no
     "called" frame is provided (the default) and the Python
     implementation does not support frames.
+
+    The lookup is only a couple of dict lookups per frame, which is
+    hard to beat with a cache (see benchmarks/bench_inspect.py).  To
+    get past several frames at once, use find_caller_module().
     """
     if called is None:
         called = inspect.currentframe()
@@ -34,13 +39,64 @@ def get_caller_module(called=None, *, external=True):
         called = called.f_back
 
     caller = called.f_back
+    if caller is None:
+        return None
+    name = caller.f_globals['__name__']
     if external:
+        called_name = called.f_globals['__name__']
         # Walk the stack.
-        while caller:
-            name = caller.f_globals['__name__']
-            if name != called.f_globals['__name__']:
-                break
+        while name == called_name:
             caller = caller.f_back
-    if caller is None:
+            if caller is None:
+                return None
+            name = caller.f_globals['__name__']
+    return name
+
+
+def _getframe_fallback(depth=0):
+    # This is sys._getframe() using only the inspect module.
+    frame = inspect.currentframe()
+    if frame is None:
+        return None
+    # Skip our own frame too.
+    for _ in range(depth + 1):
+        frame = frame.f_back
+        if frame is None:
+            raise ValueError('call stack is not deep enough')
+    return frame
+
+
+_getframe = getattr(sys, '_getframe', _getframe_fallback)
+
+
+def find_caller_module(depth=1, *, skip_modules=None):
+    """Return the name of the module "depth" frames up the call stack.
+
+    A depth of 0 means the module of the function that called
+    find_caller_module(), 1 (the default) means the module of that
+    function's caller, and so on.  The target frame is looked up
+    directly (with sys._getframe() where available) rather than by
+    walking the stack one frame at a time.
+
+    If "skip_modules" is provided (ideally a set) then frames from
+    those modules are skipped, starting at the target frame.  This is
+    useful for getting past logging wrappers and adapters.
+
+    Unlike get_caller_module(), the module of the calling function is
+    not skipped implicitly.  None is returned if the stack is not deep
+    enough or if the Python implementation does not support frames.
+    """
+    try:
+        frame = _getframe(depth + 1)
+    except ValueError:
+        return None
+    if skip_modules:
+        while frame is not None:
+            name = frame.f_globals['__name__']
+            if name not in skip_modules:
+                return name
+            frame = frame.f_back
+        return None
+    if frame is None:
         return None
-    return caller.f_globals['__name__']
+    return frame.f_globals['__name__']
@@ -0,0 +1,314 @@
+import logging
+import sys
+
+import nsl.inspect
+from ._asyncio import AsyncioHandler
+from ._codec import encode_record, decode_record  # noqa: F401
+from ._config import (  # noqa: F401
+        LoggerConfig, compile_loggers, configure_loggers, snapshot_loggers,
+        )
+from ._filters import RateLimitFilter, SamplingFilter
+from ._formatters import CompiledFormatter, JSONFormatter
+from ._handlers import BufferedFileHandler, RotatingFileHandler  # noqa: F401
+from ._lazy import lazy, LazyAdapter  # noqa: F401
+from ._levels import LoggerProxy, refresh_proxies  # noqa: F401
+from ._metrics import (  # noqa: F401
+        HandlerMetrics, instrument, metrics_snapshot,
+        format_prometheus, write_prometheus,
+        )
+from ._multiprocess import (  # noqa: F401
+        LogAggregator, AggregatorHandler, aggregate_logs, connect_logs,
+        )
+from ._perthread import PerThreadHandler, per_thread_handler  # noqa: F401
+from ._queue import QueueingHandler, queued_handler  # noqa: F401
+from ._ring import RingBufferHandler, read_ring  # noqa: F401
+
+
+def level_from_verbosity(verbosity=3, maxlevel=logging.CRITICAL):
+    """Return the logging level corresponding to the given verbosity."""
+    return max(1,  # 0 disables it, so we use the next lowest.
+               min(maxlevel,
+                   maxlevel - verbosity * 10))
+
+
+def get_logger(logger=None):
+    """Return the corresponding logger.
+
+    If "logger" a string then it gets looked up normally.  If None,
+    the name is pulled from the current module.
+    """
+    if logger is None:
+        name = nsl.inspect.get_caller_module()
+        logger = logging.getLogger(name)
+    elif isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    return logger
+
+
+def get_proxy(logger=None):
+    """Return a LoggerProxy for the corresponding logger.
+
+    The logger is resolved the same as with get_logger().  Disabled
+    levels can then be checked with a single attribute lookup (e.g.
+    "proxy.is_debug").
+    """
+    if logger is None:
+        logger = logging.getLogger(nsl.inspect.get_caller_module())
+    else:
+        logger = get_logger(logger)
+    return LoggerProxy(logger)
+
+
+def get_lazy_logger(logger=None, extra=None):
+    """Return a LazyAdapter for the corresponding logger.
+
+    The logger is resolved the same as with get_logger().  Any plain
+    functions passed as message args are then only called if a handler
+    actually formats the record (see lazy()).
+    """
+    if logger is None:
+        logger = logging.getLogger(nsl.inspect.get_caller_module())
+    else:
+        logger = get_logger(logger)
+    return LazyAdapter(logger, extra)
+
+
+def basic_handler(stream=None, level=logging.INFO, *,
+                  formatter=None, buffered=False, rotate=False,
+                  queued=False, per_thread=False, asynchronous=False,
+                  structured=False, instrumented=False, **fmt):
+    """Return a logging.Handler set up for basic streaming.
+
+    If "stream" is a filename then logging.FileHandler is used.
+    Otherwise logging.StreamHandler gets used.
+
+    If "buffered" is true (only allowed with a filename) then
+    BufferedFileHandler is used instead of logging.FileHandler, which
+    means far fewer writes at the cost of losing the buffered records
+    on a hard crash (see BufferedFileHandler).  "buffered" may also be
+    a mapping of keyword args for BufferedFileHandler.
+
+    If "rotate" is true (only allowed with a filename) then
+    RotatingFileHandler is used, which rotates the file by size and/or
+    time and compresses the rotated files in the background.  "rotate"
+    may also be a mapping of keyword args for RotatingFileHandler (e.g.
+    "maxbytes" or "interval").  It can't be combined with "buffered".
+
+    If "queued" is true then that handler is wrapped in a
+    QueueingHandler, so the actual I/O happens on a background thread.
+    "queued" may also be a mapping of keyword args for QueueingHandler.
+
+    If "per_thread" is true then that handler is wrapped in a
+    PerThreadHandler instead, so logging threads never contend on a
+    lock; each buffers its own records and a single thread writes them
+    out.  "per_thread" may also be a mapping of keyword args for
+    PerThreadHandler (e.g. "ordered").  It can't be combined with
+    "queued".
+
+    If "asynchronous" is true (only allowed with a stream, not a
+    filename) then AsyncioHandler is used instead of
+    logging.StreamHandler, so logging from a coroutine never blocks the
+    event loop on a slow stream.  "asynchronous" may also be a mapping
+    of keyword args for AsyncioHandler.
+
+    If any format args are provided then "formatter" (CompiledFormatter
+    by default) is used to build the handler's formatter.
+
+    If "structured" is true then the handler gets a JSONFormatter, so
+    each record is written as one JSON object per line.  "structured"
+    may also be a mapping of keyword args for JSONFormatter.
+
+    If "instrumented" is true then the handler's metrics are collected
+    (see instrument() and metrics_snapshot()).  It may also be a
+    mapping of keyword args for instrument().  Handlers that aren't
+    instrumented have no overhead from this.
+    """
+    if queued and per_thread:
+        raise TypeError('queued and per_thread are mutually exclusive')
+    if asynchronous:
+        # (rotate and buffered need a filename.)
+        if isinstance(stream, str) or rotate or buffered:
+            raise ValueError('asynchronous requires a stream, got {!r}'
+                             .format(stream))
+        handler = AsyncioHandler(sys.stdout if stream is None else stream,
+                                 **_handler_kwargs(asynchronous))
+    elif rotate:
+        if not isinstance(stream, str):
+            raise ValueError('rotate requires a filename, got {!r}'
+                             .format(stream))
+        if buffered:
+            raise TypeError('rotate and buffered are mutually exclusive')
+        handler = RotatingFileHandler(stream, delay=True,
+                                      **_handler_kwargs(rotate))
+    elif buffered:
+        if not isinstance(stream, str):
+            raise ValueError('buffered requires a filename, got {!r}'
+                             .format(stream))
+        handler = BufferedFileHandler(stream, delay=True,
+                                      **_handler_kwargs(buffered))
+    elif stream is None:
+        handler = logging.StreamHandler(sys.stdout)
+    elif isinstance(stream, str):
+        handler = logging.FileHandler(stream, delay=True)
+    else:
+        handler = logging.StreamHandler(stream)
+
+    if level is not None:
+        handler.setLevel(level)
+    if structured:
+        if fmt:
+            raise TypeError('format args not supported with structured')
+        handler.setFormatter(
+                JSONFormatter(**_handler_kwargs(structured)))
+    elif fmt:
+        if formatter is None:
+            formatter = CompiledFormatter
+        handler.setFormatter(
+                formatter(**fmt))
+    if queued:
+        handler = queued_handler(handler, **_handler_kwargs(queued))
+    elif per_thread:
+        handler = per_thread_handler(handler, **_handler_kwargs(per_thread))
+    if instrumented:
+        instrument(handler, **_handler_kwargs(instrumented))
+    return handler
+
+
+def _handler_kwargs(option):
+    # Handler options may be True or a mapping of keyword args.
+    if option is True:
+        return {}
+    return dict(option)
+
+
+def ensure_logger(logger=None, level=logging.INFO, *handlers,
+                  queued=False, per_thread=False, structured=False,
+                  rate_limit=False, sample=None, instrumented=False,
+                  ring=None, **fmt):
+    """Return the logger after ensuring it has at least a basic config.
+
+    If the logger is already configured (e.g. has handlers) then it is
+    not modified at all.  If no logger is given then the name of the
+    current module is used.  If no handlers are provided then a basic
+    streaming handler is used.
+
+    If "queued" is true then the handlers are all wrapped in a single
+    QueueingHandler (see basic_handler()).  Likewise, if "per_thread" is
+    true then they are wrapped in a single PerThreadHandler.  Any format
+    args are used to create a CompiledFormatter for handlers that don't
+    have a formatter.  If "structured" is true then those handlers get a
+    JSONFormatter instead (see basic_handler()).
+
+    If "rate_limit" is true then a RateLimitFilter is added to the
+    logger.  It may also be a mapping of keyword args for
+    RateLimitFilter.  If "sample" is provided then it is a mapping of
+    levels to sampling rates for a SamplingFilter that is added to the
+    logger.  Each record is then rate-limited or sampled once, and all
+    the handlers (including any ring and those of the parent loggers)
+    get the same records.
+
+    If "instrumented" is true then metrics are collected for the
+    handlers (see basic_handler()).  Unnamed handlers are named after
+    the logger.
+
+    If "ring" is provided then a RingBufferHandler is added next to the
+    other handlers, as a flight recorder.  It is the filename for the
+    ring buffer or a mapping of keyword args for RingBufferHandler.
+    The ring gets records at its own level (DEBUG by default), even if
+    that is lower than "level", while the other handlers still only get
+    records at "level" and above.  The ring isn't queued.
+    When the logger's level is lowered for the ring, the logger stops
+    propagating, so the extra records don't reach the handlers of its
+    parents (e.g. the root logger's).  Records at "level" and above are
+    still passed on to those handlers.
+    """
+    logger = get_logger(logger)
+    if logger.handlers:
+        # already configured
+        return logger
+    if structured and fmt:
+        raise TypeError('format args not supported with structured')
+    if queued and per_thread:
+        raise TypeError('queued and per_thread are mutually exclusive')
+
+    # Handle the log level.
+    if level is not None:
+        if isinstance(level, int):
+            # XXX This needs to be better.
+            if level <= 0 or level > logging.CRITICAL or level % 10:
+                level = level_from_verbosity(level)
+        logger.setLevel(level)
+    handlerlevel = None
+    if ring is not None:
+        if isinstance(ring, str):
+            ring = {'filename': ring}
+        ring = RingBufferHandler(**ring)
+        if ring.level < logger.level:
+            logger.setLevel(ring.level)
+            handlerlevel = level
+
+    #logger.propagate = False
+
+    # Add the handlers.
+    if not handlers:
+        handlers = [basic_handler(level=level, queued=queued,
+                                  per_thread=per_thread,
+                                  structured=structured, **fmt)]
+        queued = per_thread = False
+    if structured:
+        fmt = JSONFormatter(**_handler_kwargs(structured))
+    elif fmt:
+        fmt = CompiledFormatter(**fmt)
+    for handler in handlers:
+        if fmt and handler.formatter is None:
+            handler.setFormatter(fmt)
+        if handlerlevel and not handler.level:
+            # The logger's level was lowered for the ring.
+            handler.setLevel(handlerlevel)
+    if queued:
+        handlers = [queued_handler(*handlers, **_handler_kwargs(queued))]
+    elif per_thread:
+        handlers = [per_thread_handler(*handlers,
+                                       **_handler_kwargs(per_thread))]
+    if sample is not None:
+        logger.addFilter(SamplingFilter(sample))
+    if rate_limit:
+        logger.addFilter(RateLimitFilter(**_handler_kwargs(rate_limit)))
+    for i, handler in enumerate(handlers):
+        if instrumented:
+            kwargs = _handler_kwargs(instrumented)
+            if not handler.get_name():
+                kwargs.setdefault('name', '{}:{}'.format(logger.name, i))
+            instrument(handler, **kwargs)
+        logger.addHandler(handler)
+    if ring is not None:
+        logger.addHandler(ring)
+    if handlerlevel and logger.propagate:
+        logger.addHandler(_Propagator(logger, handlerlevel))
+        logger.propagate = False
+
+    return logger
+
+
+class _Propagator(logging.Handler):
+    # This passes records on to the handlers of the logger's parents,
+    # for a logger that had to stop propagating (see ensure_logger()).
+
+    def __init__(self, logger, level):
+        super().__init__(level)
+        self.logger = logger
+
+    def handle(self, record):
+        # This matches what Logger.callHandlers() does for the parents.
+        logger = self.logger.parent
+        while logger is not None:
+            for handler in logger.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            if not logger.propagate:
+                break
+            logger = logger.parent
+        return True
+
+    def emit(self, record):
+        self.handle(record)
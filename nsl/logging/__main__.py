@@ -0,0 +1,54 @@
+"""Command-line tools for nsl.logging.
+
+    python3 -m nsl.logging read-ring FILE [--format FMT] [--style STYLE]
+"""
+import argparse
+import sys
+
+from . import CompiledFormatter, read_ring
+
+
+DEFAULT_FORMAT = '%(asctime)s %(levelname)-8s %(name)s: %(message)s'
+
+
+def read_ring_main(filename, fmt=DEFAULT_FORMAT, style='%', *,
+                   _stdout=None):
+    """Print the records in a ring buffer file, oldest first."""
+    if _stdout is None:
+        _stdout = sys.stdout
+    formatter = CompiledFormatter(fmt, style=style)
+    for record in read_ring(filename):
+        if not isinstance(record, str):
+            record = formatter.format(record)
+        print(record, file=_stdout)
+
+
+def parse_args(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    subs = parser.add_subparsers(dest='cmd', required=True)
+
+    sub = subs.add_parser('read-ring',
+                          help='print the records in a ring buffer file')
+    sub.add_argument('filename')
+    sub.add_argument('--format', dest='fmt', default=DEFAULT_FORMAT,
+                     help='the format for binary records')
+    sub.add_argument('--style', default='%', choices='%{$')
+
+    args = parser.parse_args(argv)
+    ns = vars(args)
+    cmd = ns.pop('cmd')
+    return cmd, ns
+
+
+COMMANDS = {
+        'read-ring': read_ring_main,
+        }
+
+
+def main(cmd, cmdargs):
+    COMMANDS[cmd](**cmdargs)
+
+
+if __name__ == '__main__':
+    cmd, cmdargs = parse_args(prog='python3 -m nsl.logging')
+    main(cmd, cmdargs)
@@ -0,0 +1,148 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import sys
+import threading
+import traceback
+
+
+BACKLOG_SIZE = 10000  # records
+
+
+class AsyncioHandler(logging.StreamHandler):
+    """A stream handler that doesn't block a running asyncio event loop.
+
+    When a record is logged from a thread with a running event loop,
+    it is formatted and added to a backlog, and a task on that loop
+    hands the backlog (in batches) to a single-threaded executor, which
+    does the actual write.  So a slow stream (e.g. stdout piped to a
+    slow reader) never stalls the loop.  If the backlog already has
+    "maxsize" records then the record is dropped (and counted in
+    "dropped").
+
+    When there is no running loop (e.g. before the loop starts, or in
+    another thread), records are written synchronously like
+    logging.StreamHandler does.
+
+    Use "await handler.aflush()" to wait for the backlog to be written
+    and "await handler.aclose()" to do so and then close the handler.
+    flush() and close() also write out the backlog, but synchronously.
+    """
+
+    def __init__(self, stream=None, *, maxsize=BACKLOG_SIZE):
+        super().__init__(stream)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._backlog = collections.deque()
+        self._loop = None
+        self._task = None
+        self._executor = None
+        self._write_lock = threading.Lock()
+
+    def handle(self, record):
+        # Unlike logging.Handler.handle(), the handler lock isn't taken,
+        # since the event loop must not wait on a write in progress.
+        # Writes are serialized by _write_lock instead.
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            loop = self._running_loop()
+            if loop is None:
+                with self._write_lock:
+                    self._write(msg)
+            elif len(self._backlog) >= self.maxsize:
+                self.dropped += 1
+            else:
+                self._backlog.append(msg)
+                if self._task is None:
+                    self._task = loop.create_task(self._drain(loop))
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _running_loop(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        if loop is not self._loop:
+            if self._task is not None and not self._loop.is_closed():
+                # The backlog belongs to a different loop.
+                return None
+            self._loop = loop
+            self._task = None
+        return loop
+
+    async def _drain(self, loop):
+        try:
+            while self._backlog:
+                data = self._pop_backlog()
+                await loop.run_in_executor(
+                        self._get_executor(), self._write_locked, data)
+        except Exception:
+            if logging.raiseExceptions:
+                traceback.print_exc(file=sys.stderr)
+        finally:
+            self._task = None
+
+    def _pop_backlog(self):
+        # flush() may pop from another thread at the same time.
+        backlog = self._backlog
+        parts = []
+        try:
+            for _ in range(len(backlog)):
+                parts.append(backlog.popleft())
+        except IndexError:
+            pass
+        return ''.join(parts)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                    1, thread_name_prefix='nsl.logging-asyncio')
+        return self._executor
+
+    def _write_locked(self, data):
+        with self._write_lock:
+            self._write(data)
+
+    def _write(self, data):
+        stream = self.stream
+        stream.write(data)
+        if hasattr(stream, 'flush'):
+            stream.flush()
+
+    async def aflush(self):
+        """Wait until the backlog has been written."""
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def aclose(self):
+        """Write out the backlog and then close the handler."""
+        await self.aflush()
+        self.close()
+
+    def flush(self):
+        with self._write_lock:
+            if self._backlog:
+                self._write(self._pop_backlog())
+            elif self.stream and hasattr(self.stream, 'flush'):
+                self.stream.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            super().close()
@@ -0,0 +1,96 @@
+import logging
+import os.path
+import struct
+
+
+# The fixed-size part of an encoded record:
+#   created, msecs, levelno, lineno, process, thread
+_HEADER = struct.Struct('<ddHIIQ')
+# The variable-size (str) fields, each stored as a length and UTF-8 text.
+_STRINGS = (
+        'name', 'msg', 'pathname', 'funcName', 'processName', 'threadName',
+        'exc_text', 'stack_info',
+        )
+_LENGTHS = struct.Struct('<{}I'.format(len(_STRINGS)))
+_NONE = 0xFFFFFFFF
+
+_formatter = logging.Formatter()
+_START_TIME = getattr(logging, '_startTime', 0.0)
+
+
+def _new_record():
+    # LogRecord.__init__() looks up a bunch of things we would just
+    # overwrite, so we skip it.
+    return logging.LogRecord.__new__(logging.LogRecord)
+
+
+def encode_record(record):
+    """Return the compact binary encoding of the log record.
+
+    The message is merged with its args and any exception info is
+    rendered as text, much like logging.handlers.QueueHandler does.
+    Only the standard record attributes are encoded; "extra" attributes
+    are dropped.  Use decode_record() to get a LogRecord back.
+    """
+    exc_text = record.exc_text
+    if record.exc_info and not exc_text:
+        exc_text = _formatter.formatException(record.exc_info)
+    values = (
+            record.name, record.getMessage(), record.pathname,
+            record.funcName, record.processName, record.threadName,
+            exc_text, record.stack_info,
+            )
+    lengths = []
+    texts = []
+    for value in values:
+        if value is None:
+            lengths.append(_NONE)
+        else:
+            text = str(value).encode('utf-8', 'surrogateescape')
+            lengths.append(len(text))
+            texts.append(text)
+    header = _HEADER.pack(
+            record.created, record.msecs, record.levelno, record.lineno or 0,
+            record.process or 0, record.thread or 0)
+    return b''.join([header, _LENGTHS.pack(*lengths), *texts])
+
+
+def decode_record(data):
+    """Return the LogRecord for the data from encode_record().
+
+    "data" may be any bytes-like object, including a memoryview.
+    """
+    created, msecs, levelno, lineno, process, thread = \
+        _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    lengths = _LENGTHS.unpack_from(data, offset)
+    offset += _LENGTHS.size
+    record = _new_record()
+    attrs = record.__dict__
+    attrs.update({
+            'created': created,
+            'msecs': msecs,
+            'levelno': levelno,
+            'levelname': logging.getLevelName(levelno),
+            'lineno': lineno,
+            'process': process,
+            'thread': thread,
+            'relativeCreated': (created - _START_TIME) * 1000,
+            'args': None,
+            'exc_info': None,
+            'filename': None,
+            'module': None,
+            'taskName': None,
+            })
+    data = memoryview(data)
+    for name, length in zip(_STRINGS, lengths):
+        if length == _NONE:
+            attrs[name] = None
+        else:
+            end = offset + length
+            attrs[name] = str(data[offset:end], 'utf-8', 'surrogateescape')
+            offset = end
+    if attrs['pathname'] is not None:
+        attrs['filename'] = os.path.basename(attrs['pathname'])
+        attrs['module'] = os.path.splitext(attrs['filename'])[0]
+    return record
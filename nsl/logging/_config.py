@@ -0,0 +1,135 @@
+import logging
+
+from ._formatters import CompiledFormatter
+
+
+_FIELDS = ('level', 'handlers', 'propagate', 'disabled')
+_UNSET = object()
+
+
+class LoggerConfig:
+    """A compiled configuration for a set of loggers.
+
+    Each entry is (logger, level, handlers, propagate, disabled), where
+    any field may be _UNSET, meaning it is left alone.  The loggers and
+    handlers (with their formatters) are all resolved ahead of time, so
+    apply() does nothing but assignments.
+    """
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__,
+                                 [e[0].name for e in self.entries])
+
+    @property
+    def loggers(self):
+        return [entry[0] for entry in self.entries]
+
+    def apply(self):
+        """Apply the config to all its loggers at once.
+
+        This happens under a single acquisition of the logging module's
+        lock and the logging level cache is cleared only once.  Each
+        logger's handler list is replaced rather than modified, so a
+        record being handled concurrently goes to either the old
+        handlers or the new ones, never neither.  The old handlers are
+        not closed.
+
+        A LoggerConfig with the previous config of the same loggers is
+        returned, so the change can be undone by applying it.
+        """
+        with logging._lock:
+            previous = _capture(self.loggers)
+            for logger, level, handlers, propagate, disabled in self.entries:
+                if level is not _UNSET:
+                    logger.level = level
+                if handlers is not _UNSET:
+                    logger.handlers = list(handlers)
+                if propagate is not _UNSET:
+                    logger.propagate = propagate
+                if disabled is not _UNSET:
+                    logger.disabled = disabled
+            if self.entries:
+                self.entries[0][0].manager._clear_cache()
+        return previous
+
+
+def _capture(loggers):
+    return LoggerConfig(
+            (logger, logger.level, tuple(logger.handlers), logger.propagate,
+             logger.disabled)
+            for logger in loggers)
+
+
+def snapshot_loggers(names):
+    """Return a LoggerConfig with the current config of the loggers."""
+    loggers = [_resolve_logger(name) for name in names]
+    with logging._lock:
+        return _capture(loggers)
+
+
+def compile_loggers(config):
+    """Return a LoggerConfig for the given mapping, without applying it.
+
+    "config" maps logger names (or loggers) to a mapping with any of
+    the following:
+
+    * "level" - an int or a level name
+    * "handlers" - the logger's new handlers, replacing the old ones
+    * "formatter" - a logging.Formatter, or a mapping of keyword args
+      for CompiledFormatter, to set on those handlers that don't have a
+      formatter yet
+    * "propagate"
+    * "disabled"
+
+    Anything not in the mapping is left alone.  A level may be given
+    instead of a mapping.
+    """
+    entries = []
+    for name, entry in config.items():
+        logger = _resolve_logger(name)
+        if not hasattr(entry, 'items'):
+            entry = {'level': entry}
+        unknown = set(entry) - set(_FIELDS) - {'formatter'}
+        if unknown:
+            raise ValueError('unsupported logger config for {!r}: {}'
+                             .format(logger.name, ', '.join(sorted(unknown))))
+        values = dict.fromkeys(_FIELDS, _UNSET)
+        values.update((k, v) for k, v in entry.items() if k in values)
+        if values['level'] is not _UNSET:
+            values['level'] = logging._checkLevel(values['level'])
+        if values['handlers'] is not _UNSET:
+            values['handlers'] = tuple(values['handlers'])
+            formatter = entry.get('formatter')
+            if formatter is not None:
+                if not isinstance(formatter, logging.Formatter):
+                    formatter = CompiledFormatter(**formatter)
+                for handler in values['handlers']:
+                    if handler.formatter is None:
+                        handler.setFormatter(formatter)
+        elif 'formatter' in entry:
+            raise ValueError('"formatter" requires "handlers" (for {!r})'
+                             .format(logger.name))
+        entries.append((logger, *(values[f] for f in _FIELDS)))
+    return LoggerConfig(entries)
+
+
+def configure_loggers(config):
+    """Configure many loggers in one pass and return the compiled config.
+
+    See compile_loggers() for the format of "config" and
+    LoggerConfig.apply() for how it is applied.  The returned
+    LoggerConfig may be applied again later, e.g. to switch back after
+    applying another one.
+    """
+    compiled = compile_loggers(config)
+    compiled.apply()
+    return compiled
+
+
+def _resolve_logger(logger):
+    if logger is None or isinstance(logger, str):
+        return logging.getLogger(logger)
+    return logger
@@ -0,0 +1,168 @@
+import collections
+import logging
+import random
+import threading
+import time
+
+
+MAX_KEYS = 1000
+SUMMARY_INTERVAL = 60.0  # seconds
+SUMMARY_MSG = 'suppressed %d messages like: %s'
+
+
+class _Bucket:
+
+    __slots__ = ('tokens', 'stamp', 'suppressed', 'last', 'lock')
+
+    def __init__(self, tokens, stamp):
+        self.tokens = tokens
+        self.stamp = stamp
+        self.suppressed = 0
+        self.last = None
+        self.lock = threading.Lock()
+
+    def take(self, record, now, rate, burst):
+        with self.lock:
+            tokens = self.tokens + (now - self.stamp) * rate
+            if tokens > burst:
+                tokens = burst
+            self.stamp = now
+            if tokens >= 1:
+                self.tokens = tokens - 1
+                return True
+            self.tokens = tokens
+            self.suppressed += 1
+            self.last = record
+            return False
+
+    def pop_suppressed(self):
+        with self.lock:
+            suppressed, self.suppressed = self.suppressed, 0
+            last, self.last = self.last, None
+        return suppressed, last
+
+
+class RateLimitFilter(logging.Filter):
+    """A filter that rate-limits records with a token bucket per key.
+
+    Records are keyed by (logger name, level, message template), so
+    the same log call with different args counts against one bucket.
+    Each bucket allows bursts of up to "burst" records and refills at
+    "rate" records per second.  Records with an unhashable message are
+    not limited.
+
+    At most "maxkeys" buckets are kept; the least recently used one is
+    dropped when there are too many.  Each bucket has its own lock, so
+    there is no global lock on the fast path.
+
+    When records get suppressed, a summary record ("suppressed N
+    messages like: ...") is emitted for that key, at most every
+    "interval" seconds (checked as records come in) and when its
+    bucket is dropped.  The summary goes through the logger of the
+    suppressed records (see emit_summary()).
+    """
+
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(self, rate=1.0, burst=10, *, maxkeys=MAX_KEYS,
+                 interval=SUMMARY_INTERVAL):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.maxkeys = maxkeys
+        self.interval = interval
+        self._buckets = collections.OrderedDict()
+        self._next_summary = self._clock() + interval
+        self._summarizing = threading.Lock()
+
+    def filter(self, record):
+        msg = record.msg
+        if msg is SUMMARY_MSG:
+            return True
+        key = (record.name, record.levelno, msg)
+        buckets = self._buckets
+        now = self._clock()
+        try:
+            bucket = buckets.get(key)
+        except TypeError:
+            # unhashable
+            return True
+        if bucket is None:
+            bucket = buckets.setdefault(key, _Bucket(self.burst, now))
+            if len(buckets) > self.maxkeys:
+                self._evict()
+        else:
+            try:
+                buckets.move_to_end(key)
+            except KeyError:
+                # It was evicted by another thread.
+                pass
+
+        allowed = bucket.take(record, now, self.rate, self.burst)
+        if now >= self._next_summary:
+            self._summarize(now)
+        return allowed
+
+    def _evict(self):
+        while len(self._buckets) > self.maxkeys:
+            try:
+                _, bucket = self._buckets.popitem(last=False)
+            except KeyError:
+                break
+            self._report(bucket)
+
+    def _summarize(self, now):
+        if not self._summarizing.acquire(blocking=False):
+            # Another thread is already doing it.
+            return
+        try:
+            self._next_summary = now + self.interval
+            for bucket in list(self._buckets.values()):
+                self._report(bucket)
+        finally:
+            self._summarizing.release()
+
+    def _report(self, bucket):
+        if not bucket.suppressed:
+            return
+        suppressed, last = bucket.pop_suppressed()
+        if suppressed and last is not None:
+            summary = logging.LogRecord(
+                    last.name, last.levelno, last.pathname, last.lineno,
+                    SUMMARY_MSG, (suppressed, last.msg), None,
+                    last.funcName)
+            summary.suppressed = suppressed
+            self.emit_summary(summary)
+
+    def flush(self):
+        """Emit summaries for all keys with suppressed records now."""
+        self._summarize(self._clock())
+
+    def emit_summary(self, record):
+        """Emit the summary record for some suppressed records.
+
+        By default it is handled by the logger the records came from.
+        """
+        logging.getLogger(record.name).handle(record)
+
+
+class SamplingFilter(logging.Filter):
+    """A filter that lets through a random sample of records.
+
+    "rates" maps levels to the probability (0.0 to 1.0) that a record
+    at that level gets through.  Levels that aren't in the mapping use
+    "default".
+    """
+
+    def __init__(self, rates, *, default=1.0):
+        super().__init__()
+        self.rates = dict(rates)
+        self.default = default
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, self.default)
+        if rate >= 1:
+            return True
+        elif rate <= 0:
+            return False
+        return random.random() < rate
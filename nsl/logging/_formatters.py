@@ -0,0 +1,268 @@
+import json
+import logging
+import operator
+import re
+import string
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_PERCENT_FIELD = re.compile(r'%%|%\((\w+)\)')
+_PERCENT_UNNAMED = re.compile(r'%(?!%|\()')
+_DOLLAR_FIELD = string.Template.pattern
+
+
+def _compile_percent(fmt):
+    if _PERCENT_UNNAMED.search(fmt.replace('%%', '')):
+        # There are conversions without a field name.
+        return None
+    names = []
+
+    def replace(m):
+        name = m.group(1)
+        if name is None:
+            return '%%'
+        names.append(name)
+        return '%'
+    template = _PERCENT_FIELD.sub(replace, fmt)
+    return template, names
+
+
+def _compile_brace(fmt):
+    names = []
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(fmt):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        if not field or '{' in spec:
+            # Auto-numbering or nested fields are left to str.format().
+            return None
+        name, sep, rest = field.partition('.')
+        if '[' in name:
+            name, sep, rest = field.partition('[')
+        if name.isdigit():
+            return None
+        parts.append('{{{}{}{}'.format(len(names), sep, rest))
+        if conversion:
+            parts.append('!' + conversion)
+        if spec:
+            parts.append(':' + spec)
+        parts.append('}')
+        names.append(name)
+    return ''.join(parts), names
+
+
+def _compile_dollar(fmt):
+    names = []
+    parts = []
+    end = 0
+    # Escape any literal "%" first.
+    fmt = fmt.replace('%', '%%')
+    for m in _DOLLAR_FIELD.finditer(fmt):
+        name = m.group('named') or m.group('braced')
+        if name is None and m.group('escaped') is None:
+            # Leave the error to string.Template.
+            return None
+        parts.append(fmt[end:m.start()])
+        parts.append('$' if name is None else '%s')
+        if name is not None:
+            names.append(name)
+        end = m.end()
+    parts.append(fmt[end:])
+    return ''.join(parts), names
+
+
+_COMPILERS = {
+        '%': _compile_percent,
+        '{': _compile_brace,
+        '$': _compile_dollar,
+        }
+
+
+class CompiledFormatter(logging.Formatter):
+    """A logging.Formatter that compiles its format once.
+
+    The format string is turned into a positional template plus the
+    list of record fields it uses (the "plan"), so formatting a record
+    is a single lookup of those fields and a single format operation.
+    The time is only formatted if the format uses "asctime", and the
+    formatted time is cached for the current second.
+
+    Exception and stack info are added just like logging.Formatter does,
+    but only looked at if the record has them.
+
+    Formats the plan doesn't support (e.g. nested replacement fields)
+    are handled by logging.Formatter's normal machinery.
+    """
+
+    def __init__(self, fmt=None, datefmt=None, style='%', validate=True, *,
+                 defaults=None):
+        super().__init__(fmt, datefmt, style, validate, defaults=defaults)
+        self._defaults = defaults
+        self._uses_time = self._style.usesTime()
+        self._timecache = (None, None, None)
+
+        compiled = _COMPILERS[style](self._fmt)
+        if compiled is None:
+            self._render = None
+            return
+        template, names = compiled
+        if not names:
+            self._getfields = lambda values: ()
+        elif len(names) == 1:
+            name, = names
+            self._getfields = lambda values: (values[name],)
+        else:
+            self._getfields = operator.itemgetter(*names)
+        if style == '{':
+            self._render = lambda fields: template.format(*fields)
+        else:
+            self._render = template.__mod__
+
+    def usesTime(self):
+        return self._uses_time
+
+    def formatTime(self, record, datefmt=None):
+        # The formatted time only changes once per second (aside from
+        # the milliseconds, which are added separately).
+        second = int(record.created)
+        cachedsecond, cachedfmt, s = self._timecache
+        if cachedsecond != second or cachedfmt != datefmt:
+            ct = self.converter(record.created)
+            if datefmt:
+                s = time.strftime(datefmt, ct)
+            else:
+                s = time.strftime(self.default_time_format, ct)
+            self._timecache = (second, datefmt, s)
+        if not datefmt and self.default_msec_format:
+            s = self.default_msec_format % (s, record.msecs)
+        return s
+
+    def formatMessage(self, record):
+        if self._render is None:
+            return super().formatMessage(record)
+        values = record.__dict__
+        if self._defaults:
+            values = self._defaults | values
+        try:
+            fields = self._getfields(values)
+        except KeyError as e:
+            raise ValueError('Formatting field not found in record: %s' % e)
+        return self._render(fields)
+
+    def format(self, record):
+        record.message = record.getMessage()
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        s = self.formatMessage(record)
+        if record.exc_info or record.exc_text or record.stack_info:
+            s = self._format_extra(record, s)
+        return s
+
+    def _format_extra(self, record, s):
+        # This matches what logging.Formatter.format() does.
+        if record.exc_info:
+            # Cache the traceback text to avoid converting it multiple
+            # times (it's constant anyway).
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if s[-1:] != '\n':
+                s = s + '\n'
+            s = s + record.exc_text
+        if record.stack_info:
+            if s[-1:] != '\n':
+                s = s + '\n'
+            s = s + self.formatStack(record.stack_info)
+        return s
+
+
+#################################################
+# structured output
+
+# These are the attributes every record has, so the rest are "extra".
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {
+        'message', 'asctime', 'taskName',
+        }
+
+JSON_FIELDS = {
+        'time': 'created',
+        'level': 'levelname',
+        'logger': 'name',
+        'message': 'message',
+        }
+
+
+def _json_encoder():
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS
+
+        def encode(obj):
+            return orjson.dumps(obj, default=str, option=options).decode()
+        return encode
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'),
+                               default=str)
+    return encoder.encode
+
+
+class JSONFormatter(logging.Formatter):
+    """A formatter that renders each record as a single JSON object.
+
+    With a stream handler that makes for NDJSON output.  "fields" maps
+    the JSON keys, in order, to record attributes.  Any "extra" record
+    attributes follow (unless "extra" is False), and then the exception
+    and stack info, if any.  Values JSON doesn't support are converted
+    with str().
+
+    The object is built directly from the needed attributes rather than
+    from a copy of the record's __dict__.  orjson is used to encode it
+    if it is installed, otherwise the json module is.
+    """
+
+    def __init__(self, fields=None, *, extra=True, encode=None):
+        super().__init__()
+        if fields is None:
+            fields = JSON_FIELDS
+        self.fields = dict(fields)
+        self.extra = extra
+        self._keys = tuple(self.fields)
+        attrs = tuple(self.fields.values())
+        if len(attrs) == 1:
+            attr, = attrs
+            self._getfields = lambda values: (values[attr],)
+        else:
+            self._getfields = operator.itemgetter(*attrs)
+        self._uses_time = 'asctime' in attrs
+        self._encode = encode or _json_encoder()
+
+    def usesTime(self):
+        return self._uses_time
+
+    def format(self, record):
+        record.message = record.getMessage()
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        values = record.__dict__
+        try:
+            obj = dict(zip(self._keys, self._getfields(values)))
+        except KeyError as e:
+            raise ValueError('Formatting field not found in record: %s' % e)
+        if self.extra:
+            extra = values.keys() - _RECORD_ATTRS
+            if extra:
+                # Preserve the order in which they were added.
+                for name in values:
+                    if name in extra and name not in obj:
+                        obj[name] = values[name]
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            obj['exc_info'] = record.exc_text
+        if record.stack_info:
+            obj['stack_info'] = self.formatStack(record.stack_info)
+        return self._encode(obj)
@@ -0,0 +1,381 @@
+import gzip
+import logging
+import os
+import os.path
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+BUFFER_SIZE = 64 * 1024  # characters
+FLUSH_INTERVAL = 1.0  # seconds
+MAX_BYTES = 100 * 1024 * 1024  # characters
+BACKUPS = 5
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """A file handler that writes formatted records in batches.
+
+    logging.FileHandler writes and flushes each record as it comes in.
+    This handler collects the formatted records instead and writes them
+    with a single write() call when any of the following happens:
+
+    * "capacity" characters have been collected
+    * "interval" seconds have passed since the oldest buffered record
+      (checked when records come in and on a background thread)
+    * a record at "flushlevel" or above comes in
+    * the handler is flushed or closed (logging.shutdown() does both
+      at exit)
+
+    Durability: records sit in memory until they are flushed, so a
+    hard crash (e.g. SIGKILL or a segfault) loses up to "capacity"
+    characters or "interval" seconds worth of records.  Records at
+    "flushlevel" and above, and everything buffered before them, are
+    written right away.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 errors=None, *, capacity=BUFFER_SIZE,
+                 interval=FLUSH_INTERVAL, flushlevel=logging.ERROR):
+        super().__init__(filename, mode, encoding, delay, errors)
+        self.capacity = capacity
+        self.interval = interval
+        self.flushlevel = flushlevel
+        self.buffer = []
+        self.buffered = 0
+        self.deadline = None
+        if interval is not None:
+            _flusher.add(self)
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return
+        self.buffer.append(msg)
+        self.buffered += len(msg)
+        if (self.buffered < self.capacity
+                and record.levelno < self.flushlevel
+                and not self._due()):
+            return
+        try:
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def _due(self):
+        if self.interval is None:
+            return False
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now + self.interval
+            return False
+        return now >= self.deadline
+
+    def flush(self):
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+            data = ''.join(self.buffer)
+            self.buffer.clear()
+            self.buffered = 0
+            self.deadline = None
+            if self.stream is None:
+                if self.mode == 'w' and self._closed:
+                    return
+                self.stream = self._open()
+            self.stream.write(data)
+            self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        _flusher.discard(self)
+        super().close()
+
+
+class _Flusher:
+    """Flushes buffered handlers whose interval has passed."""
+
+    TICK = FLUSH_INTERVAL / 4
+
+    def __init__(self):
+        self._handlers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, handler):
+        with self._lock:
+            self._handlers.add(handler)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                        target=self._run, name='nsl.logging-flusher',
+                        daemon=True)
+                self._thread.start()
+
+    def discard(self, handler):
+        with self._lock:
+            self._handlers.discard(handler)
+
+    def _run(self):
+        while True:
+            time.sleep(self.TICK)
+            now = time.monotonic()
+            with self._lock:
+                handlers = list(self._handlers)
+            for handler in handlers:
+                deadline = handler.deadline
+                if deadline is not None and now >= deadline:
+                    try:
+                        handler.flush()
+                    except Exception:
+                        if logging.raiseExceptions:
+                            traceback.print_exc(file=sys.stderr)
+
+
+_flusher = _Flusher()
+
+
+#################################################
+# rotation
+
+class RotatingFileHandler(logging.FileHandler):
+    """A file handler that rotates by size and/or time.
+
+    The file is rotated before writing a record that would take it past
+    "maxbytes" characters, or once "interval" seconds have passed (at
+    multiples of "interval" since the epoch, so an interval of 3600
+    rotates on the hour).  Either may be None (the default is to rotate
+    at 100 MB only).  Time-based rotation is checked as records come
+    in.
+
+    Rotating is a single rename, to the filename plus a timestamp (e.g.
+    "app.log.20240101-120000").  Everything else happens on a background
+    thread, so the logging thread never waits on it: the rotated file is
+    compressed (see below) and then all but the newest "backups" rotated
+    files are removed.  Closing the handler waits for any of that still
+    pending.
+
+    "compress" may be "gzip", "zstd" (requires the zstandard package),
+    True (zstd if available, otherwise gzip), or None to not compress.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 errors=None, *, maxbytes=MAX_BYTES, interval=None,
+                 backups=BACKUPS, compress=True):
+        self.maxbytes = maxbytes
+        self.interval = interval
+        self.backups = backups
+        self.compress = _resolve_compression(compress)
+        self.size = 0
+        self.rollover_at = None
+        self._pending = []
+        super().__init__(filename, mode, encoding, delay, errors)
+        if self.stream is None and 'a' in mode:
+            # The file isn't open yet but it still counts.
+            try:
+                self.size = os.path.getsize(self.baseFilename)
+            except OSError:
+                pass
+        if interval is not None:
+            self.rollover_at = self._next_rollover(time.time())
+
+    def _next_rollover(self, now):
+        return (now // self.interval + 1) * self.interval
+
+    def _open(self):
+        stream = super()._open()
+        try:
+            self.size = os.fstat(stream.fileno()).st_size
+        except (AttributeError, OSError):
+            self.size = 0
+        return stream
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self._should_rollover(len(msg)):
+                self.doRollover()
+            if self.stream is None:
+                if self.mode == 'w' and self._closed:
+                    return
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.stream.flush()
+            self.size += len(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _should_rollover(self, size):
+        if self.maxbytes is not None:
+            if self.size and self.size + size > self.maxbytes:
+                return True
+        if self.rollover_at is not None:
+            if time.time() >= self.rollover_at:
+                return True
+        return False
+
+    def doRollover(self):
+        """Rotate the file now."""
+        now = time.time()
+        if self.rollover_at is not None:
+            self.rollover_at = self._next_rollover(now)
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.size = 0
+        if os.path.exists(self.baseFilename):
+            rotated = self._rotated_name(now)
+            os.rename(self.baseFilename, rotated)
+            self._pending = [e for e in self._pending if not e.is_set()]
+            self._pending.append(
+                    _compressor.submit(self._finish_rotation, rotated))
+        if not self.delay:
+            self.stream = self._open()
+
+    def _rotated_name(self, now):
+        suffix = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+        base = '{}.{}'.format(self.baseFilename, suffix)
+        name = base
+        count = 0
+        while self._exists(name):
+            count += 1
+            name = '{}.{}'.format(base, count)
+        return name
+
+    def _exists(self, name):
+        if os.path.exists(name):
+            return True
+        return any(os.path.exists(name + ext) for ext in _EXTENSIONS.values())
+
+    def _finish_rotation(self, rotated):
+        # This runs on the background thread.
+        if self.compress is not None:
+            try:
+                _compress(rotated, self.compress)
+            except FileNotFoundError:
+                # It was already removed as one of the oldest.
+                pass
+        self._remove_old()
+
+    def rotated_files(self):
+        """Return the rotated files that still exist, oldest first."""
+        dirname, basename = os.path.split(self.baseFilename)
+        # Only names this handler creates (see _rotated_name()).
+        pattern = re.compile(
+                r'{}\.\d{{8}}-\d{{6}}(?:\.\d+)?(?:{})?\Z'.format(
+                    re.escape(basename),
+                    '|'.join(map(re.escape, _EXTENSIONS.values()))))
+        files = []
+        for name in os.listdir(dirname):
+            if not pattern.match(name):
+                continue
+            filename = os.path.join(dirname, name)
+            try:
+                mtime = os.stat(filename).st_mtime
+            except FileNotFoundError:
+                continue
+            files.append((mtime, filename))
+        return [filename for _, filename in sorted(files)]
+
+    def _remove_old(self):
+        if self.backups is None:
+            return
+        files = self.rotated_files()
+        for filename in files[:max(0, len(files) - self.backups)]:
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        # Let any pending compression finish.
+        for done in self._pending:
+            done.wait()
+        self._pending = []
+        super().close()
+
+
+_EXTENSIONS = {
+        'gzip': '.gz',
+        'zstd': '.zst',
+        }
+
+
+def _resolve_compression(compress):
+    if compress is True:
+        return 'zstd' if zstandard is not None else 'gzip'
+    elif not compress:
+        return None
+    elif compress not in _EXTENSIONS:
+        raise ValueError('unsupported compression {!r}'.format(compress))
+    elif compress == 'zstd' and zstandard is None:
+        raise ValueError('zstd compression requires the zstandard package')
+    return compress
+
+
+def _compress(filename, compress):
+    target = filename + _EXTENSIONS[compress]
+    tmp = target + '.tmp'
+    with open(filename, 'rb') as infile, open(tmp, 'wb') as outfile:
+        if compress == 'zstd':
+            cctx = zstandard.ZstdCompressor()
+            cctx.copy_stream(infile, outfile)
+        else:
+            with gzip.GzipFile(fileobj=outfile, mode='wb',
+                               compresslevel=6) as gzfile:
+                shutil.copyfileobj(infile, gzfile, 1024 * 1024)
+    shutil.copystat(filename, tmp)
+    os.replace(tmp, target)
+    os.unlink(filename)
+    return target
+
+
+class _Compressor:
+    """Runs rotation jobs (compressing, removing) in the background."""
+
+    def __init__(self):
+        self._jobs = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func, *args):
+        """Queue func(*args) and return an event set when it's done."""
+        done = threading.Event()
+        self._jobs.put((func, args, done))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                        target=self._run, name='nsl.logging-compressor',
+                        daemon=True)
+                self._thread.start()
+        return done
+
+    def _run(self):
+        while True:
+            func, args, done = self._jobs.get()
+            try:
+                func(*args)
+            except Exception:
+                if logging.raiseExceptions:
+                    traceback.print_exc(file=sys.stderr)
+            finally:
+                done.set()
+
+
+_compressor = _Compressor()
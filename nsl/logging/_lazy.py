@@ -0,0 +1,67 @@
+import logging
+import types
+
+
+class lazy:
+    """A log message arg that is only computed if it gets formatted.
+
+        log.debug('state: %s', lazy(repr, state))
+
+    func(*args, **kwargs) is called the first time the arg is formatted
+    (i.e. when a handler formats the record) and the result is reused
+    after that, even if several handlers format the record.  If every
+    handler filters the record out then it is never called.
+
+    Both "%s" and "%r" (and str.format() conversions) use the computed
+    value.
+    """
+
+    __slots__ = ('func', 'args', 'kwargs', '_value')
+
+    _NOT_SET = object()
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._value = self._NOT_SET
+
+    @property
+    def value(self):
+        """The computed value (computed now if not done yet)."""
+        value = self._value
+        if value is self._NOT_SET:
+            value = self._value = self.func(*self.args, **self.kwargs)
+        return value
+
+    def __str__(self):
+        return str(self.value)
+
+    def __repr__(self):
+        return repr(self.value)
+
+    def __format__(self, spec):
+        return format(self.value, spec)
+
+
+class LazyAdapter(logging.LoggerAdapter):
+    """A logger adapter that treats function args as lazy ones.
+
+    Any plain function (e.g. a lambda) passed as a message arg is
+    wrapped in lazy(), so it is only called if the record gets
+    formatted:
+
+        log.debug('state: %s', lambda: expensive(state))
+
+    Other args are passed through as-is.  Nothing at all happens for a
+    level the logger doesn't have enabled.
+    """
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            args = [lazy(arg) if type(arg) is types.FunctionType else arg
+                    for arg in args]
+            # Account for this frame when finding the caller.
+            kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+            self.logger.log(level, msg, *args, **kwargs)
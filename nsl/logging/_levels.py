@@ -0,0 +1,125 @@
+import logging
+import threading
+import weakref
+
+
+class LoggerProxy:
+    """A thin wrapper around a logger that caches its enabled levels.
+
+    The is_debug, is_info, is_warning, is_error, and is_critical
+    attributes are precomputed booleans, so checking them is a single
+    attribute lookup:
+
+        if log.is_debug:
+            log.debug('state: %r', expensive())
+
+    The logging methods (debug(), info(), etc.) check the corresponding
+    attribute before doing anything else, so a call for a disabled
+    level costs about as little as a method call can.
+
+    The cached values are refreshed whenever the logging configuration
+    changes levels (i.e. whenever the logging module clears its own
+    level cache, as Logger.setLevel() and logging.disable() do).  Call
+    refresh() directly after changing anything else that affects
+    isEnabledFor(), like the logger's "disabled" attribute.
+
+    The wrapped logger is available as the "logger" attribute.  (Other
+    attributes are deliberately not forwarded to it, since a custom
+    __getattr__() would slow down every attribute lookup on the proxy.)
+    """
+
+    __slots__ = (
+            'logger', 'is_debug', 'is_info', 'is_warning', 'is_error',
+            'is_critical', '__weakref__',
+            )
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.refresh()
+        _watch(self)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.logger)
+
+    @property
+    def name(self):
+        return self.logger.name
+
+    def refresh(self):
+        """Update the cached levels from the wrapped logger."""
+        enabled = self.logger.isEnabledFor
+        self.is_debug = enabled(logging.DEBUG)
+        self.is_info = enabled(logging.INFO)
+        self.is_warning = enabled(logging.WARNING)
+        self.is_error = enabled(logging.ERROR)
+        self.is_critical = enabled(logging.CRITICAL)
+
+    def debug(self, msg, *args, **kwargs):
+        if self.is_debug:
+            self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self.is_info:
+            self._log(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        if self.is_warning:
+            self._log(logging.WARNING, msg, args, kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        if self.is_error:
+            self._log(logging.ERROR, msg, args, kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        if self.is_error:
+            kwargs['exc_info'] = exc_info
+            self._log(logging.ERROR, msg, args, kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        if self.is_critical:
+            self._log(logging.CRITICAL, msg, args, kwargs)
+
+    def log(self, level, msg, *args, **kwargs):
+        self._log(level, msg, args, kwargs)
+
+    def _log(self, level, msg, args, kwargs):
+        # Account for the proxy's frames when finding the caller.
+        kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 2
+        self.logger.log(level, msg, *args, **kwargs)
+
+
+#################################################
+# refreshing
+
+# Each logging.Manager (normally just the one) gets its _clear_cache()
+# wrapped so that its proxies are refreshed along with the cache.
+_proxies = weakref.WeakKeyDictionary()
+_proxies_lock = threading.Lock()
+
+
+def _watch(proxy):
+    manager = proxy.logger.manager
+    with _proxies_lock:
+        try:
+            proxies = _proxies[manager]
+        except KeyError:
+            proxies = _proxies[manager] = weakref.WeakSet()
+            _wrap_clear_cache(manager, proxies)
+        proxies.add(proxy)
+
+
+def _wrap_clear_cache(manager, proxies):
+    clear_cache = manager._clear_cache
+
+    def _clear_cache():
+        clear_cache()
+        for proxy in list(proxies):
+            proxy.refresh()
+    manager._clear_cache = _clear_cache
+
+
+def refresh_proxies():
+    """Refresh all LoggerProxy objects (see LoggerProxy.refresh())."""
+    for proxies in list(_proxies.values()):
+        for proxy in list(proxies):
+            proxy.refresh()
@@ -0,0 +1,293 @@
+import bisect
+import itertools
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import weakref
+
+from ._asyncio import AsyncioHandler
+from ._perthread import PerThreadHandler
+from ._queue import QueueingHandler
+
+
+# The upper bounds (in seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (
+        1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+        1e-3, 1e-2, 0.1, 1.0,
+        )
+
+
+class Histogram:
+    """A fixed-bucket histogram, like Prometheus has."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        """Return the cumulative count for each bucket, plus totals.
+
+        The last bucket has an upper bound of float('inf').
+        """
+        cumulative = list(itertools.accumulate(self.counts))
+        bounds = self.buckets + (float('inf'),)
+        return {
+                'buckets': list(zip(bounds, cumulative)),
+                'count': self.count,
+                'sum': self.sum,
+                }
+
+
+class HandlerMetrics:
+    """The counters for one instrumented handler (see instrument())."""
+
+    def __init__(self, name, *, buckets=LATENCY_BUCKETS, queue=None):
+        self.name = name
+        self.records = {}
+        self.bytes = 0
+        self.format_latency = Histogram(buckets)
+        self.emit_latency = Histogram(buckets)
+        self.lock_held = 0.0
+        self.lock_wait = 0.0
+        self.queue = queue
+
+    def snapshot(self):
+        """Return a dict of the current values."""
+        snapshot = {
+                'records': dict(self.records),
+                'bytes': self.bytes,
+                'format_seconds': self.format_latency.snapshot(),
+                'emit_seconds': self.emit_latency.snapshot(),
+                'lock_held_seconds': self.lock_held,
+                'lock_wait_seconds': self.lock_wait,
+                }
+        if self.queue is not None:
+            snapshot['queue_depth'] = self.queue.queue.qsize()
+            snapshot['dropped'] = self.queue.dropped
+        return snapshot
+
+
+#################################################
+# instrumenting handlers
+
+_instrumented = weakref.WeakKeyDictionary()
+_instrumented_lock = threading.Lock()
+_ids = itertools.count(1)
+_clock = time.perf_counter
+
+
+def instrument(handler, name=None, *, buckets=LATENCY_BUCKETS):
+    """Start collecting metrics for the handler and return them.
+
+    This counts the records emitted per level and the bytes formatted,
+    and keeps histograms of the time spent in format() and emit().  It
+    also totals the time spent waiting for and holding the handler's
+    lock.  For a QueueingHandler, the queue depth and the number of
+    dropped records are included, and the wrapped handlers (which do
+    the actual formatting and writing) get instrumented too.
+
+    Handlers that avoid taking their lock when handling a record keep
+    doing so.  For a PerThreadHandler only the wrapped handlers are
+    instrumented, since that's where the work happens.  For an
+    AsyncioHandler the lock times aren't collected (and the counts may
+    be slightly off if several threads log through it at once).
+
+    "name" identifies the handler in metrics_snapshot().  It defaults
+    to the handler's name, if it has one.
+
+    The handler's handle() and format() methods are replaced on the
+    instance, so handlers that aren't instrumented pay nothing at all.
+    """
+    with _instrumented_lock:
+        metrics = _instrumented.get(handler)
+        if metrics is not None:
+            return metrics
+        if name is None:
+            name = handler.get_name() or '{}-{}'.format(
+                    type(handler).__name__, next(_ids))
+        queue = handler if isinstance(handler, QueueingHandler) else None
+        metrics = _instrumented[handler] = HandlerMetrics(
+                name, buckets=buckets, queue=queue)
+    if isinstance(handler, (QueueingHandler, PerThreadHandler)):
+        for i, wrapped in enumerate(handler.handlers):
+            instrument(wrapped, '{}.{}'.format(name, i), buckets=buckets)
+    if isinstance(handler, PerThreadHandler):
+        return metrics
+    _wrap_format(handler, metrics,
+                 not isinstance(handler, logging.handlers.QueueHandler))
+    if isinstance(handler, AsyncioHandler):
+        _wrap_emit(handler, metrics)
+    else:
+        _wrap_handle(handler, metrics)
+    return metrics
+
+
+def _wrap_format(handler, metrics, count_bytes):
+    format = handler.format
+    terminator = getattr(handler, 'terminator', '')
+    observe = metrics.format_latency.observe
+
+    def timed_format(record):
+        start = _clock()
+        text = format(record)
+        observe(_clock() - start)
+        if count_bytes:
+            size = len(text) + len(terminator)
+            if not text.isascii():
+                size += len(text.encode('utf-8')) - len(text)
+            metrics.bytes += size
+        return text
+    handler.format = timed_format
+
+
+def _wrap_handle(handler, metrics):
+    # This matches what logging.Handler.handle() does.
+    records = metrics.records
+    observe = metrics.emit_latency.observe
+
+    def timed_handle(record):
+        rv = handler.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            start = _clock()
+            handler.acquire()
+            try:
+                acquired = _clock()
+                handler.emit(record)
+            finally:
+                # We still hold the lock, so updating is thread-safe.
+                held = _clock() - acquired
+                observe(held)
+                metrics.lock_held += held
+                metrics.lock_wait += acquired - start
+                level = record.levelname
+                records[level] = records.get(level, 0) + 1
+                handler.release()
+        return rv
+    handler.handle = timed_handle
+
+
+def _wrap_emit(handler, metrics):
+    # For handlers that don't take their lock in handle().
+    records = metrics.records
+    observe = metrics.emit_latency.observe
+    emit = handler.emit
+
+    def timed_emit(record):
+        start = _clock()
+        try:
+            emit(record)
+        finally:
+            observe(_clock() - start)
+            level = record.levelname
+            records[level] = records.get(level, 0) + 1
+    handler.emit = timed_emit
+
+
+def metrics_snapshot():
+    """Return a snapshot of the metrics of all instrumented handlers.
+
+    The dict maps each handler's name to its HandlerMetrics.snapshot().
+    """
+    with _instrumented_lock:
+        metrics = list(_instrumented.values())
+    return {m.name: m.snapshot() for m in metrics}
+
+
+#################################################
+# Prometheus
+
+_PREFIX = 'nsl_logging_'
+_HELP = {
+        'records_total': ('counter', 'Records emitted, by level.'),
+        'bytes_total': ('counter', 'Bytes formatted for output.'),
+        'format_seconds': ('histogram', 'Time spent formatting records.'),
+        'emit_seconds': ('histogram', 'Time spent emitting records.'),
+        'lock_held_seconds_total': (
+                'counter', 'Time spent holding the handler lock.'),
+        'lock_wait_seconds_total': (
+                'counter', 'Time spent waiting for the handler lock.'),
+        'queue_depth': ('gauge', 'Records waiting in the queue.'),
+        'dropped_total': ('counter', 'Records dropped by a full queue.'),
+        }
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v))
+                          for k, v in labels.items()) + '}'
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _bound(value):
+    return '+Inf' if value == float('inf') else repr(value)
+
+
+def format_prometheus(snapshot=None):
+    """Return the metrics in the Prometheus text exposition format.
+
+    "snapshot" defaults to metrics_snapshot().
+    """
+    if snapshot is None:
+        snapshot = metrics_snapshot()
+    samples = {name: [] for name in _HELP}
+    for handler, values in sorted(snapshot.items()):
+        for level, count in sorted(values['records'].items()):
+            samples['records_total'].append(
+                    (_labels(handler=handler, level=level), count))
+        samples['bytes_total'].append(
+                (_labels(handler=handler), values['bytes']))
+        for name in ('format_seconds', 'emit_seconds'):
+            hist = values[name]
+            for bound, count in hist['buckets']:
+                labels = _labels(handler=handler, le=_bound(bound))
+                samples[name].append(('_bucket' + labels, count))
+            labels = _labels(handler=handler)
+            samples[name].append(('_sum' + labels, hist['sum']))
+            samples[name].append(('_count' + labels, hist['count']))
+        samples['lock_held_seconds_total'].append(
+                (_labels(handler=handler), values['lock_held_seconds']))
+        samples['lock_wait_seconds_total'].append(
+                (_labels(handler=handler), values['lock_wait_seconds']))
+        if 'queue_depth' in values:
+            samples['queue_depth'].append(
+                    (_labels(handler=handler), values['queue_depth']))
+            samples['dropped_total'].append(
+                    (_labels(handler=handler), values['dropped']))
+
+    lines = []
+    for name, (kind, text) in _HELP.items():
+        if not samples[name]:
+            continue
+        lines.append('# HELP {}{} {}'.format(_PREFIX, name, text))
+        lines.append('# TYPE {}{} {}'.format(_PREFIX, name, kind))
+        for suffix, value in samples[name]:
+            lines.append('{}{}{} {}'.format(_PREFIX, name, suffix, value))
+    return ''.join(line + '\n' for line in lines)
+
+
+def write_prometheus(filename, snapshot=None):
+    """Write the metrics to a Prometheus text file.
+
+    The file is replaced atomically, as node_exporter's textfile
+    collector expects.  Call this periodically (e.g. from a timer
+    thread or a cron-like hook) to export the metrics.
+    """
+    text = format_prometheus(snapshot)
+    tmp = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(tmp, 'w') as outfile:
+        outfile.write(text)
+    os.replace(tmp, filename)
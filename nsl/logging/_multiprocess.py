@@ -0,0 +1,249 @@
+import logging
+import os
+import os.path
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+
+from ._codec import encode_record, decode_record
+from ._config import _resolve_logger
+
+
+# Each encoded record is sent with its size as a prefix.
+_SIZE = struct.Struct('<I')
+
+
+class LogAggregator:
+    """Receives log records from other processes and handles them here.
+
+    The aggregator listens on a Unix socket ("address", a temporary one
+    by default) and a thread passes each record it receives to the
+    given handlers, which are only ever used from this process.  So,
+    for example, a set of worker processes can share a single log file
+    without interleaving lines or contending on the file.
+
+    Records are sent by AggregatorHandler, in a compact binary encoding
+    (see encode_record()).  Use aggregate_logs() to set up a logger to
+    use one before creating worker processes.
+    """
+
+    def __init__(self, *handlers, address=None):
+        if not handlers:
+            raise TypeError('at least one handler is required')
+        self.handlers = handlers
+        self._tmpdir = None
+        if address is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='nsl-logging-')
+            address = os.path.join(self._tmpdir.name, 'aggregator.sock')
+        self.address = address
+        self._thread = None
+        self._sock = None
+        self._wakeup = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Start listening for records on a background thread."""
+        if self._thread is not None:
+            raise RuntimeError('already started')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.address)
+        sock.listen()
+        sock.setblocking(False)
+        self._sock = sock
+        self._wakeup = socket.socketpair()
+        self._thread = threading.Thread(
+                target=self._run, name='nsl.logging-aggregator', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the thread, after handling any records already sent.
+
+        The handlers are closed as well.
+        """
+        if self._thread is None:
+            if self._tmpdir is not None:
+                self._tmpdir.cleanup()
+            return
+        self._wakeup[1].send(b'x')
+        self._thread.join()
+        self._thread = None
+        for sock in (self._sock, *self._wakeup):
+            sock.close()
+        try:
+            os.unlink(self.address)
+        except FileNotFoundError:
+            pass
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+        for handler in self.handlers:
+            handler.close()
+
+    def handler(self, level=logging.NOTSET):
+        """Return a new AggregatorHandler for this aggregator."""
+        return AggregatorHandler(self.address, level)
+
+    def handle(self, record):
+        """Pass the record on to each of the handlers."""
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _run(self):
+        buffers = {}
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._sock, selectors.EVENT_READ)
+            selector.register(self._wakeup[0], selectors.EVENT_READ)
+            stopping = False
+            while True:
+                # Once we're stopping, only handle what's already there.
+                events = selector.select(0 if stopping else None)
+                if stopping and not events:
+                    break
+                for key, _ in events:
+                    sock = key.fileobj
+                    if sock is self._wakeup[0]:
+                        sock.recv(1)
+                        # Take the connections that were already made
+                        # (they may have sent records) but no new ones.
+                        self._accept(selector, buffers)
+                        selector.unregister(self._sock)
+                        stopping = True
+                    elif sock is self._sock:
+                        if not stopping:
+                            self._accept(selector, buffers)
+                    elif not self._receive(sock, buffers[sock]):
+                        selector.unregister(sock)
+                        del buffers[sock]
+                        sock.close()
+        for conn in buffers:
+            conn.close()
+
+    def _accept(self, selector, buffers):
+        # Take all the pending connections.
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            selector.register(conn, selectors.EVENT_READ)
+            buffers[conn] = bytearray()
+
+    def _receive(self, conn, buf):
+        try:
+            data = conn.recv(65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        buf += data
+        view = memoryview(buf)
+        offset = 0
+        try:
+            while len(buf) - offset >= _SIZE.size:
+                size, = _SIZE.unpack_from(buf, offset)
+                end = offset + _SIZE.size + size
+                if end > len(buf):
+                    break
+                record = decode_record(view[offset + _SIZE.size:end])
+                offset = end
+                self.handle(record)
+        finally:
+            view.release()
+        del buf[:offset]
+        return True
+
+
+class AggregatorHandler(logging.Handler):
+    """A handler that sends records to a LogAggregator.
+
+    The connection is made lazily and is made again in a forked child
+    process, so the handler may be set up before forking.  Records that
+    can't be sent are reported through handleError().
+    """
+
+    def __init__(self, address, level=logging.NOTSET):
+        super().__init__(level)
+        self.address = address
+        self._sock = None
+        self._pid = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def emit(self, record):
+        try:
+            data = encode_record(record)
+            pid = os.getpid()
+            if self._pid != pid:
+                # We are in a new (e.g. forked) process.
+                self._sock = self._connect()
+                self._pid = pid
+            self._sock.sendall(_SIZE.pack(len(data)) + data)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._sock is not None and self._pid == os.getpid():
+                self._sock.close()
+            self._sock = None
+            self._pid = None
+        finally:
+            self.release()
+        super().close()
+
+
+def aggregate_logs(logger=None, *handlers, address=None):
+    """Route a logger's records through a new LogAggregator.
+
+    The aggregator is started with the given handlers (or the logger's
+    current handlers) and the logger's handlers are replaced with a
+    single AggregatorHandler.  "logger" is the root logger by default.
+    The aggregator is returned; close it when done.
+
+    Call this before forking worker processes; the children will then
+    send their records to the aggregator.  For spawned processes, call
+    connect_logs() with the aggregator's address in each child (e.g. in
+    a pool initializer).
+    """
+    logger = _resolve_logger(logger)
+    if not handlers:
+        handlers = tuple(logger.handlers)
+    aggregator = LogAggregator(*handlers, address=address)
+    aggregator.start()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(aggregator.handler())
+    return aggregator
+
+
+def connect_logs(address, logger=None, level=logging.NOTSET):
+    """Send the logger's records to the LogAggregator at the address.
+
+    Any handlers the logger already has are replaced.  "logger" is the
+    root logger by default.  The new AggregatorHandler is returned.
+    """
+    logger = _resolve_logger(logger)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = AggregatorHandler(address, level)
+    logger.addHandler(handler)
+    return handler
@@ -0,0 +1,214 @@
+import collections
+import heapq
+import logging
+import operator
+import sys
+import threading
+import traceback
+
+
+FLUSH_INTERVAL = 0.1  # seconds
+CAPACITY = 1000  # records per thread
+MAX_BUFFER = 10000  # records per thread
+
+
+class PerThreadHandler(logging.Handler):
+    """A handler that buffers records per thread, without locking.
+
+    logging.Handler.handle() takes the handler's lock around every
+    emit(), which becomes a point of contention when many threads log
+    through the same handler.  This handler never takes a lock when
+    handling a record.  Instead each thread appends the record to its
+    own buffer, and a single flusher thread regularly drains all the
+    buffers into the wrapped handlers (which do the formatting and
+    I/O).  That happens every "interval" seconds, when any thread's
+    buffer reaches "capacity" records, and when the handler is flushed
+    or closed.
+
+    Records from any one thread are always handled in the order they
+    were logged.  If "ordered" is true then the records drained from
+    all the threads at once are merged in order of their timestamps
+    (record.created); otherwise they are handled one thread at a time.
+
+    If a thread's buffer already has "maxsize" records (e.g. because the
+    wrapped handlers can't keep up) then the record is dropped (and
+    counted in "dropped"), unless "block" is True, in which case the
+    logging thread waits up to "timeout" seconds (or indefinitely) for
+    the buffer to be drained before dropping it.
+
+    If any of a record's args could change (i.e. aren't str, int, float,
+    bool, bytes or None) then, as with logging.handlers.QueueHandler, a
+    copy of the record is buffered instead, with the message merged with
+    its args, so later changes to the args don't affect it.  The record
+    itself is never modified, so other handlers still get it as-is.
+    """
+
+    def __init__(self, *handlers, interval=FLUSH_INTERVAL, capacity=CAPACITY,
+                 ordered=False, maxsize=MAX_BUFFER, block=False,
+                 timeout=None):
+        if not handlers:
+            raise TypeError('at least one handler is required')
+        super().__init__()
+        self.handlers = handlers
+        self.interval = interval
+        self.capacity = capacity
+        self.ordered = ordered
+        self.maxsize = maxsize
+        self.block = block
+        self.timeout = timeout
+        self.dropped = 0
+        self._droplock = threading.Lock()
+        self._drained = threading.Condition()
+        self._local = threading.local()
+        self._buffers = []  # [(thread, deque)]
+        self._buffers_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(
+                target=self._run, name='nsl.logging-perthread', daemon=True)
+        self._thread.start()
+
+    def setFormatter(self, fmt):
+        for handler in self.handlers:
+            if handler.formatter is None:
+                handler.setFormatter(fmt)
+
+    def handle(self, record):
+        # Unlike logging.Handler.handle(), no lock is taken.
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._add_buffer()
+        if len(buffer) >= self.maxsize and not self._wait_for_room(buffer):
+            with self._droplock:
+                self.dropped += 1
+            return
+        args = record.args
+        if args and not (type(args) is tuple and
+                         _IMMUTABLE.issuperset(map(type, args))):
+            # The args could change before the record gets handled.
+            try:
+                record = _frozen(record)
+            except Exception:
+                self.handleError(record)
+                return
+        buffer.append(record)
+        if len(buffer) >= self.capacity:
+            self._wakeup.set()
+
+    def _wait_for_room(self, buffer):
+        self._wakeup.set()
+        if not self.block:
+            return False
+        with self._drained:
+            return self._drained.wait_for(
+                    lambda: len(buffer) < self.maxsize or self._stopping,
+                    self.timeout) and len(buffer) < self.maxsize
+
+    def _add_buffer(self):
+        buffer = self._local.buffer = collections.deque()
+        with self._buffers_lock:
+            self._buffers.append((threading.current_thread(), buffer))
+        return buffer
+
+    def flush(self):
+        """Pass all buffered records to the wrapped handlers now."""
+        with self._drain_lock:
+            batches = self._drain()
+            if not batches:
+                return
+            with self._drained:
+                self._drained.notify_all()
+            if self.ordered and len(batches) > 1:
+                records = heapq.merge(*batches,
+                                      key=operator.attrgetter('created'))
+            else:
+                records = (r for batch in batches for r in batch)
+            for record in records:
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+
+    def _drain(self):
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+        batches = []
+        finished = []
+        for thread, buffer in buffers:
+            # Only the owning thread appends and only one drainer pops
+            # at a time (under _drain_lock), which deques handle safely.
+            count = len(buffer)
+            if count:
+                batches.append([buffer.popleft() for _ in range(count)])
+            elif not thread.is_alive():
+                finished.append((thread, buffer))
+        if finished:
+            with self._buffers_lock:
+                for entry in finished:
+                    if not entry[1]:
+                        self._buffers.remove(entry)
+        return batches
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                if logging.raiseExceptions:
+                    traceback.print_exc(file=sys.stderr)
+
+    def close(self):
+        self.acquire()
+        try:
+            stopping, self._stopping = self._stopping, True
+        finally:
+            self.release()
+        if not stopping:
+            with self._drained:
+                # Don't leave any logging threads waiting for room.
+                self._drained.notify_all()
+            self._wakeup.set()
+            self._thread.join()
+            self.flush()
+            for handler in self.handlers:
+                handler.close()
+        super().close()
+
+
+# Args of these types can't change, so they don't need to be merged.
+_IMMUTABLE = frozenset([str, int, float, bool, type(None), bytes])
+
+
+def _frozen(record):
+    # Return a copy of the record with its args merged into the message.
+    msg = record.getMessage()
+    copied = record.__class__.__new__(record.__class__)
+    copied.__dict__.update(record.__dict__)
+    copied.msg = msg
+    copied.args = None
+    return copied
+
+
+def per_thread_handler(*handlers, **kwargs):
+    """Return a PerThreadHandler wrapping the given handlers.
+
+    "level" is taken from the wrapped handlers (the lowest one).
+    """
+    handler = PerThreadHandler(*handlers, **kwargs)
+    levels = [h.level for h in handlers]
+    if all(levels):
+        handler.setLevel(min(levels))
+    return handler
@@ -0,0 +1,121 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import threading
+import weakref
+
+
+QUEUE_SIZE = 10000
+
+_formatter = logging.Formatter()
+
+
+class _Listener(logging.handlers.QueueListener):
+
+    def enqueue_sentinel(self):
+        # The stdlib uses put_nowait(), which fails if the queue is full.
+        # Blocking is fine here since the listener thread is draining it.
+        self.queue.put(self._sentinel)
+
+
+class QueueingHandler(logging.handlers.QueueHandler):
+    """A handler that hands records off to other handlers on a thread.
+
+    The records are put on a bounded queue and a managed listener
+    thread passes them to the wrapped handlers, which do the actual
+    (possibly slow) I/O.  If the queue is full then the record is
+    dropped (and counted in "dropped"), unless "block" is True, in
+    which case the logging thread waits up to "timeout" seconds (or
+    indefinitely) before dropping it.
+
+    Only the message is merged (and any traceback rendered to text,
+    so the frames aren't kept alive) before a record is queued.  The
+    rest of the formatting happens on the listener thread, so
+    setFormatter() sets the formatter on any wrapped handlers that
+    don't have one.
+
+    The listener thread is stopped (after the queue is drained) when
+    the handler is closed, which happens at exit at the latest.
+    """
+
+    def __init__(self, *handlers, maxsize=QUEUE_SIZE, block=False,
+                 timeout=None):
+        if not handlers:
+            raise TypeError('at least one handler is required')
+        super().__init__(queue.Queue(maxsize))
+        self.handlers = handlers
+        self.block = block
+        self.timeout = timeout
+        self.dropped = 0
+        self._droplock = threading.Lock()
+
+        self.listener = _Listener(self.queue, *handlers,
+                                  respect_handler_level=True)
+        self.listener.start()
+        _live.add(self)
+
+    def setFormatter(self, fmt):
+        for handler in self.handlers:
+            if handler.formatter is None:
+                handler.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Unlike the stdlib, don't format the whole record here (on the
+        # logging thread); that is left to the wrapped handlers.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.block:
+                self.queue.put(record, timeout=self.timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._droplock:
+                self.dropped += 1
+
+    def close(self):
+        self.acquire()
+        try:
+            listener, self.listener = self.listener, None
+        finally:
+            self.release()
+        if listener is not None:
+            listener.stop()
+            for handler in self.handlers:
+                handler.close()
+            _live.discard(self)
+        super().close()
+
+
+def queued_handler(*handlers, **kwargs):
+    """Return a QueueingHandler wrapping the given handlers.
+
+    "level" is taken from the wrapped handlers (the lowest one).
+    """
+    handler = QueueingHandler(*handlers, **kwargs)
+    levels = [h.level for h in handlers]
+    if all(levels):
+        handler.setLevel(min(levels))
+    return handler
+
+
+#################################################
+# cleanup
+
+_live = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all():
+    for handler in list(_live):
+        handler.close()
@@ -0,0 +1,196 @@
+import logging
+import mmap
+import os
+import struct
+
+from ._codec import encode_record, decode_record
+
+
+RING_SIZE = 8 * 1024 * 1024  # bytes
+
+# The file starts with a fixed-size header:
+#   magic, mode, capacity, head, tail
+# "head" and "tail" are absolute byte counts (the ring offset is the
+# count modulo "capacity").  The records between them are complete.
+_MAGIC = b'NSLRING1'
+_HEADER = struct.Struct('<8sB7xQQQ')
+_HEADER_SIZE = 64
+_HEAD_OFFSET = 24
+_POSITION = struct.Struct('<Q')
+# Each record is stored as its size followed by the data.
+_SIZE = struct.Struct('<I')
+
+_BINARY = 1
+_TEXT = 2
+
+
+class RingBufferHandler(logging.Handler):
+    """A handler that keeps the most recent records in a ring buffer.
+
+    The ring is a fixed-size file ("size" bytes plus a small header)
+    that is memory-mapped, so writing a record is just a copy into
+    memory and the OS writes it out lazily, even if the process then
+    crashes.  Once the ring is full the oldest records are overwritten.
+    That makes it a cheap "flight recorder" for DEBUG logging: use
+    read_ring() (or "python3 -m nsl.logging read-ring FILE") to get the
+    last records after a crash.
+
+    If "binary" is true (the default) then records are stored with
+    encode_record() and the formatter isn't used; otherwise the
+    formatted text is stored.  Beyond that encoding, writing a record
+    doesn't allocate anything.
+
+    An existing ring file with the same size and mode is reused (and
+    added to); otherwise the file is created or replaced.
+    """
+
+    def __init__(self, filename, size=RING_SIZE, level=logging.DEBUG, *,
+                 binary=True):
+        super().__init__(level)
+        self.filename = os.path.abspath(filename)
+        self.capacity = size
+        self.binary = binary
+        self.dropped = 0
+        self._scratch = bytearray(_SIZE.size)
+        self._map = _open_ring(self.filename, size,
+                               _BINARY if binary else _TEXT)
+        _, _, _, self._head, self._tail = _HEADER.unpack_from(self._map)
+
+    def emit(self, record):
+        try:
+            if self.binary:
+                data = encode_record(record)
+            else:
+                data = self.format(record).encode('utf-8', 'surrogateescape')
+        except Exception:
+            self.handleError(record)
+            return
+        if self._map is None:
+            return
+        self._write(data)
+
+    def _write(self, data):
+        needed = _SIZE.size + len(data)
+        if needed > self.capacity:
+            self.dropped += 1
+            return
+        ring = self._map
+        head = self._head
+        tail = self._tail
+        if head + needed - tail > self.capacity:
+            # Make room by dropping the oldest records first, so a
+            # reader never sees a record that is partly overwritten.
+            while head + needed - tail > self.capacity:
+                tail += _SIZE.size + self._read_size(tail)
+            self._tail = tail
+            _POSITION.pack_into(ring, _HEAD_OFFSET + 8, tail)
+        offset = head % self.capacity
+        if offset <= self.capacity - _SIZE.size:
+            _SIZE.pack_into(ring, _HEADER_SIZE + offset, len(data))
+        else:
+            _SIZE.pack_into(self._scratch, 0, len(data))
+            self._put(head, self._scratch)
+        self._put(head + _SIZE.size, data)
+        # Publish the record only once it is all there.
+        self._head = head + needed
+        _POSITION.pack_into(ring, _HEAD_OFFSET, self._head)
+
+    def _put(self, pos, data):
+        offset = pos % self.capacity
+        first = self.capacity - offset
+        start = _HEADER_SIZE + offset
+        if len(data) <= first:
+            self._map[start:start + len(data)] = data
+        else:
+            view = memoryview(data)
+            self._map[start:_HEADER_SIZE + self.capacity] = view[:first]
+            self._map[_HEADER_SIZE:_HEADER_SIZE + len(data) - first] = \
+                view[first:]
+
+    def _read_size(self, pos):
+        offset = pos % self.capacity
+        if offset <= self.capacity - _SIZE.size:
+            return _SIZE.unpack_from(self._map, _HEADER_SIZE + offset)[0]
+        _get(self._map, self.capacity, pos, self._scratch)
+        return _SIZE.unpack_from(self._scratch)[0]
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._map is not None:
+                self._map.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            ring, self._map = self._map, None
+            if ring is not None:
+                ring.flush()
+                ring.close()
+        finally:
+            self.release()
+        super().close()
+
+
+def _open_ring(filename, capacity, mode):
+    total = _HEADER_SIZE + capacity
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size == total:
+            ring = mmap.mmap(fd, total)
+            magic, oldmode, oldcapacity, _, _ = _HEADER.unpack_from(ring)
+            if (magic, oldmode, oldcapacity) == (_MAGIC, mode, capacity):
+                return ring
+            ring.close()
+        os.ftruncate(fd, 0)
+        os.ftruncate(fd, total)
+        ring = mmap.mmap(fd, total)
+        _HEADER.pack_into(ring, 0, _MAGIC, mode, capacity, 0, 0)
+        return ring
+    finally:
+        os.close(fd)
+
+
+def _get(ring, capacity, pos, buf):
+    # Copy len(buf) bytes from the ring at "pos" into buf.
+    offset = pos % capacity
+    first = capacity - offset
+    start = _HEADER_SIZE + offset
+    size = len(buf)
+    if size <= first:
+        buf[:] = ring[start:start + size]
+    else:
+        buf[:first] = ring[start:start + first]
+        buf[first:] = ring[_HEADER_SIZE:_HEADER_SIZE + size - first]
+
+
+def read_ring(filename):
+    """Yield the records in the ring buffer file, oldest first.
+
+    For a binary ring (see RingBufferHandler) each one is a LogRecord;
+    otherwise it is the formatted text.
+    """
+    with open(filename, 'rb') as infile:
+        data = infile.read()
+    if len(data) < _HEADER_SIZE:
+        raise ValueError('{!r} is not a ring buffer file'.format(filename))
+    magic, mode, capacity, head, tail = _HEADER.unpack_from(data)
+    if magic != _MAGIC or len(data) != _HEADER_SIZE + capacity:
+        raise ValueError('{!r} is not a ring buffer file'.format(filename))
+    sizebuf = bytearray(_SIZE.size)
+    pos = tail
+    while pos < head:
+        _get(data, capacity, pos, sizebuf)
+        size, = _SIZE.unpack_from(sizebuf)
+        if pos + _SIZE.size + size > head:
+            # The record was never finished.
+            break
+        record = bytearray(size)
+        _get(data, capacity, pos + _SIZE.size, record)
+        pos += _SIZE.size + size
+        if mode == _BINARY:
+            yield decode_record(record)
+        else:
+            yield record.decode('utf-8', 'surrogateescape')
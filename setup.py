@@ -49,7 +49,7 @@ with open(os.path.join(PROJECT_ROOT, 'README.rst')) as readme_file:
 #################################################
 # Set up packages.
 
-PACKAGES = [NAME]
+PACKAGES = [NAME, NAME + '.logging']
 
 PACKAGE_DATA = {}
 
@@ -1,7 +1,15 @@
+import copy
+import inspect
+import pickle
 import types
 import unittest
 
-from nsl.collections._ns import as_namedtuple
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from nsl.collections._ns import as_namedtuple, clear_namedtuple_cache
 
 
 class AsNamedTupleTests(unittest.TestCase):
@@ -154,3 +162,441 @@ class AsNamedTupleTests(unittest.TestCase):
             pass
 
         self.assertEqual(Point.__doc__, Point.__namedtuple__.__doc__)
+
+    def test_cached(self):
+        class Point:
+            pass
+
+        Point1 = as_namedtuple(Point, 'x y')
+        Point2 = as_namedtuple(Point, 'x, y')
+        Point3 = as_namedtuple(Point, ['x', 'y'])
+
+        self.assertIs(Point2, Point1)
+        self.assertIs(Point3, Point1)
+
+    def test_cache_key(self):
+        class Point:
+            pass
+
+        class Other:
+            pass
+
+        Point1 = as_namedtuple(Point, 'x y')
+        Point2 = as_namedtuple(Point, 'x y z')
+        Other1 = as_namedtuple(Other, 'x y')
+
+        self.assertIsNot(Point2, Point1)
+        self.assertIsNot(Other1, Point1)
+        self.assertEqual(Point2._fields, ('x', 'y', 'z'))
+
+    def test_cache_clear(self):
+        class Point:
+            pass
+
+        Point1 = as_namedtuple(Point, 'x y')
+        clear_namedtuple_cache()
+        Point2 = as_namedtuple(Point, 'x y')
+
+        self.assertIsNot(Point2, Point1)
+        self.assertEqual(Point2._fields, Point1._fields)
+
+
+@as_namedtuple('x y')
+class PicklePoint:
+    pass
+
+
+@as_namedtuple('x y', converters={'x': lambda x: [x]})
+class PickleConverted:
+    pass
+
+
+class PickleTests(unittest.TestCase):
+
+    def test_pickle(self):
+        point = PicklePoint(1, 2)
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            with self.subTest(proto):
+                copied = pickle.loads(pickle.dumps(point, proto))
+
+                self.assertEqual(copied, point)
+                self.assertIs(type(copied), PicklePoint)
+
+    def test_payload(self):
+        points = [PicklePoint(i, i) for i in range(100)]
+        data = pickle.dumps(points, pickle.HIGHEST_PROTOCOL)
+        plain = pickle.dumps([tuple(p) for p in points],
+                             pickle.HIGHEST_PROTOCOL)
+
+        # Each record only adds a reference to the memoized class.
+        self.assertLess(len(data), len(plain) + 100 * 4
+                        + len(pickle.dumps(PicklePoint)))
+
+    def test_not_converted_again(self):
+        point = PickleConverted(1, 2)
+        copied = pickle.loads(pickle.dumps(point))
+
+        self.assertEqual(point, ([1], 2))
+        self.assertEqual(copied, point)
+        self.assertIs(type(copied), PickleConverted)
+
+    def test_state(self):
+        point = PicklePoint(1, 2)
+        point.z = 3
+        copied = pickle.loads(pickle.dumps(point))
+
+        self.assertEqual(copied, (1, 2))
+        self.assertEqual(copied.z, 3)
+
+    def test_copy(self):
+        point = PickleConverted(1, 2)
+
+        self.assertEqual(copy.copy(point), point)
+        self.assertEqual(copy.deepcopy(point), point)
+
+
+class OptionsTests(unittest.TestCase):
+
+    def test_defaults(self):
+        @as_namedtuple('x y label', defaults={'y': 0, 'label': None})
+        class Point:
+            pass
+
+        self.assertEqual(Point(1), (1, 0, None))
+        self.assertEqual(Point(1, 2, 'a'), (1, 2, 'a'))
+        self.assertEqual(Point._field_defaults, {'y': 0, 'label': None})
+
+    def test_defaults_sequence(self):
+        Point = as_namedtuple(type('Point', (), {}), 'x y', defaults=[0])
+
+        self.assertEqual(Point(1), (1, 0))
+
+    def test_defaults_unhashable(self):
+        class Point:
+            pass
+
+        Point1 = as_namedtuple(Point, 'x y', defaults={'y': []})
+        Point2 = as_namedtuple(Point, 'x y', defaults={'y': []})
+
+        self.assertEqual(Point1(1), (1, []))
+        self.assertIsNot(Point2, Point1)
+
+    def test_defaults_bad(self):
+        class Point:
+            pass
+
+        with self.assertRaises(ValueError):
+            as_namedtuple(Point, 'x y', defaults={'x': 0})
+        with self.assertRaises(ValueError):
+            as_namedtuple(Point, 'x y', defaults={'z': 0})
+        with self.assertRaises(TypeError):
+            as_namedtuple(Point, 'x y', defaults=[1, 2, 3])
+
+    def test_converters(self):
+        @as_namedtuple('x y data', defaults={'data': None},
+                       converters={'x': float, 'data': tuple})
+        class Point:
+            pass
+
+        p1 = Point(1, 2)
+        p2 = Point('1.5', 2, [3])
+
+        self.assertEqual(p1, (1.0, 2, None))
+        self.assertIsInstance(p1.x, float)
+        self.assertEqual(p2, (1.5, 2, (3,)))
+        self.assertEqual(p1._replace(x='3'), (3.0, 2, None))
+        self.assertEqual(Point._make(['4', 5, 'ab']), (4.0, 5, ('a', 'b')))
+        self.assertEqual(Point._make_many([('6', 7)]), [(6.0, 7, None)])
+        self.assertEqual(Point._field_converters,
+                         {'x': float, 'data': tuple})
+        with self.assertRaises(ValueError):
+            Point('spam', 2)
+
+    def test_converters_default_passed(self):
+        @as_namedtuple('x y', defaults={'y': 0}, converters={'y': float})
+        class Point:
+            pass
+
+        self.assertIs(type(Point(1, 0).y), float)
+        self.assertIs(type(Point(1, 1).y), float)
+        self.assertIs(type(Point(1).y), int)
+        self.assertIs(type(Point(1, y=0).y), float)
+        self.assertIs(type(Point(1)._replace(x=2).y), int)
+        self.assertIs(type(Point(1)._replace(y=0).y), float)
+        with self.assertRaises(ValueError):
+            Point(1)._replace(z=0)
+        self.assertEqual(str(inspect.signature(Point)), '(x, y=0)')
+
+    def test_types(self):
+        @as_namedtuple('x y label', defaults={'label': None},
+                       types={'x': (int, float), 'label': str},
+                       validate=True)
+        class Point:
+            pass
+
+        self.assertEqual(Point(1, 2), (1, 2, None))
+        self.assertEqual(Point(1.5, 2, 'a'), (1.5, 2, 'a'))
+        with self.assertRaises(TypeError):
+            Point('1', 2)
+        with self.assertRaises(TypeError):
+            Point(1, 2, 3)
+        with self.assertRaises(TypeError):
+            Point(1, 2)._replace(x='1')
+        with self.assertRaises(TypeError):
+            Point._make_many([(1, 2), ('1', 2)])
+
+    def test_types_default_passed(self):
+        @as_namedtuple('x label', defaults={'label': None},
+                       types={'label': str}, validate=True)
+        class Point:
+            pass
+
+        self.assertEqual(Point(1), (1, None))
+        with self.assertRaises(TypeError):
+            Point(1, None)
+
+    def test_types_not_validated(self):
+        @as_namedtuple('x y', types={'x': int}, validate=False)
+        class Point:
+            pass
+
+        self.assertEqual(Point('1', 2), ('1', 2))
+        self.assertIs(Point.__new__, Point.__namedtuple__.__new__)
+        self.assertEqual(Point._field_types, {'x': int})
+
+    def test_validate_default(self):
+        @as_namedtuple('x y', types={'x': int})
+        class Point:
+            pass
+
+        self.assertEqual(Point.__validate__, __debug__)
+
+    def test_converters_and_types(self):
+        @as_namedtuple('x y', converters={'x': int}, types={'x': int},
+                       validate=True)
+        class Point:
+            pass
+
+        self.assertEqual(Point('1', 2), (1, 2))
+
+    def test_with_new(self):
+        @as_namedtuple('x y', converters={'x': float})
+        class Point:
+            def __new__(cls, x, y=0):
+                return super().__new__(cls, x, y)
+
+        self.assertEqual(Point('1'), (1.0, 0))
+
+    def test_with_init(self):
+        calls = []
+
+        @as_namedtuple('x y', defaults={'y': 0}, converters={'x': float})
+        class Point:
+            def __init__(self, *args):
+                calls.append(args)
+
+        self.assertEqual(Point('1'), (1.0, 0))
+        self.assertEqual(calls, [('1',)])
+
+    def test_signature(self):
+        @as_namedtuple('x y', defaults={'y': 0}, converters={'x': float})
+        class Point:
+            pass
+
+        self.assertEqual(str(inspect.signature(Point)), '(x, y=0)')
+        self.assertEqual(Point(y=1, x=2), (2.0, 1))
+
+    def test_cached(self):
+        class Point:
+            pass
+
+        Point1 = as_namedtuple(Point, 'x y', defaults={'y': 0},
+                               converters={'x': float})
+        Point2 = as_namedtuple(Point, 'x y', defaults=[0],
+                               converters={'x': float})
+        Point3 = as_namedtuple(Point, 'x y', defaults={'y': 1},
+                               converters={'x': float})
+
+        self.assertIs(Point2, Point1)
+        self.assertIsNot(Point3, Point1)
+
+    def test_cached_equal_defaults(self):
+        class Point:
+            pass
+
+        Point1 = as_namedtuple(Point, 'x y', defaults={'y': 0})
+        Point2 = as_namedtuple(Point, 'x y', defaults={'y': False})
+        Point3 = as_namedtuple(Point, 'x y', defaults={'y': 0.0})
+
+        self.assertIsNot(Point2, Point1)
+        self.assertIsNot(Point3, Point1)
+        self.assertIs(Point1(1).y, 0)
+        self.assertIs(Point2(1).y, False)
+        self.assertIs(type(Point3(1).y), float)
+        self.assertIs(as_namedtuple(Point, 'x y', defaults=[False]), Point2)
+
+    def test_unknown_fields(self):
+        class Point:
+            pass
+
+        with self.assertRaises(ValueError):
+            as_namedtuple(Point, 'x y', converters={'z': int})
+        with self.assertRaises(ValueError):
+            as_namedtuple(Point, 'x y', types={'z': int})
+
+    def test_make_many_defaults(self):
+        @as_namedtuple('x y', defaults={'y': 0})
+        class Point:
+            pass
+
+        records = Point._make_many([(1,), (2, 3)])
+
+        self.assertEqual(records, [Point(1), Point(2, 3)])
+        self.assertEqual(records, [(1, 0), (2, 3)])
+        for record in records:
+            self.assertIs(type(record), Point)
+        with self.assertRaises(TypeError):
+            Point._make_many([(1, 2, 3)])
+
+    def test_with_defaults(self):
+        @as_namedtuple('x y label', defaults={'label': None},
+                       converters={'x': float})
+        class Point:
+            pass
+
+        Point2 = Point._with_defaults(y=0)
+
+        self.assertEqual(Point2('1'), (1.0, 0, None))
+        self.assertIs(Point2.__wraps__, Point.__wraps__)
+        self.assertEqual(Point._field_defaults, {'label': None})
+        with self.assertRaises(ValueError):
+            Point._with_defaults(x=0)
+
+
+class BulkTests(unittest.TestCase):
+
+    ROWS = [(1, 'a', 1.5), (2, 'bb', 2.5), (3, 'ccc', 3.5)]
+
+    def setUp(self):
+        @as_namedtuple('id name score')
+        class Record:
+            pass
+        self.Record = Record
+
+    def test_make_many(self):
+        records = self.Record._make_many(iter(self.ROWS))
+
+        self.assertEqual(records, self.ROWS)
+        self.assertEqual(records, [self.Record(*row) for row in self.ROWS])
+        for record in records:
+            self.assertIs(type(record), self.Record)
+
+    def test_make_many_empty(self):
+        self.assertEqual(self.Record._make_many([]), [])
+
+    def test_make_many_wrong_size(self):
+        with self.assertRaises(TypeError):
+            self.Record._make_many([(1, 'a', 1.5), (2, 'b')])
+        with self.assertRaises(TypeError):
+            self.Record._make_many([(1, 'a', 1.5, None)])
+
+    def test_make_many_with_init(self):
+        calls = []
+
+        @as_namedtuple('x y')
+        class Point:
+            def __init__(self, *args):
+                calls.append(args)
+
+        points = Point._make_many([(1, 2), (3, 4)])
+
+        self.assertEqual(points, [(1, 2), (3, 4)])
+        self.assertEqual(calls, [(1, 2), (3, 4)])
+        self.assertIs(type(points[0]), Point)
+
+    def test_make_many_with_new(self):
+        @as_namedtuple('x y')
+        class Point:
+            def __new__(cls, x, y):
+                return super().__new__(cls, float(x), float(y))
+
+        points = Point._make_many([(1, 2)])
+
+        self.assertEqual(points, [(1.0, 2.0)])
+        self.assertIsInstance(points[0].x, float)
+
+    def test_overridden(self):
+        @as_namedtuple('x y')
+        class Point:
+            @classmethod
+            def _make_many(cls, rows):
+                return 'spam'
+
+        self.assertEqual(Point._make_many([]), 'spam')
+
+    def test_from_columns(self):
+        records = self.Record._from_columns(
+                score=[1.5, 2.5, 3.5],
+                id=(1, 2, 3),
+                name=iter(['a', 'bb', 'ccc']),
+                )
+
+        self.assertEqual(records, self.ROWS)
+        self.assertIs(type(records[0]), self.Record)
+
+    def test_from_columns_bad(self):
+        with self.assertRaises(TypeError):
+            self.Record._from_columns(id=[1], name=['a'])
+        with self.assertRaises(TypeError):
+            self.Record._from_columns(id=[1], name=['a'], score=[1.5],
+                                      spam=[None])
+        with self.assertRaises(ValueError):
+            self.Record._from_columns(id=[1, 2], name=['a'], score=[1.5])
+
+    def test_to_columns(self):
+        records = self.Record._make_many(self.ROWS)
+        columns = self.Record._to_columns(records)
+
+        self.assertEqual(columns, {
+            'id': [1, 2, 3],
+            'name': ['a', 'bb', 'ccc'],
+            'score': [1.5, 2.5, 3.5],
+            })
+        self.assertEqual(self.Record._from_columns(**columns), records)
+
+    def test_to_columns_empty(self):
+        self.assertEqual(self.Record._to_columns([]),
+                         {'id': [], 'name': [], 'score': []})
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_to_array(self):
+        records = self.Record._make_many(self.ROWS)
+        array = self.Record._to_array(records)
+
+        self.assertEqual(array.dtype.names, ('id', 'name', 'score'))
+        self.assertEqual(array['name'].tolist(), ['a', 'bb', 'ccc'])
+        self.assertEqual(array['score'].dtype, numpy.float64)
+        self.assertEqual(self.Record._from_array(array), records)
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_to_array_dtype(self):
+        records = self.Record._make_many(self.ROWS)
+        array = self.Record._to_array(
+                records, dtype=[('id', 'i2'), ('name', 'U3'), ('score', 'f4')])
+
+        self.assertEqual(array['id'].dtype, numpy.int16)
+        self.assertEqual(array.tolist(), self.ROWS)
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_from_array(self):
+        array = numpy.array([(1.5, 'a', 1, 0)], dtype=[
+            ('score', 'f8'), ('name', 'U1'), ('id', 'i8'), ('extra', 'i8')])
+        records = self.Record._from_array(array)
+
+        self.assertEqual(records, [(1, 'a', 1.5)])
+        self.assertIs(type(records[0].id), int)
+        with self.assertRaises(ValueError):
+            self.Record._from_array(array[['id', 'name']])
+        with self.assertRaises(TypeError):
+            self.Record._from_array(numpy.arange(3))
+
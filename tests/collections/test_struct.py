@@ -0,0 +1,110 @@
+import mmap
+import struct
+import unittest
+
+from nsl.collections import as_namedtuple, RecordCodec
+from nsl.collections import _struct
+
+
+@as_namedtuple('id score ok', types={'id': int, 'score': float, 'ok': bool})
+class Record:
+    pass
+
+
+@as_namedtuple('id name')
+class Untyped:
+    pass
+
+
+def records(count):
+    return [Record(i, i / 2, i % 3 == 0) for i in range(count)]
+
+
+class RecordCodecTests(unittest.TestCase):
+
+    def test_codec(self):
+        codec = Record._codec()
+
+        self.assertIsInstance(codec, RecordCodec)
+        self.assertIs(codec.record_type, Record)
+        self.assertEqual(codec.format, '<qd?')
+        self.assertEqual(codec.size, 17)
+        self.assertIs(Record._codec(), codec)
+        self.assertIsNot(Record._codec(id='i'), codec)
+
+    def test_formats(self):
+        codec = Untyped._codec(id='i', name='8s')
+
+        self.assertEqual(codec.format, '<i8s')
+        self.assertEqual(codec.unpack(codec.pack(Untyped(1, b'spam'))),
+                         (1, b'spam\0\0\0\0'))
+
+    def test_no_format(self):
+        with self.assertRaises(ValueError):
+            Untyped._codec(id='i')
+        with self.assertRaises(ValueError):
+            Untyped._codec(id='i', name='8s', spam='i')
+
+    def test_pack(self):
+        record = Record(1, 1.5, True)
+        codec = Record._codec()
+        data = codec.pack(record)
+        unpacked = codec.unpack(data)
+
+        self.assertEqual(len(data), codec.size)
+        self.assertEqual(unpacked, record)
+        self.assertIs(type(unpacked), Record)
+
+    def test_pack_many(self):
+        codec = Record._codec()
+        for count in (0, 1, _struct.PACK_BATCH, 2 * _struct.PACK_BATCH + 3):
+            with self.subTest(count):
+                expected = records(count)
+                data = codec.pack_many(iter(expected))
+                unpacked = codec.unpack_many(data)
+
+                self.assertIsInstance(data, bytearray)
+                self.assertEqual(len(data), count * codec.size)
+                self.assertEqual(data, b''.join(map(codec.pack, expected)))
+                self.assertEqual(unpacked, expected)
+                for record in unpacked:
+                    self.assertIs(type(record), Record)
+
+    def test_pack_many_into(self):
+        codec = Record._codec()
+        expected = records(10)
+        buffer = bytearray(5 + 10 * codec.size)
+        view = memoryview(buffer)
+        result = codec.pack_many(expected, view, 5)
+
+        self.assertIs(result, view)
+        self.assertEqual(bytes(buffer[:5]), b'\0' * 5)
+        self.assertEqual(codec.unpack_many(buffer, offset=5), expected)
+        self.assertEqual(codec.unpack_many(view, 3, 5 + codec.size),
+                         expected[1:4])
+        with self.assertRaises(ValueError):
+            codec.pack_many(expected, bytearray(10))
+        with self.assertRaises(ValueError):
+            codec.unpack_many(buffer, 11, 5)
+
+    def test_mmap(self):
+        codec = Record._codec()
+        expected = records(100)
+        with mmap.mmap(-1, 100 * codec.size) as buffer:
+            codec.pack_many(expected, buffer)
+            self.assertEqual(codec.unpack_many(buffer), expected)
+
+    def test_buffer_released(self):
+        codec = Record._codec()
+        buffer = codec.pack_many(records(3))
+        codec.unpack_many(buffer)
+        codec.pack_many(records(3), buffer)
+
+        buffer.extend(b'\0')  # It can still be resized.
+
+    def test_partial_records(self):
+        codec = Record._codec()
+        data = codec.pack_many(records(3)) + b'\0'
+
+        with self.assertRaises(struct.error):
+            codec.unpack_many(data)
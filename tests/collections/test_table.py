@@ -0,0 +1,212 @@
+import array
+import pickle
+import unittest
+
+from nsl.collections import as_namedtuple, RecordTable
+
+
+@as_namedtuple('id name score')
+class Record:
+    pass
+
+
+ROWS = [(1, 'a', 1.5), (2, 'bb', 2.5), (3, 'ccc', 3.5)]
+
+
+class RecordTableTests(unittest.TestCase):
+
+    def test_table_type(self):
+        Table = Record.Table
+
+        self.assertIs(Record.Table, Table)
+        self.assertTrue(issubclass(Table, RecordTable))
+        self.assertIs(Table.record_type, Record)
+        self.assertEqual(Table.__qualname__, 'Record.Table')
+        with self.assertRaises(TypeError):
+            RecordTable()
+
+    def test_columns(self):
+        table = Record.Table(Record._make_many(ROWS))
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.column('id'), array.array('q', [1, 2, 3]))
+        self.assertEqual(table.column('name'), ['a', 'bb', 'ccc'])
+        self.assertEqual(table.column('score'),
+                         array.array('d', [1.5, 2.5, 3.5]))
+        with self.assertRaises(KeyError):
+            table.column('spam')
+
+    def test_column_is_copy(self):
+        table = Record.Table(ROWS)
+        table.column('id').append(4)
+        table.column('name').append('d')
+
+        self.assertEqual(len(table.column('id')), 3)
+        self.assertEqual(len(table.column('name')), 3)
+
+    def test_empty(self):
+        table = Record.Table()
+
+        self.assertEqual(len(table), 0)
+        self.assertEqual(list(table), [])
+        self.assertEqual(table.column('id'), [])
+        with self.assertRaises(IndexError):
+            table[0]
+
+    def test_getitem(self):
+        table = Record.Table(ROWS)
+
+        self.assertEqual(table[0], ROWS[0])
+        self.assertIs(type(table[0]), Record)
+        self.assertEqual(table[-1], ROWS[-1])
+        self.assertIsInstance(table[0].id, int)
+        with self.assertRaises(IndexError):
+            table[3]
+        with self.assertRaises(IndexError):
+            table[-4]
+
+    def test_slice(self):
+        table = Record.Table(ROWS)
+        part = table[1:]
+        reverse = table[::-1]
+
+        self.assertIs(type(part), Record.Table)
+        self.assertEqual(list(part), ROWS[1:])
+        self.assertEqual(list(reverse), ROWS[::-1])
+        part.append((4, 'd', 4.5))
+        self.assertEqual(len(table), 3)
+        self.assertEqual(len(part), 3)
+
+    def test_iter(self):
+        table = Record.Table(ROWS)
+        records = list(table)
+
+        self.assertEqual(records, ROWS)
+        for record in records:
+            self.assertIs(type(record), Record)
+        self.assertEqual(table.to_records(), records)
+
+    def test_append(self):
+        table = Record.Table()
+        table.append(Record(1, 'a', 1.5))
+        table.append((2, 'bb', 2.5))
+
+        self.assertEqual(list(table), ROWS[:2])
+        self.assertIsInstance(table.column('id'), array.array)
+        with self.assertRaises(TypeError):
+            table.append((3, 'ccc'))
+        self.assertEqual(len(table), 2)
+
+    def test_extend(self):
+        table = Record.Table(ROWS[:1])
+        table.extend(iter(ROWS[1:]))
+        table.extend([])
+
+        self.assertEqual(list(table), ROWS)
+        with self.assertRaises(TypeError):
+            table.extend([(4, 'd', 4.5), (5, 'e')])
+        self.assertEqual(len(table), 3)
+
+    def test_extend_table(self):
+        table = Record.Table(ROWS)
+        table.extend(Record.Table(ROWS[:1]))
+        table.extend(table)
+
+        self.assertEqual(list(table), (ROWS + ROWS[:1]) * 2)
+
+    def test_switch_to_list(self):
+        table = Record.Table(ROWS)
+        table.append((2 ** 70, 'd', 4))
+
+        self.assertEqual(table.column('id'), [1, 2, 3, 2 ** 70])
+        self.assertEqual(table.column('score'), [1.5, 2.5, 3.5, 4])
+        self.assertIs(type(table[3].score), int)
+        table.append((5, 'e', 5.5))
+        self.assertEqual(len(table), 5)
+
+    def test_mixed_types(self):
+        table = Record.Table([(1, 'a', None), (True, 'b', 2.5)])
+
+        self.assertEqual(table.column('id'), [1, True])
+        self.assertEqual(table.column('score'), [None, 2.5])
+
+    def test_typecodes(self):
+        table = Record.Table(ROWS, typecodes={'id': 'i', 'score': None})
+
+        self.assertEqual(table.column('id'), array.array('i', [1, 2, 3]))
+        self.assertEqual(table.column('score'), [1.5, 2.5, 3.5])
+        with self.assertRaises(TypeError):
+            table.append(('spam', 'd', 4.5))
+        with self.assertRaises(OverflowError):
+            table.extend([(2 ** 40, 'd', 4.5)])
+        self.assertEqual(list(table), ROWS)
+        with self.assertRaises(ValueError):
+            Record.Table(typecodes={'spam': 'q'})
+
+    def test_make_many_round_trip(self):
+        records = Record._make_many(ROWS)
+        table = Record.Table(records)
+
+        self.assertEqual(Record._make_many(table), records)
+
+    def test_equality(self):
+        table = Record.Table(ROWS)
+
+        self.assertEqual(table, Record.Table(ROWS))
+        self.assertNotEqual(table, Record.Table(ROWS[:2]))
+        self.assertNotEqual(table, ROWS)
+
+    def test_pickle(self):
+        table = Record.Table(ROWS)
+        table.append((2 ** 70, 'd', 4.5))
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            with self.subTest(proto):
+                copied = pickle.loads(pickle.dumps(table, proto))
+
+                self.assertIs(type(copied), Record.Table)
+                self.assertEqual(copied, table)
+                copied.append((5, 'e', 5.5))
+                self.assertEqual(len(copied), 5)
+
+    def test_field_named_table(self):
+        @as_namedtuple('Table x')
+        class Spam:
+            pass
+
+        self.assertEqual(Spam(1, 2).Table, 1)
+
+    def test_converters(self):
+        @as_namedtuple('id score', converters={'id': int})
+        class Converted:
+            pass
+
+        table = Converted.Table([('7', 1.5)])
+        table.append(('8', 2.5))
+        table.extend([Converted('9', 3.5)])
+
+        self.assertEqual(table.column('id'), array.array('q', [7, 8, 9]))
+        self.assertEqual(list(table), [(7, 1.5), (8, 2.5), (9, 3.5)])
+
+    def test_types(self):
+        @as_namedtuple('id score', types={'id': int}, validate=True)
+        class Checked:
+            pass
+
+        table = Checked.Table([(1, 1.5)])
+
+        with self.assertRaises(TypeError):
+            table.append(('2', 2.5))
+        with self.assertRaises(TypeError):
+            table.extend([(2, 2.5), ('3', 3.5)])
+        with self.assertRaises(TypeError):
+            Checked.Table([('1', 1.5)])
+        self.assertEqual(list(table), [(1, 1.5)])
+
+    def test_types_unvalidated(self):
+        @as_namedtuple('id score', types={'id': int}, validate=False)
+        class Unchecked:
+            pass
+
+        table = Unchecked.Table([('1', 1.5)])
+
+        self.assertEqual(table.column('id'), ['1'])
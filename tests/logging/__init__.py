@@ -0,0 +1,28 @@
+import logging
+
+
+class ListHandler(logging.Handler):
+    """A handler that keeps the records it gets, in "records".
+
+    If "blocker" (e.g. a threading.Event) is provided then each emit()
+    waits on it first.
+    """
+
+    def __init__(self, level=logging.NOTSET, *, blocker=None):
+        super().__init__(level)
+        self.records = []
+        self.blocker = blocker
+
+    def emit(self, record):
+        if self.blocker is not None:
+            self.blocker.wait()
+        self.records.append(record)
+
+
+def make_record(msg='spam', level=logging.INFO, *args, name='spam',
+                exc_info=None, **attrs):
+    """Return a new LogRecord, with any other keyword args set on it."""
+    record = logging.LogRecord(name, level, __file__, 1, msg, args,
+                               exc_info)
+    vars(record).update(attrs)
+    return record
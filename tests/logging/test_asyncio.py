@@ -0,0 +1,132 @@
+import asyncio
+import io
+import logging
+import threading
+import time
+import unittest
+
+from nsl.logging._asyncio import AsyncioHandler
+from . import make_record
+
+
+class SlowStream(io.StringIO):
+    """A stream that takes a while to write, like a slow pipe."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.threads = set()
+
+    def write(self, data):
+        self.threads.add(threading.current_thread())
+        time.sleep(self.delay)
+        return super().write(data)
+
+
+async def _max_lag(work, interval=0.001):
+    # Measure how late the loop is to wake up a sleeping task while
+    # the work is running.
+    lags = []
+    done = False
+
+    async def tick():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0)
+    await work()
+    done = True
+    await ticker
+    return max(lags)
+
+
+class AsyncioHandlerTests(unittest.TestCase):
+
+    def test_no_loop(self):
+        stream = SlowStream(0)
+        handler = AsyncioHandler(stream)
+        handler.handle(make_record('a'))
+
+        self.assertEqual(stream.getvalue(), 'a\n')
+        self.assertEqual(stream.threads, {threading.current_thread()})
+
+    def test_in_loop(self):
+        stream = SlowStream(0)
+        handler = AsyncioHandler(stream)
+
+        async def main():
+            handler.handle(make_record('a'))
+            handler.handle(make_record('b'))
+            before = stream.getvalue()
+            await handler.aclose()
+            return before
+        before = asyncio.run(main())
+
+        self.assertEqual(before, '')
+        self.assertEqual(stream.getvalue(), 'a\nb\n')
+        self.assertNotIn(threading.current_thread(), stream.threads)
+
+    def test_aflush(self):
+        stream = SlowStream(0.01)
+        handler = AsyncioHandler(stream)
+        self.addCleanup(handler.close)
+
+        async def main():
+            for msg in 'abc':
+                handler.handle(make_record(msg))
+                await asyncio.sleep(0)
+            await handler.aflush()
+            return stream.getvalue()
+        flushed = asyncio.run(main())
+
+        self.assertEqual(flushed, 'a\nb\nc\n')
+
+    def test_backlog_full(self):
+        stream = SlowStream(0)
+        handler = AsyncioHandler(stream, maxsize=2)
+
+        async def main():
+            for msg in 'abcd':
+                handler.handle(make_record(msg))
+            await handler.aclose()
+        asyncio.run(main())
+
+        self.assertEqual(stream.getvalue(), 'a\nb\n')
+        self.assertEqual(handler.dropped, 2)
+
+    def test_close_writes_backlog(self):
+        stream = SlowStream(0)
+        handler = AsyncioHandler(stream)
+
+        async def main():
+            handler.handle(make_record('a'))
+            handler.close()
+        asyncio.run(main())
+
+        self.assertEqual(stream.getvalue(), 'a\n')
+
+    def test_event_loop_lag(self):
+        delay = 0.05
+        count = 10
+
+        async def log(handler):
+            for i in range(count):
+                handler.handle(make_record(str(i)))
+                await asyncio.sleep(0)
+
+        async def main(handler):
+            lag = await _max_lag(lambda: log(handler))
+            if isinstance(handler, AsyncioHandler):
+                await handler.aclose()
+            return lag
+        blocking_stream = SlowStream(delay)
+        blocking = asyncio.run(main(logging.StreamHandler(blocking_stream)))
+        stream = SlowStream(delay)
+        lag = asyncio.run(main(AsyncioHandler(stream)))
+
+        # A blocking write stalls the loop for the whole write.
+        self.assertGreaterEqual(blocking, delay)
+        self.assertLess(lag, delay)
+        self.assertEqual(stream.getvalue(), blocking_stream.getvalue())
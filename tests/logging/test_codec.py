@@ -0,0 +1,66 @@
+import logging
+import sys
+import unittest
+
+from nsl.logging._codec import encode_record, decode_record
+from . import make_record
+
+
+class CodecTests(unittest.TestCase):
+
+    ATTRS = [
+            'name', 'levelno', 'levelname', 'pathname', 'filename',
+            'module', 'lineno', 'funcName', 'created', 'msecs', 'process',
+            'processName', 'thread', 'threadName', 'stack_info',
+            ]
+
+    def test_round_trip(self):
+        record = make_record('spam %s', logging.WARNING, 42)
+        decoded = decode_record(encode_record(record))
+
+        for attr in self.ATTRS:
+            with self.subTest(attr):
+                self.assertEqual(getattr(decoded, attr),
+                                 getattr(record, attr))
+        self.assertEqual(decoded.msg, 'spam 42')
+        self.assertIsNone(decoded.args)
+        self.assertEqual(decoded.getMessage(), record.getMessage())
+        self.assertIsNone(decoded.exc_text)
+
+    def test_exc_info(self):
+        try:
+            raise RuntimeError('oops')
+        except RuntimeError:
+            record = make_record(exc_info=sys.exc_info())
+        decoded = decode_record(encode_record(record))
+        formatted = logging.Formatter().format(decoded)
+
+        self.assertIsNone(decoded.exc_info)
+        self.assertIn('RuntimeError: oops', decoded.exc_text)
+        self.assertIn('RuntimeError: oops', formatted)
+
+    def test_stack_info(self):
+        record = make_record(stack_info='Stack (spam)')
+        decoded = decode_record(encode_record(record))
+
+        self.assertEqual(decoded.stack_info, 'Stack (spam)')
+
+    def test_non_ascii(self):
+        record = make_record('\N{SNOWMAN} %s', logging.WARNING, '\udcff')
+        decoded = decode_record(encode_record(record))
+
+        self.assertEqual(decoded.msg, '\N{SNOWMAN} \udcff')
+
+    def test_memoryview(self):
+        record = make_record('spam %s', logging.WARNING, 42)
+        data = b'xx' + encode_record(record)
+        decoded = decode_record(memoryview(data)[2:])
+
+        self.assertEqual(decoded.msg, 'spam 42')
+
+    def test_compact(self):
+        import pickle
+        record = make_record('spam %s', logging.WARNING, 42)
+
+        self.assertLess(len(encode_record(record)),
+                        len(pickle.dumps(record)) / 2)
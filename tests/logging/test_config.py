@@ -0,0 +1,158 @@
+import io
+import logging
+import threading
+import unittest
+
+from nsl.logging._config import (
+        LoggerConfig, compile_loggers, configure_loggers, snapshot_loggers,
+        )
+from nsl.logging._formatters import CompiledFormatter
+
+
+class ConfigTests(unittest.TestCase):
+
+    NAMES = ['test_config.spam', 'test_config.spam.eggs', 'test_config.ham']
+
+    def setUp(self):
+        previous = snapshot_loggers(self.NAMES)
+        self.addCleanup(previous.apply)
+
+    def test_configure(self):
+        handler1 = logging.StreamHandler(io.StringIO())
+        handler2 = logging.StreamHandler(io.StringIO())
+        formatter = logging.Formatter('%(message)s')
+        compiled = configure_loggers({
+                'test_config.spam': {
+                    'level': 'DEBUG',
+                    'handlers': [handler1],
+                    'formatter': formatter,
+                    'propagate': False,
+                    },
+                'test_config.spam.eggs': {
+                    'handlers': [handler2],
+                    'formatter': {'fmt': '{message}', 'style': '{'},
+                    },
+                'test_config.ham': logging.ERROR,
+                })
+        spam = logging.getLogger('test_config.spam')
+        eggs = logging.getLogger('test_config.spam.eggs')
+        ham = logging.getLogger('test_config.ham')
+
+        self.assertIsInstance(compiled, LoggerConfig)
+        self.assertEqual(compiled.loggers, [spam, eggs, ham])
+        self.assertEqual(spam.level, logging.DEBUG)
+        self.assertEqual(spam.handlers, [handler1])
+        self.assertFalse(spam.propagate)
+        self.assertIs(handler1.formatter, formatter)
+        self.assertEqual(eggs.level, logging.NOTSET)
+        self.assertEqual(eggs.handlers, [handler2])
+        self.assertIsInstance(handler2.formatter, CompiledFormatter)
+        self.assertEqual(ham.level, logging.ERROR)
+        self.assertTrue(ham.propagate)
+
+    def test_level_cache_cleared(self):
+        eggs = logging.getLogger('test_config.spam.eggs')
+        configure_loggers({'test_config.spam': logging.ERROR})
+        before = eggs.isEnabledFor(logging.INFO)
+        configure_loggers({'test_config.spam': logging.DEBUG})
+        after = eggs.isEnabledFor(logging.INFO)
+
+        self.assertFalse(before)
+        self.assertTrue(after)
+
+    def test_existing_formatter_kept(self):
+        handler = logging.StreamHandler(io.StringIO())
+        existing = logging.Formatter()
+        handler.setFormatter(existing)
+        configure_loggers({'test_config.spam': {
+                'handlers': [handler],
+                'formatter': logging.Formatter('%(message)s'),
+                }})
+
+        self.assertIs(handler.formatter, existing)
+
+    def test_compile_does_not_apply(self):
+        spam = logging.getLogger('test_config.spam')
+        spam.setLevel(logging.WARNING)
+        compiled = compile_loggers({'test_config.spam': logging.DEBUG})
+        before = spam.level
+        compiled.apply()
+
+        self.assertEqual(before, logging.WARNING)
+        self.assertEqual(spam.level, logging.DEBUG)
+
+    def test_apply_returns_previous(self):
+        spam = logging.getLogger('test_config.spam')
+        handler = logging.StreamHandler(io.StringIO())
+        spam.setLevel(logging.WARNING)
+        spam.handlers = [handler]
+        previous = compile_loggers({
+                'test_config.spam': {'level': logging.DEBUG, 'handlers': []},
+                }).apply()
+        changed = (spam.level, spam.handlers)
+        previous.apply()
+
+        self.assertEqual(changed, (logging.DEBUG, []))
+        self.assertEqual(spam.level, logging.WARNING)
+        self.assertEqual(spam.handlers, [handler])
+
+    def test_swap(self):
+        handler1 = logging.StreamHandler(io.StringIO())
+        handler2 = logging.StreamHandler(io.StringIO())
+        config1 = compile_loggers({'test_config.spam': {
+                'level': logging.INFO, 'handlers': [handler1]}})
+        config2 = compile_loggers({'test_config.spam': {
+                'level': logging.ERROR, 'handlers': [handler2]}})
+        spam = logging.getLogger('test_config.spam')
+        config1.apply()
+        first = spam.handlers
+        config2.apply()
+        second = spam.handlers
+        config1.apply()
+
+        self.assertEqual(first, [handler1])
+        self.assertEqual(second, [handler2])
+        self.assertEqual(spam.handlers, [handler1])
+        self.assertEqual(spam.level, logging.INFO)
+
+    def test_no_records_dropped_while_swapping(self):
+        stream1 = io.StringIO()
+        stream2 = io.StringIO()
+        config1 = compile_loggers({'test_config.spam': {
+                'level': logging.INFO,
+                'handlers': [logging.StreamHandler(stream1)],
+                'propagate': False}})
+        config2 = compile_loggers({'test_config.spam': {
+                'level': logging.INFO,
+                'handlers': [logging.StreamHandler(stream2)],
+                'propagate': False}})
+        config1.apply()
+        spam = logging.getLogger('test_config.spam')
+        done = threading.Event()
+
+        def swap():
+            while not done.is_set():
+                config2.apply()
+                config1.apply()
+        t = threading.Thread(target=swap)
+        t.start()
+        try:
+            for _ in range(2000):
+                spam.info('x')
+        finally:
+            done.set()
+            t.join()
+        written = stream1.getvalue() + stream2.getvalue()
+
+        self.assertEqual(written, 'x\n' * 2000)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            compile_loggers({'test_config.spam': {'filters': []}})
+        with self.assertRaises(ValueError):
+            compile_loggers({'test_config.spam': {
+                    'formatter': logging.Formatter()}})
+
+    def test_bad_level(self):
+        with self.assertRaises(ValueError):
+            compile_loggers({'test_config.spam': 'SPAM'})
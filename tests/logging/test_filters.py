@@ -0,0 +1,162 @@
+import logging
+import unittest
+from unittest import mock
+
+import nsl.importlib
+from nsl.logging._filters import RateLimitFilter, SamplingFilter, SUMMARY_MSG
+from . import make_record
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimitFilterTests(unittest.TestCase):
+
+    def filter(self, *args, **kwargs):
+        clock = Clock()
+        with mock.patch.object(RateLimitFilter, '_clock', clock):
+            filter = RateLimitFilter(*args, **kwargs)
+        filter._clock = clock
+        filter.summaries = []
+        filter.emit_summary = filter.summaries.append
+        return filter, clock
+
+    def test_burst(self):
+        filter, _ = self.filter(rate=1, burst=3)
+        results = [filter.filter(make_record()) for _ in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+
+    def test_refill(self):
+        filter, clock = self.filter(rate=2, burst=2)
+        before = [filter.filter(make_record()) for _ in range(3)]
+        clock.now += 0.5
+        after = [filter.filter(make_record()) for _ in range(2)]
+        clock.now += 10
+        refilled = [filter.filter(make_record()) for _ in range(3)]
+
+        self.assertEqual(before, [True, True, False])
+        self.assertEqual(after, [True, False])
+        self.assertEqual(refilled, [True, True, False])
+
+    def test_keys(self):
+        filter, _ = self.filter(rate=1, burst=1)
+        results = [
+                filter.filter(make_record('a %s')),
+                filter.filter(make_record('a %s', logging.INFO, 1)),
+                filter.filter(make_record('b %s')),
+                filter.filter(make_record('a %s', logging.ERROR)),
+                filter.filter(make_record('a %s', name='ham')),
+                ]
+
+        self.assertEqual(results, [True, False, True, True, True])
+
+    def test_unhashable(self):
+        filter, _ = self.filter(rate=1, burst=1)
+        results = [filter.filter(make_record(['spam'])) for _ in range(3)]
+
+        self.assertEqual(results, [True, True, True])
+
+    def test_maxkeys(self):
+        filter, _ = self.filter(rate=1, burst=1, maxkeys=2)
+        filter.filter(make_record('a'))
+        filter.filter(make_record('a'))
+        filter.filter(make_record('b'))
+        filter.filter(make_record('a'))  # "a" is most recent now
+        filter.filter(make_record('c'))  # "b" gets evicted
+        results = [
+                filter.filter(make_record('a')),
+                filter.filter(make_record('b')),
+                ]
+
+        self.assertEqual(len(filter._buckets), 2)
+        self.assertEqual(results, [False, True])
+
+    def test_summary_on_eviction(self):
+        filter, _ = self.filter(rate=1, burst=1, maxkeys=1)
+        for _ in range(4):
+            filter.filter(make_record('a %s'))
+        filter.filter(make_record('b %s'))
+        summary, = filter.summaries
+
+        self.assertIs(summary.msg, SUMMARY_MSG)
+        self.assertEqual(summary.getMessage(),
+                         'suppressed 3 messages like: a %s')
+        self.assertEqual(summary.suppressed, 3)
+
+    def test_summary_interval(self):
+        filter, clock = self.filter(rate=1, burst=1, interval=10)
+        for _ in range(3):
+            filter.filter(make_record())
+        before = list(filter.summaries)
+        clock.now = 10
+        filter.filter(make_record('other'))
+        after = list(filter.summaries)
+        filter.filter(make_record('other'))
+
+        self.assertEqual(before, [])
+        self.assertEqual([r.suppressed for r in after], [2])
+        self.assertEqual(len(filter.summaries), 1)
+
+    def test_flush(self):
+        filter, _ = self.filter(rate=1, burst=1)
+        for _ in range(3):
+            filter.filter(make_record())
+        filter.flush()
+        filter.flush()
+
+        self.assertEqual([r.suppressed for r in filter.summaries], [2])
+
+    def test_summary_not_limited(self):
+        filter, _ = self.filter(rate=1, burst=1)
+        for _ in range(3):
+            filter.filter(make_record())
+        filter.flush()
+        summary, = filter.summaries
+        results = [filter.filter(summary) for _ in range(3)]
+
+        self.assertEqual(results, [True, True, True])
+
+    def test_emit_summary(self):
+        logging = nsl.importlib.copy_module('logging')
+        logger = logging.getLogger('eggs')
+        logger.propagate = False
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger.addHandler(handler)
+        filter = RateLimitFilter(rate=1, burst=1)
+        with mock.patch('nsl.logging._filters.logging', logging):
+            for _ in range(3):
+                filter.filter(make_record('spam %s', logging.INFO, 42,
+                                          name='eggs'))
+            filter.flush()
+
+        self.assertEqual([r.getMessage() for r in records],
+                         ['suppressed 2 messages like: spam %s'])
+
+
+class SamplingFilterTests(unittest.TestCase):
+
+    def test_rates(self):
+        filter = SamplingFilter({logging.DEBUG: 0.0, logging.INFO: 0.5})
+        with mock.patch('random.random', side_effect=[0.4, 0.6]):
+            results = [
+                    filter.filter(make_record(level=logging.DEBUG)),
+                    filter.filter(make_record(level=logging.INFO)),
+                    filter.filter(make_record(level=logging.INFO)),
+                    filter.filter(make_record(level=logging.ERROR)),
+                    ]
+
+        self.assertEqual(results, [False, True, False, True])
+
+    def test_default(self):
+        filter = SamplingFilter({}, default=0.0)
+
+        self.assertFalse(filter.filter(make_record(level=logging.ERROR)))
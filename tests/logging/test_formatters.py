@@ -0,0 +1,203 @@
+import json
+import logging
+import sys
+import unittest
+from unittest import mock
+
+import nsl.logging._formatters
+from nsl.logging._formatters import CompiledFormatter, JSONFormatter
+from . import make_record
+
+
+class CompiledFormatterTests(unittest.TestCase):
+
+    FORMATS = [
+            (None, '%'),
+            ('%(levelname)-8s %% %(name)s: %(message)s', '%'),
+            ('%(asctime)s %(message)s', '%'),
+            ('{levelname:<8} {{x}} {name!r}: {message}', '{'),
+            ('{asctime} {message} {args[0]}', '{'),
+            ('{message:>{args[0]}}', '{'),  # not compiled
+            ('$levelname $$ 100% ${name}x: $message', '$'),
+            ('${asctime} $message', '$'),
+            ]
+
+    def assert_same(self, record, *args, **kwargs):
+        expected = logging.Formatter(*args, **kwargs).format(record)
+        formatted = CompiledFormatter(*args, **kwargs).format(record)
+
+        self.assertEqual(formatted, expected)
+
+    def test_matches_stdlib(self):
+        record = make_record('spam %s', logging.INFO, 42, name='eggs')
+        for fmt, style in self.FORMATS:
+            with self.subTest((fmt, style)):
+                self.assert_same(record, fmt, style=style, validate=False)
+
+    def test_matches_stdlib_errors(self):
+        record = make_record('spam %s', logging.INFO, 42, name='eggs')
+        formats = [
+                ('%(spam)s', '%'),
+                ('{spam}', '{'),
+                ('$spam', '$'),
+                ('$message $', '$'),
+                ('%(message)s %s', '%'),  # not compiled
+                ]
+        for fmt, style in formats:
+            with self.subTest((fmt, style)):
+                with self.assertRaises(Exception) as expected:
+                    logging.Formatter(fmt, style=style,
+                                      validate=False).format(record)
+                formatter = CompiledFormatter(fmt, style=style,
+                                              validate=False)
+                with self.assertRaises(type(expected.exception)) as cm:
+                    formatter.format(record)
+
+                self.assertEqual(str(cm.exception), str(expected.exception))
+
+    def test_datefmt(self):
+        record = make_record()
+        self.assert_same(record, '%(asctime)s', '%y-%m-%d %H:%M:%S')
+
+    def test_defaults(self):
+        record = make_record()
+        self.assert_same(record, '%(spam)s %(message)s',
+                         defaults={'spam': 'ham'})
+
+    def test_exc_info(self):
+        try:
+            raise RuntimeError('oops')
+        except RuntimeError:
+            exc_info = sys.exc_info()
+        record1 = make_record(exc_info=exc_info, stack_info='Stack (spam)')
+        record2 = make_record(exc_info=exc_info, stack_info='Stack (spam)')
+        expected = logging.Formatter().format(record1)
+        formatted = CompiledFormatter().format(record2)
+
+        self.assertEqual(formatted, expected)
+        self.assertIn('RuntimeError: oops', formatted)
+
+    def test_sets_record_attrs(self):
+        record = make_record('spam %s', logging.INFO, 42, name='eggs')
+        CompiledFormatter('%(asctime)s %(message)s').format(record)
+
+        self.assertEqual(record.message, 'spam 42')
+        self.assertTrue(record.asctime)
+
+    def test_time_not_used(self):
+        formatter = CompiledFormatter('%(message)s')
+        record = make_record()
+        with mock.patch.object(formatter, 'formatTime') as formatTime:
+            formatter.format(record)
+
+        formatTime.assert_not_called()
+        self.assertFalse(formatter.usesTime())
+        self.assertFalse(hasattr(record, 'asctime'))
+
+    def test_time_cached(self):
+        formatter = CompiledFormatter('%(asctime)s')
+        record1 = make_record()
+        record2 = make_record()
+        record2.created = record1.created
+        record2.msecs = 999
+        with mock.patch('time.strftime', return_value='<time>') as strftime:
+            formatted1 = formatter.format(record1)
+            formatted2 = formatter.format(record2)
+
+        self.assertEqual(strftime.call_count, 1)
+        self.assertEqual(formatted1,
+                         '<time>,{:03d}'.format(int(record1.msecs)))
+        self.assertEqual(formatted2, '<time>,999')
+
+    def test_time_cache_expires(self):
+        formatter = CompiledFormatter('%(asctime)s', '%S')
+        record1 = make_record()
+        record2 = make_record()
+        record2.created = record1.created + 1
+        formatted1 = formatter.format(record1)
+        formatted2 = formatter.format(record2)
+
+        self.assertNotEqual(formatted1, formatted2)
+
+
+class JSONFormatterTests(unittest.TestCase):
+
+    ENCODERS = {
+            'default': None,
+            'json': json.JSONEncoder(separators=(',', ':'),
+                                     default=str).encode,
+            }
+
+    def format(self, record, **kwargs):
+        for name, encode in self.ENCODERS.items():
+            with self.subTest(name):
+                formatter = JSONFormatter(encode=encode, **kwargs)
+                yield formatter.format(record)
+
+    def test_defaults(self):
+        record = make_record('spam %s', logging.INFO, 42, name='eggs')
+        for formatted in self.format(record):
+            self.assertEqual(json.loads(formatted), {
+                    'time': record.created,
+                    'level': 'INFO',
+                    'logger': 'eggs',
+                    'message': 'spam 42',
+                    })
+            self.assertNotIn('\n', formatted)
+            self.assertLess(formatted.index('"time"'),
+                            formatted.index('"message"'))
+
+    def test_fields(self):
+        record = make_record('spam %s', logging.INFO, 42, name='eggs')
+        fields = {'msg': 'message', 'line': 'lineno'}
+        for formatted in self.format(record, fields=fields):
+            self.assertEqual(formatted, '{"msg":"spam 42","line":1}')
+
+    def test_missing_field(self):
+        record = make_record()
+        formatter = JSONFormatter(fields={'spam': 'spam'})
+        with self.assertRaises(ValueError):
+            formatter.format(record)
+
+    def test_asctime(self):
+        record = make_record()
+        formatter = JSONFormatter(fields={'time': 'asctime'})
+        formatted = json.loads(formatter.format(record))
+
+        self.assertTrue(formatter.usesTime())
+        self.assertEqual(formatted['time'], record.asctime)
+
+    def test_extra(self):
+        record = make_record(spam={'eggs': [1, 2]}, ham=object())
+        for formatted in self.format(record):
+            obj = json.loads(formatted)
+
+            self.assertEqual(list(obj)[-2:], ['spam', 'ham'])
+            self.assertEqual(obj['spam'], {'eggs': [1, 2]})
+            self.assertEqual(obj['ham'], str(record.ham))
+
+    def test_without_extra(self):
+        record = make_record(spam='eggs')
+        for formatted in self.format(record, extra=False):
+            self.assertNotIn('spam', json.loads(formatted))
+
+    def test_exc_info(self):
+        try:
+            raise RuntimeError('oops')
+        except RuntimeError:
+            exc_info = sys.exc_info()
+        record = make_record(exc_info=exc_info, stack_info='Stack (spam)')
+        for formatted in self.format(record):
+            obj = json.loads(formatted)
+
+            self.assertIn('RuntimeError: oops', obj['exc_info'])
+            self.assertEqual(obj['stack_info'], 'Stack (spam)')
+
+    def test_fallback_encoder(self):
+        self.addCleanup(setattr, nsl.logging._formatters, 'orjson',
+                        nsl.logging._formatters.orjson)
+        nsl.logging._formatters.orjson = None
+        record = make_record(spam='\N{SNOWMAN}')
+        formatted = JSONFormatter().format(record)
+
+        self.assertIn('"spam":"\N{SNOWMAN}"', formatted)
@@ -0,0 +1,236 @@
+import gzip
+import logging
+import os.path
+import tempfile
+import time
+import unittest
+
+import nsl.logging._handlers
+from nsl.logging._handlers import BufferedFileHandler, RotatingFileHandler
+from . import make_record
+
+
+def _read(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as infile:
+        return infile.read()
+
+
+class BufferedFileHandlerTests(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        self.filename = os.path.join(tmpdir.name, 'spam.log')
+
+    def handler(self, **kwargs):
+        kwargs.setdefault('interval', None)
+        handler = BufferedFileHandler(self.filename, delay=True, **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_buffered(self):
+        handler = self.handler()
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b'))
+        before = _read(self.filename)
+        handler.flush()
+        after = _read(self.filename)
+
+        self.assertIsNone(before)
+        self.assertEqual(after, 'a\nb\n')
+
+    def test_capacity(self):
+        handler = self.handler(capacity=6)
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b'))
+        before = _read(self.filename)
+        handler.handle(make_record('c'))
+        after = _read(self.filename)
+
+        self.assertIsNone(before)
+        self.assertEqual(after, 'a\nb\nc\n')
+
+    def test_flushlevel(self):
+        handler = self.handler()
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b', logging.ERROR))
+        handler.handle(make_record('c'))
+        after = _read(self.filename)
+
+        self.assertEqual(after, 'a\nb\n')
+
+    def test_interval(self):
+        handler = self.handler(interval=3600)
+        handler.handle(make_record('a'))
+        before = _read(self.filename)
+        handler.deadline = time.monotonic()
+        handler.handle(make_record('b'))
+        after = _read(self.filename)
+
+        self.assertIsNone(before)
+        self.assertEqual(after, 'a\nb\n')
+
+    def test_background_flush(self):
+        self.addCleanup(setattr, nsl.logging._handlers._Flusher, 'TICK',
+                        nsl.logging._handlers._Flusher.TICK)
+        nsl.logging._handlers._Flusher.TICK = 0.01
+        handler = self.handler(interval=0.01)
+        handler.handle(make_record('a'))
+        for _ in range(100):
+            after = _read(self.filename)
+            if after:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(after, 'a\n')
+
+    def test_close(self):
+        handler = self.handler()
+        handler.handle(make_record('a'))
+        handler.close()
+
+        self.assertEqual(_read(self.filename), 'a\n')
+
+
+class RotatingFileHandlerTests(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        self.dirname = tmpdir.name
+        self.filename = os.path.join(tmpdir.name, 'spam.log')
+
+    def handler(self, **kwargs):
+        kwargs.setdefault('maxbytes', None)
+        handler = RotatingFileHandler(self.filename, delay=True, **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    def wait(self, handler):
+        for done in handler._pending:
+            done.wait(5)
+
+    def read_rotated(self, handler):
+        texts = []
+        for filename in handler.rotated_files():
+            if filename.endswith('.gz'):
+                with gzip.open(filename, 'rt') as infile:
+                    texts.append(infile.read())
+            else:
+                texts.append(_read(filename))
+        return texts
+
+    def test_no_rotation(self):
+        handler = self.handler()
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b'))
+
+        self.assertEqual(_read(self.filename), 'a\nb\n')
+        self.assertEqual(handler.rotated_files(), [])
+
+    def test_maxbytes(self):
+        handler = self.handler(maxbytes=4, compress=None)
+        for msg in 'abcde':
+            handler.handle(make_record(msg))
+        self.wait(handler)
+
+        self.assertEqual(_read(self.filename), 'e\n')
+        self.assertEqual(self.read_rotated(handler), ['a\nb\n', 'c\nd\n'])
+
+    def test_maxbytes_existing_file(self):
+        with open(self.filename, 'w') as outfile:
+            outfile.write('x\ny\n')
+        handler = self.handler(maxbytes=4, compress=None)
+        handler.handle(make_record('a'))
+        self.wait(handler)
+
+        self.assertEqual(_read(self.filename), 'a\n')
+        self.assertEqual(self.read_rotated(handler), ['x\ny\n'])
+
+    def test_interval(self):
+        handler = self.handler(interval=3600, compress=None)
+        handler.handle(make_record('a'))
+        handler.rollover_at = time.time()
+        handler.handle(make_record('b'))
+        self.wait(handler)
+
+        self.assertEqual(_read(self.filename), 'b\n')
+        self.assertEqual(self.read_rotated(handler), ['a\n'])
+        self.assertGreater(handler.rollover_at, time.time())
+        self.assertEqual(handler.rollover_at % 3600, 0)
+
+    def test_gzip(self):
+        handler = self.handler(maxbytes=4, compress='gzip')
+        for msg in 'abc':
+            handler.handle(make_record(msg))
+        self.wait(handler)
+        rotated, = handler.rotated_files()
+
+        self.assertTrue(rotated.endswith('.gz'))
+        self.assertEqual(self.read_rotated(handler), ['a\nb\n'])
+        self.assertEqual(sorted(os.listdir(self.dirname)),
+                         ['spam.log', os.path.basename(rotated)])
+
+    @unittest.skipIf(nsl.logging._handlers.zstandard is None,
+                     'zstandard not installed')
+    def test_zstd(self):
+        zstandard = nsl.logging._handlers.zstandard
+        handler = self.handler(maxbytes=4, compress='zstd')
+        for msg in 'abc':
+            handler.handle(make_record(msg))
+        self.wait(handler)
+        rotated, = handler.rotated_files()
+        with open(rotated, 'rb') as infile:
+            data = zstandard.ZstdDecompressor().stream_reader(infile).read()
+
+        self.assertTrue(rotated.endswith('.zst'))
+        self.assertEqual(data, b'a\nb\n')
+
+    def test_unsupported_compression(self):
+        with self.assertRaises(ValueError):
+            RotatingFileHandler(self.filename, delay=True, compress='lzma')
+
+    def test_backups(self):
+        handler = self.handler(maxbytes=2, backups=2)
+        for msg in 'abcde':
+            handler.handle(make_record(msg))
+        self.wait(handler)
+
+        self.assertEqual(_read(self.filename), 'e\n')
+        self.assertEqual(self.read_rotated(handler), ['c\n', 'd\n'])
+
+    def test_backups_keep_other_files(self):
+        others = ['spam.log.err', 'spam.log.lock', 'spam.log.1',
+                  'spam.log.20240101-120000.bak', 'spam.logs']
+        for name in others:
+            with open(os.path.join(self.dirname, name), 'w'):
+                pass
+        handler = self.handler(maxbytes=2, backups=1, compress=None)
+        for msg in 'abc':
+            handler.handle(make_record(msg))
+        self.wait(handler)
+
+        self.assertEqual(self.read_rotated(handler), ['b\n'])
+        for name in others:
+            self.assertTrue(os.path.exists(os.path.join(self.dirname, name)),
+                            name)
+
+    def test_same_second(self):
+        handler = self.handler(maxbytes=2, backups=None, compress=None)
+        for msg in 'abc':
+            handler.handle(make_record(msg))
+        self.wait(handler)
+
+        self.assertEqual(self.read_rotated(handler), ['a\n', 'b\n'])
+
+    def test_close_waits(self):
+        handler = self.handler(maxbytes=2)
+        for msg in 'ab':
+            handler.handle(make_record(msg))
+        handler.close()
+
+        self.assertEqual(self.read_rotated(handler), ['a\n'])
+        self.assertFalse([name for name in os.listdir(self.dirname)
+                          if name.endswith('.tmp')])
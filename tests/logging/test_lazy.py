@@ -0,0 +1,115 @@
+import io
+import logging
+import unittest
+
+from nsl.logging._lazy import lazy, LazyAdapter
+
+
+class Counter:
+
+    def __init__(self, value='spam'):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def _logger(*handlers, level=logging.DEBUG):
+    logger = logging.Logger('spam', level)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+class LazyTests(unittest.TestCase):
+
+    def test_str(self):
+        func = Counter()
+        value = lazy(func)
+
+        self.assertEqual(func.calls, 0)
+        self.assertEqual(str(value), 'spam')
+        self.assertEqual(repr(value), "'spam'")
+        self.assertEqual('{:>6}'.format(value), '  spam')
+        self.assertEqual('%s %r' % (value, value), "spam 'spam'")
+        self.assertEqual(func.calls, 1)
+
+    def test_args(self):
+        value = lazy(lambda *args, **kwargs: (args, kwargs), 1, 2, x=3)
+
+        self.assertEqual(value.value, ((1, 2), {'x': 3}))
+
+    def test_filtered_by_handler_level(self):
+        func = Counter()
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setLevel(logging.INFO)
+        logger = _logger(handler)
+        logger.debug('%s', lazy(func))
+
+        self.assertEqual(func.calls, 0)
+        self.assertEqual(stream.getvalue(), '')
+
+    def test_computed_once(self):
+        func = Counter()
+        stream1 = io.StringIO()
+        stream2 = io.StringIO()
+        logger = _logger(logging.StreamHandler(stream1),
+                         logging.StreamHandler(stream2))
+        logger.debug('%s', lazy(func))
+
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(stream1.getvalue(), 'spam\n')
+        self.assertEqual(stream2.getvalue(), 'spam\n')
+
+
+class LazyAdapterTests(unittest.TestCase):
+
+    def test_functions_are_lazy(self):
+        func = Counter()
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setLevel(logging.INFO)
+        adapter = LazyAdapter(_logger(handler))
+        adapter.debug('%s', lambda: func())
+        adapter.info('%s %s', lambda: func(), 'eggs')
+
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(stream.getvalue(), 'spam eggs\n')
+
+    def test_disabled_level(self):
+        func = Counter()
+        adapter = LazyAdapter(_logger(logging.NullHandler(),
+                                      level=logging.INFO))
+        adapter.debug('%s', lambda: func())
+
+        self.assertEqual(func.calls, 0)
+
+    def test_other_callables(self):
+        stream = io.StringIO()
+        adapter = LazyAdapter(_logger(logging.StreamHandler(stream)))
+        adapter.info('%s', len)
+
+        self.assertEqual(stream.getvalue(), '<built-in function len>\n')
+
+    def test_caller(self):
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(funcName)s:%(message)s'))
+        adapter = LazyAdapter(_logger(handler))
+        adapter.info('a')
+        adapter.exception('b', exc_info=False)
+
+        self.assertEqual(stream.getvalue(),
+                         'test_caller:a\ntest_caller:b\n')
+
+    def test_extra(self):
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(user)s:%(message)s'))
+        adapter = LazyAdapter(_logger(handler), {'user': 'eggs'})
+        adapter.info('a')
+
+        self.assertEqual(stream.getvalue(), 'eggs:a\n')
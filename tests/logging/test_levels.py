@@ -0,0 +1,107 @@
+import logging
+import unittest
+
+import nsl.importlib
+from nsl.logging._levels import LoggerProxy, refresh_proxies
+from . import ListHandler
+
+
+class LoggerProxyTests(unittest.TestCase):
+
+    def setUp(self):
+        # Use a separate logging module to avoid global side effects.
+        self.logging = nsl.importlib.copy_module('logging')
+        self.logger = self.logging.getLogger('spam')
+        self.logger.propagate = False
+        self.handler = ListHandler()
+        self.logger.addHandler(self.handler)
+
+    def proxy(self, level=logging.INFO):
+        self.logger.setLevel(level)
+        return LoggerProxy(self.logger)
+
+    def test_levels(self):
+        proxy = self.proxy(logging.WARNING)
+
+        self.assertFalse(proxy.is_debug)
+        self.assertFalse(proxy.is_info)
+        self.assertTrue(proxy.is_warning)
+        self.assertTrue(proxy.is_error)
+        self.assertTrue(proxy.is_critical)
+
+    def test_methods(self):
+        proxy = self.proxy(logging.INFO)
+        proxy.debug('a')
+        proxy.info('b %s', 1)
+        proxy.warning('c')
+        proxy.error('d')
+        proxy.critical('e')
+        proxy.log(logging.DEBUG, 'f')
+        proxy.log(logging.INFO, 'g')
+        try:
+            raise RuntimeError
+        except RuntimeError:
+            proxy.exception('h')
+        records = self.handler.records
+
+        self.assertEqual([r.getMessage() for r in records],
+                         ['b 1', 'c', 'd', 'e', 'g', 'h'])
+        self.assertEqual([r.levelname for r in records],
+                         ['INFO', 'WARNING', 'ERROR', 'CRITICAL', 'INFO',
+                          'ERROR'])
+        self.assertIs(records[-1].exc_info[0], RuntimeError)
+
+    def test_caller(self):
+        proxy = self.proxy()
+        proxy.info('a')
+        proxy.log(logging.INFO, 'b')
+        proxy.info('c', stacklevel=2)
+
+        for record in self.handler.records[:2]:
+            self.assertEqual(record.funcName, 'test_caller')
+            self.assertEqual(record.pathname, __file__)
+        self.assertNotEqual(self.handler.records[2].funcName, 'test_caller')
+
+    def test_refresh_on_set_level(self):
+        proxy = self.proxy(logging.INFO)
+        self.logger.setLevel(logging.DEBUG)
+
+        self.assertTrue(proxy.is_debug)
+
+    def test_refresh_on_parent_level(self):
+        self.logger.setLevel(logging.NOTSET)
+        self.logging.root.setLevel(logging.ERROR)
+        proxy = LoggerProxy(self.logger)
+        before = proxy.is_warning
+        self.logging.root.setLevel(logging.DEBUG)
+
+        self.assertFalse(before)
+        self.assertTrue(proxy.is_debug)
+
+    def test_refresh_on_disable(self):
+        proxy = self.proxy(logging.DEBUG)
+        self.logging.disable(logging.WARNING)
+
+        self.assertFalse(proxy.is_warning)
+        self.assertTrue(proxy.is_error)
+
+    def test_refresh(self):
+        proxy = self.proxy(logging.DEBUG)
+        self.logger.disabled = True
+        before = proxy.is_critical
+        proxy.refresh()
+
+        self.assertTrue(before)
+        self.assertFalse(proxy.is_critical)
+
+    def test_refresh_proxies(self):
+        proxy = self.proxy(logging.DEBUG)
+        self.logger.disabled = True
+        refresh_proxies()
+
+        self.assertFalse(proxy.is_critical)
+
+    def test_name(self):
+        proxy = self.proxy()
+
+        self.assertEqual(proxy.name, 'spam')
@@ -0,0 +1,200 @@
+import io
+import logging
+import os.path
+import tempfile
+import threading
+import unittest
+
+from nsl.logging._metrics import (
+        Histogram, instrument, metrics_snapshot,
+        format_prometheus, write_prometheus,
+        )
+from nsl.logging._asyncio import AsyncioHandler
+from nsl.logging._perthread import PerThreadHandler
+from nsl.logging._queue import QueueingHandler
+from . import make_record
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_snapshot(self):
+        hist = Histogram([1, 10])
+        for value in (0.5, 1, 5, 20):
+            hist.observe(value)
+
+        self.assertEqual(hist.snapshot(), {
+                'buckets': [(1, 2), (10, 3), (float('inf'), 4)],
+                'count': 4,
+                'sum': 26.5,
+                })
+
+
+class InstrumentTests(unittest.TestCase):
+
+    def handler(self, name=None):
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        metrics = instrument(handler, name)
+        return handler, stream, metrics
+
+    def test_counts(self):
+        handler, stream, metrics = self.handler()
+        handler.handle(make_record('a'))
+        handler.handle(make_record('\xe9', logging.ERROR))
+        handler.handle(make_record('bc'))
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(stream.getvalue(), 'a\n\xe9\nbc\n')
+        self.assertEqual(snapshot['records'], {'INFO': 2, 'ERROR': 1})
+        self.assertEqual(snapshot['bytes'], 8)
+        self.assertEqual(snapshot['format_seconds']['count'], 3)
+        self.assertEqual(snapshot['emit_seconds']['count'], 3)
+        self.assertGreater(snapshot['lock_held_seconds'], 0)
+        self.assertNotIn('queue_depth', snapshot)
+
+    def test_filtered(self):
+        handler, stream, metrics = self.handler()
+        handler.addFilter(lambda r: r.levelno >= logging.ERROR)
+        handler.handle(make_record('a'))
+
+        self.assertEqual(stream.getvalue(), '')
+        self.assertEqual(metrics.snapshot()['records'], {})
+
+    def test_idempotent(self):
+        handler, _, metrics = self.handler()
+
+        self.assertIs(instrument(handler), metrics)
+
+    def test_name(self):
+        handler = logging.StreamHandler(io.StringIO())
+        handler.set_name('eggs')
+        named = instrument(handler)
+        _, _, unnamed = self.handler()
+
+        self.assertEqual(named.name, 'eggs')
+        self.assertTrue(unnamed.name.startswith('StreamHandler-'))
+
+    def test_queue(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        handler = QueueingHandler(target)
+        self.addCleanup(handler.close)
+        instrument(handler, 'queued')
+        handler.handle(make_record('a'))
+        handler.close()
+        snapshot = metrics_snapshot()
+
+        self.assertEqual(snapshot['queued']['records'], {'INFO': 1})
+        self.assertEqual(snapshot['queued']['bytes'], 0)
+        self.assertEqual(snapshot['queued']['queue_depth'], 0)
+        self.assertEqual(snapshot['queued']['dropped'], 0)
+        self.assertEqual(snapshot['queued.0']['records'], {'INFO': 1})
+        self.assertEqual(snapshot['queued.0']['bytes'], 2)
+
+    def test_per_thread(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        handler = PerThreadHandler(target, interval=60)
+        self.addCleanup(handler.close)
+        handle = handler.handle
+        instrument(handler, 'per-thread')
+        handler.handle(make_record('a'))
+        handler.flush()
+        snapshot = metrics_snapshot()
+
+        self.assertEqual(handler.handle, handle)
+        self.assertEqual(snapshot['per-thread']['records'], {})
+        self.assertEqual(snapshot['per-thread.0']['records'], {'INFO': 1})
+        self.assertEqual(snapshot['per-thread.0']['bytes'], 2)
+        self.assertEqual(
+                snapshot['per-thread.0']['format_seconds']['count'], 1)
+
+    def test_asyncio(self):
+        stream = io.StringIO()
+        handler = AsyncioHandler(stream)
+        self.addCleanup(handler.close)
+        handle = handler.handle
+        metrics = instrument(handler)
+        handler.acquire = None  # It must not be used.
+        handler.handle(make_record('a'))
+        del handler.acquire
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(handler.handle, handle)
+        self.assertEqual(stream.getvalue(), 'a\n')
+        self.assertEqual(snapshot['records'], {'INFO': 1})
+        self.assertEqual(snapshot['bytes'], 2)
+        self.assertEqual(snapshot['emit_seconds']['count'], 1)
+        self.assertEqual(snapshot['lock_wait_seconds'], 0)
+
+    def test_snapshot_threads(self):
+        handler, _, metrics = self.handler()
+
+        def log():
+            for _ in range(1000):
+                handler.handle(make_record())
+        threads = [threading.Thread(target=log) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(metrics.snapshot()['records'], {'INFO': 4000})
+        self.assertEqual(metrics.snapshot()['emit_seconds']['count'], 4000)
+
+
+class PrometheusTests(unittest.TestCase):
+
+    SNAPSHOT = {
+            'spam': {
+                'records': {'INFO': 2},
+                'bytes': 10,
+                'format_seconds': {'buckets': [(0.5, 1), (float('inf'), 2)],
+                                   'count': 2, 'sum': 1.25},
+                'emit_seconds': {'buckets': [(0.5, 2), (float('inf'), 2)],
+                                 'count': 2, 'sum': 0.5},
+                'lock_held_seconds': 0.5,
+                'lock_wait_seconds': 0.0,
+                'queue_depth': 3,
+                'dropped': 1,
+                },
+            }
+
+    def test_format(self):
+        text = format_prometheus(self.SNAPSHOT)
+        lines = text.splitlines()
+
+        self.assertIn('# TYPE nsl_logging_records_total counter', lines)
+        self.assertIn('nsl_logging_records_total'
+                      '{handler="spam",level="INFO"} 2', lines)
+        self.assertIn('nsl_logging_bytes_total{handler="spam"} 10', lines)
+        self.assertIn('# TYPE nsl_logging_format_seconds histogram', lines)
+        self.assertIn('nsl_logging_format_seconds_bucket'
+                      '{handler="spam",le="0.5"} 1', lines)
+        self.assertIn('nsl_logging_format_seconds_bucket'
+                      '{handler="spam",le="+Inf"} 2', lines)
+        self.assertIn('nsl_logging_format_seconds_sum{handler="spam"} 1.25',
+                      lines)
+        self.assertIn('nsl_logging_emit_seconds_count{handler="spam"} 2',
+                      lines)
+        self.assertIn('nsl_logging_lock_held_seconds_total'
+                      '{handler="spam"} 0.5', lines)
+        self.assertIn('nsl_logging_queue_depth{handler="spam"} 3', lines)
+        self.assertIn('nsl_logging_dropped_total{handler="spam"} 1', lines)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_escaping(self):
+        snapshot = {'a"b\\c': dict(self.SNAPSHOT['spam'])}
+        text = format_prometheus(snapshot)
+
+        self.assertIn('{handler="a\\"b\\\\c"}', text)
+
+    def test_write(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        filename = os.path.join(tmpdir.name, 'logging.prom')
+        write_prometheus(filename, self.SNAPSHOT)
+
+        with open(filename) as infile:
+            self.assertEqual(infile.read(), format_prometheus(self.SNAPSHOT))
+        self.assertEqual(os.listdir(tmpdir.name), ['logging.prom'])
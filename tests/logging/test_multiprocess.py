@@ -0,0 +1,151 @@
+import logging
+import multiprocessing
+import os.path
+import sys
+import tempfile
+import unittest
+
+import nsl.importlib
+from nsl.logging._multiprocess import (
+        LogAggregator, AggregatorHandler, aggregate_logs, connect_logs,
+        )
+from . import ListHandler, make_record
+
+
+def _log_lines(address, count):
+    # This runs in a child process.
+    if address is not None:
+        connect_logs(address)
+    logger = logging.getLogger('worker')
+    logger.setLevel(logging.INFO)
+    for i in range(count):
+        logger.info('%s %s', os.getpid(), i)
+
+
+@unittest.skipIf(sys.platform == 'win32', 'requires Unix sockets')
+class LogAggregatorTests(unittest.TestCase):
+
+    def test_in_process(self):
+        target1 = ListHandler()
+        target2 = ListHandler(logging.ERROR)
+        with LogAggregator(target1, target2) as aggregator:
+            handler = aggregator.handler()
+            handler.handle(make_record('a %s', logging.INFO, 42))
+            handler.handle(make_record('b %s', logging.ERROR, 42))
+            handler.close()
+
+        self.assertEqual([r.getMessage() for r in target1.records],
+                         ['a 42', 'b 42'])
+        self.assertEqual([r.getMessage() for r in target2.records],
+                         ['b 42'])
+
+    def test_close(self):
+        target = ListHandler()
+        target.close = lambda: setattr(target, 'closed', True)
+        aggregator = LogAggregator(target)
+        aggregator.start()
+        address = aggregator.address
+        aggregator.close()
+        aggregator.close()
+
+        self.assertTrue(target.closed)
+        self.assertFalse(os.path.exists(address))
+
+    def test_no_handlers(self):
+        with self.assertRaises(TypeError):
+            LogAggregator()
+
+    def test_not_running(self):
+        aggregator = LogAggregator(ListHandler())
+        self.addCleanup(aggregator.close)
+        handler = AggregatorHandler(aggregator.address)
+        handler.handleError = lambda record: setattr(handler, 'failed',
+                                                     record)
+        record = make_record()
+        handler.handle(record)
+
+        self.assertIs(handler.failed, record)
+
+    def output_file(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        filename = os.path.join(tmpdir.name, 'workers.log')
+        handler = logging.FileHandler(filename)
+        handler.setFormatter(logging.Formatter('%(name)s %(message)s'))
+        return filename, handler
+
+    def run_workers(self, context, address, nprocs, count):
+        procs = [context.Process(target=_log_lines, args=(address, count))
+                 for _ in range(nprocs)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        for proc in procs:
+            self.assertEqual(proc.exitcode, 0)
+        return procs
+
+    def assert_lines(self, filename, procs, count):
+        with open(filename) as infile:
+            lines = infile.read().splitlines()
+
+        self.assertEqual(len(lines), len(procs) * count)
+        for proc in procs:
+            expected = ['worker {} {}'.format(proc.pid, i)
+                        for i in range(count)]
+            self.assertEqual([line for line in lines
+                              if line.split()[1] == str(proc.pid)],
+                             expected)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_fork(self):
+        # The children inherit the root logger's AggregatorHandler.
+        self.addCleanup(setattr, logging.root, 'handlers',
+                        logging.root.handlers)
+        logging.root.handlers = []
+        filename, handler = self.output_file()
+        aggregator = aggregate_logs(None, handler)
+        try:
+            context = multiprocessing.get_context('fork')
+            procs = self.run_workers(context, None, 4, 100)
+        finally:
+            aggregator.close()
+
+        self.assert_lines(filename, procs, 100)
+
+    def test_spawn(self):
+        filename, handler = self.output_file()
+        with LogAggregator(handler) as aggregator:
+            context = multiprocessing.get_context('spawn')
+            procs = self.run_workers(context, aggregator.address, 2, 20)
+
+        self.assert_lines(filename, procs, 20)
+
+
+class ConnectLogsTests(unittest.TestCase):
+
+    def test_replaces_handlers(self):
+        logging_ = nsl.importlib.copy_module('logging')
+        logger = logging_.getLogger('spam')
+        logger.addHandler(ListHandler())
+        handler = connect_logs('/tmp/spam.sock', logger)
+
+        self.assertEqual(logger.handlers, [handler])
+        self.assertEqual(handler.address, '/tmp/spam.sock')
+
+
+@unittest.skipIf(sys.platform == 'win32', 'requires Unix sockets')
+class AggregateLogsTests(unittest.TestCase):
+
+    def test_replaces_handlers(self):
+        logging_ = nsl.importlib.copy_module('logging')
+        logger = logging_.getLogger('spam')
+        target = ListHandler()
+        logger.addHandler(target)
+        aggregator = aggregate_logs(logger)
+        self.addCleanup(aggregator.close)
+        handler, = logger.handlers
+
+        self.assertEqual(aggregator.handlers, (target,))
+        self.assertIsInstance(handler, AggregatorHandler)
+        self.assertEqual(handler.address, aggregator.address)
@@ -0,0 +1,188 @@
+import logging
+import threading
+import unittest
+
+from nsl.logging._perthread import PerThreadHandler, per_thread_handler
+from . import ListHandler, make_record
+
+
+class PerThreadHandlerTests(unittest.TestCase):
+
+    def handler(self, *handlers, **kwargs):
+        kwargs.setdefault('interval', 60)
+        handler = PerThreadHandler(*handlers, **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_buffered(self):
+        target = ListHandler()
+        handler = self.handler(target)
+        handler.handle(make_record('a %s', logging.INFO, 'b'))
+        handler.handle(make_record('c'))
+        before = list(target.records)
+        handler.flush()
+
+        self.assertEqual(before, [])
+        self.assertEqual([r.getMessage() for r in target.records],
+                         ['a b', 'c'])
+
+    def test_args_merged(self):
+        target = ListHandler()
+        handler = self.handler(target)
+        args = ['a']
+        handler.handle(make_record('%s', logging.INFO, args))
+        args.append('b')
+        handler.flush()
+
+        self.assertEqual(target.records[0].getMessage(), "['a']")
+
+    def test_record_not_modified(self):
+        target = ListHandler()
+        handler = self.handler(target)
+        record1 = make_record('x=%s', logging.INFO, 5)
+        record2 = make_record('x=%s', logging.INFO, [5])
+        handler.handle(record1)
+        handler.handle(record2)
+        handler.flush()
+
+        self.assertEqual(record1.args, (5,))
+        self.assertEqual(record2.msg, 'x=%s')
+        self.assertEqual(record2.args, ([5],))
+        self.assertIs(target.records[0], record1)
+        self.assertIsNot(target.records[1], record2)
+        self.assertEqual([r.getMessage() for r in target.records],
+                         ['x=5', 'x=[5]'])
+
+    def test_no_handlers(self):
+        with self.assertRaises(TypeError):
+            PerThreadHandler()
+
+    def test_handler_levels(self):
+        target1 = ListHandler()
+        target2 = ListHandler(logging.ERROR)
+        handler = self.handler(target1, target2)
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b', logging.ERROR))
+        handler.flush()
+
+        self.assertEqual(len(target1.records), 2)
+        self.assertEqual([r.msg for r in target2.records], ['b'])
+
+    def test_capacity(self):
+        target = ListHandler()
+        handler = self.handler(target, capacity=2)
+        flushed = threading.Event()
+        target.flush = flushed.set
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b'))
+
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual([r.msg for r in target.records], ['a', 'b'])
+
+    def test_maxsize(self):
+        target = ListHandler()
+        handler = self.handler(target, maxsize=2)
+        with handler._drain_lock:
+            # Nothing gets drained meanwhile.
+            for msg in 'abc':
+                handler.handle(make_record(msg))
+        handler.flush()
+
+        self.assertEqual([r.msg for r in target.records], ['a', 'b'])
+        self.assertEqual(handler.dropped, 1)
+
+    def test_maxsize_block(self):
+        target = ListHandler()
+        handler = self.handler(target, maxsize=2, block=True, timeout=5)
+        for msg in 'abcde':
+            handler.handle(make_record(msg))
+        handler.flush()
+
+        self.assertEqual([r.msg for r in target.records], list('abcde'))
+        self.assertEqual(handler.dropped, 0)
+
+    def test_maxsize_block_timeout(self):
+        target = ListHandler()
+        handler = self.handler(target, maxsize=1, block=True, timeout=0.01)
+        with handler._drain_lock:
+            handler.handle(make_record('a'))
+            handler.handle(make_record('b'))
+        handler.flush()
+
+        self.assertEqual([r.msg for r in target.records], ['a'])
+        self.assertEqual(handler.dropped, 1)
+
+    def test_interval(self):
+        target = ListHandler()
+        handler = self.handler(target, interval=0.01)
+        flushed = threading.Event()
+        target.flush = flushed.set
+        handler.handle(make_record('a'))
+
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual([r.msg for r in target.records], ['a'])
+
+    def test_close(self):
+        target = ListHandler()
+        handler = self.handler(target)
+        handler.handle(make_record('a'))
+        handler.close()
+        handler.close()
+
+        self.assertEqual([r.msg for r in target.records], ['a'])
+
+    def test_per_thread_order(self):
+        target = ListHandler()
+        handler = self.handler(target, capacity=7, interval=0.001)
+
+        def log(name):
+            for i in range(500):
+                handler.handle(make_record('{} {}'.format(name, i)))
+        threads = [threading.Thread(target=log, args=(n,)) for n in 'abcd']
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        handler.flush()
+        logged = {}
+        for record in target.records:
+            name, _, i = record.msg.partition(' ')
+            logged.setdefault(name, []).append(int(i))
+
+        self.assertEqual(logged, {n: list(range(500)) for n in 'abcd'})
+
+    def test_ordered(self):
+        target = ListHandler()
+        handler = self.handler(target, ordered=True)
+
+        def log(*times):
+            for created in times:
+                handler.handle(make_record(str(created), created=created))
+        t1 = threading.Thread(target=log, args=(1, 4, 5))
+        t2 = threading.Thread(target=log, args=(2, 3, 6))
+        for t in (t1, t2):
+            t.start()
+            t.join()
+        handler.flush()
+
+        self.assertEqual([r.created for r in target.records],
+                         [1, 2, 3, 4, 5, 6])
+
+    def test_finished_threads_forgotten(self):
+        target = ListHandler()
+        handler = self.handler(target)
+        t = threading.Thread(target=handler.handle, args=(make_record(),))
+        t.start()
+        t.join()
+        handler.flush()
+        handler.flush()
+
+        self.assertEqual(handler._buffers, [])
+        self.assertEqual(len(target.records), 1)
+
+    def test_per_thread_handler_level(self):
+        handler = per_thread_handler(ListHandler(logging.WARNING),
+                                     ListHandler(logging.ERROR))
+        self.addCleanup(handler.close)
+
+        self.assertEqual(handler.level, logging.WARNING)
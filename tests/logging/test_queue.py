@@ -0,0 +1,131 @@
+import logging
+import sys
+import threading
+import unittest
+
+from nsl.logging._queue import QueueingHandler, queued_handler
+from . import ListHandler, make_record
+
+
+class QueueingHandlerTests(unittest.TestCase):
+
+    def handler(self, *handlers, **kwargs):
+        handler = QueueingHandler(*handlers, **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_emit(self):
+        target = ListHandler()
+        handler = self.handler(target)
+        handler.handle(make_record('a %s', logging.INFO, 'b'))
+        handler.handle(make_record('c'))
+        handler.close()
+
+        self.assertEqual([r.getMessage() for r in target.records],
+                         ['a b', 'c'])
+        self.assertEqual(handler.dropped, 0)
+
+    def test_no_handlers(self):
+        with self.assertRaises(TypeError):
+            QueueingHandler()
+
+    def test_drop_when_full(self):
+        blocker = threading.Event()
+        target = ListHandler(blocker=blocker)
+        handler = self.handler(target, maxsize=2)
+        for _ in range(10):
+            handler.handle(make_record())
+        dropped = handler.dropped
+        blocker.set()
+        handler.close()
+
+        # One record may already be with the blocked handler.
+        self.assertIn(dropped, (7, 8))
+        self.assertEqual(len(target.records) + dropped, 10)
+
+    def test_block_when_full(self):
+        blocker = threading.Event()
+        target = ListHandler(blocker=blocker)
+        handler = self.handler(target, maxsize=1, block=True, timeout=0.01)
+        for _ in range(5):
+            handler.handle(make_record())
+        blocker.set()
+        handler.close()
+
+        self.assertGreater(handler.dropped, 0)
+        self.assertEqual(len(target.records) + handler.dropped, 5)
+
+    def test_respects_handler_level(self):
+        target1 = ListHandler(logging.ERROR)
+        target2 = ListHandler()
+        handler = self.handler(target1, target2)
+        handler.handle(make_record(level=logging.INFO))
+        handler.handle(make_record(level=logging.ERROR))
+        handler.close()
+
+        self.assertEqual(len(target1.records), 1)
+        self.assertEqual(len(target2.records), 2)
+
+    def test_set_formatter(self):
+        formatter = logging.Formatter()
+        target1 = ListHandler()
+        target2 = ListHandler()
+        target2.setFormatter(logging.Formatter())
+        handler = self.handler(target1, target2)
+        handler.setFormatter(formatter)
+
+        self.assertIsNone(handler.formatter)
+        self.assertIs(target1.formatter, formatter)
+        self.assertIsNot(target2.formatter, formatter)
+
+    def test_formatted_by_wrapped(self):
+        target = ListHandler()
+        target.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        handler = self.handler(target)
+        try:
+            raise RuntimeError('oops')
+        except RuntimeError:
+            exc_info = sys.exc_info()
+        record = make_record('a %s', logging.ERROR, [1], exc_info=exc_info,
+                             stack_info='Stack (spam)')
+        handler.handle(record)
+        handler.close()
+        queued, = target.records
+        formatted = target.format(queued)
+
+        self.assertIsNot(queued, record)
+        self.assertIs(record.exc_info, exc_info)
+        self.assertEqual(queued.msg, 'a [1]')
+        self.assertIsNone(queued.args)
+        self.assertIsNone(queued.exc_info)
+        self.assertTrue(formatted.startswith('ERROR a [1]\nTraceback'))
+        self.assertIn('RuntimeError: oops', formatted)
+        self.assertTrue(formatted.endswith('\nStack (spam)'))
+
+    def test_close(self):
+        target = ListHandler()
+        target.close = lambda: setattr(target, 'closed', True)
+        handler = self.handler(target)
+        thread = handler.listener._thread
+        handler.close()
+        handler.close()
+
+        self.assertIsNone(handler.listener)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(target.closed)
+
+
+class QueuedHandlerTests(unittest.TestCase):
+
+    def test_level(self):
+        handler = queued_handler(ListHandler(logging.ERROR),
+                                 ListHandler(logging.INFO))
+        self.addCleanup(handler.close)
+
+        self.assertEqual(handler.level, logging.INFO)
+
+    def test_level_notset(self):
+        handler = queued_handler(ListHandler(logging.ERROR), ListHandler())
+        self.addCleanup(handler.close)
+
+        self.assertEqual(handler.level, logging.NOTSET)
@@ -0,0 +1,145 @@
+import io
+import logging
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from nsl.logging.__main__ import read_ring_main
+from nsl.logging._ring import RingBufferHandler, read_ring
+from . import make_record
+
+
+class RingBufferHandlerTests(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        self.filename = os.path.join(tmpdir.name, 'spam.ring')
+
+    def handler(self, size=4096, **kwargs):
+        handler = RingBufferHandler(self.filename, size, **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    def messages(self):
+        return [r if isinstance(r, str) else r.getMessage()
+                for r in read_ring(self.filename)]
+
+    def test_binary(self):
+        handler = self.handler()
+        handler.handle(make_record('a', logging.DEBUG))
+        handler.handle(make_record('b', logging.ERROR))
+        records = list(read_ring(self.filename))
+
+        self.assertEqual([r.getMessage() for r in records], ['a', 'b'])
+        self.assertEqual([r.levelname for r in records], ['DEBUG', 'ERROR'])
+        self.assertEqual(os.path.getsize(self.filename), 64 + 4096)
+
+    def test_text(self):
+        handler = self.handler(binary=False)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        handler.handle(make_record('a', logging.DEBUG))
+
+        self.assertEqual(list(read_ring(self.filename)), ['DEBUG a'])
+
+    def test_level(self):
+        default = self.handler()
+        handler = RingBufferHandler(self.filename + '2', 100, logging.INFO)
+        self.addCleanup(handler.close)
+
+        self.assertEqual(default.level, logging.DEBUG)
+        self.assertEqual(handler.level, logging.INFO)
+
+    def test_wraps(self):
+        handler = self.handler(size=100, binary=False)
+        for i in range(100):
+            handler.handle(make_record('{:02}'.format(i) * 5))
+        messages = self.messages()
+
+        # Each record takes 14 bytes, so 7 fit.
+        self.assertEqual(messages, ['{:02}'.format(i) * 5
+                                    for i in range(93, 100)])
+
+    def test_wraps_binary(self):
+        handler = self.handler(size=2000)
+        for i in range(100):
+            handler.handle(make_record(str(i)))
+        messages = self.messages()
+
+        self.assertEqual(messages,
+                         [str(i) for i in range(100)][-len(messages):])
+        self.assertGreater(len(messages), 5)
+
+    def test_too_big(self):
+        handler = self.handler(size=20, binary=False)
+        handler.handle(make_record('x' * 17))
+        handler.handle(make_record('a'))
+
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(self.messages(), ['a'])
+
+    def test_reopen(self):
+        handler = self.handler(size=100, binary=False)
+        handler.handle(make_record('a'))
+        handler.close()
+        handler = self.handler(size=100, binary=False)
+        handler.handle(make_record('b'))
+
+        self.assertEqual(self.messages(), ['a', 'b'])
+
+    def test_reopen_different(self):
+        handler = self.handler(size=100, binary=False)
+        handler.handle(make_record('a'))
+        handler.close()
+        handler = self.handler(size=200, binary=False)
+        handler.handle(make_record('b'))
+
+        self.assertEqual(self.messages(), ['b'])
+
+    def test_unfinished_record(self):
+        handler = self.handler(binary=False)
+        handler.handle(make_record('a'))
+        # Simulate a crash in the middle of writing a record.
+        handler._put(handler._head, b'\x05\x00\x00\x00ab')
+        handler.close()
+
+        self.assertEqual(self.messages(), ['a'])
+
+    def test_not_a_ring(self):
+        with open(self.filename, 'wb') as outfile:
+            outfile.write(b'spam' * 100)
+
+        with self.assertRaises(ValueError):
+            list(read_ring(self.filename))
+
+    def test_survives_crash(self):
+        script = ('import logging, os\n'
+                  'from nsl.logging import RingBufferHandler\n'
+                  'handler = RingBufferHandler({!r}, 4096)\n'
+                  'handler.handle(logging.makeLogRecord('
+                  '{{"msg": "before crash", "levelno": 10}}))\n'
+                  'os._exit(1)\n').format(self.filename)
+        subprocess.run([sys.executable, '-c', script], check=False,
+                       cwd=os.path.dirname(os.path.dirname(
+                           os.path.dirname(os.path.abspath(__file__)))))
+
+        self.assertEqual(self.messages(), ['before crash'])
+
+
+class ReadRingMainTests(unittest.TestCase):
+
+    def test_read_ring(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        filename = os.path.join(tmpdir.name, 'spam.ring')
+        handler = RingBufferHandler(filename, 4096)
+        handler.handle(make_record('a', logging.DEBUG))
+        handler.close()
+        stdout = io.StringIO()
+        read_ring_main(filename, '{levelname} {name}: {message}', '{',
+                       _stdout=stdout)
+
+        self.assertEqual(stdout.getvalue(), 'DEBUG spam: a\n')
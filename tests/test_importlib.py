@@ -1,11 +1,21 @@
+import builtins
 import contextlib
 import importlib
+import importlib.machinery
+import os
 import os.path
+import py_compile
 import sys
 import tempfile
+import threading
+import types
 import unittest
+import unittest.mock
 
-from nsl.importlib import copy_module, load_from_source
+from nsl.importlib import (
+        copy_module, load_from_source, CodeCache, load_many,
+        lazy_load_from_source, materialize,
+        )
 
 
 # XXX Move helpers to nsl.testing and nsl.workspace?
@@ -75,3 +85,457 @@ class OneOffImportTests(unittest.TestCase):
         self.assertIs(sys.modules['load_from_source_test'], orig)
         self.assertEqual(orig.x, 1)
         self.assertEqual(loaded.x, 2)
+
+    def test_load_from_source_cached(self):
+        orig = create_temp_module(self, 'load_from_source_test', 'x = []')
+        loaded1 = load_from_source('load_from_source_test', orig.__file__)
+        loaded2 = load_from_source('load_from_source_test', orig.__file__)
+        loaded1.x.append(1)
+
+        self.assertIsNot(loaded1, loaded2)
+        self.assertEqual(loaded2.x, [])
+        self.assertEqual(loaded2.__spec__, orig.__spec__)
+
+    def test_load_from_source_uncached(self):
+        orig = create_temp_module(self, 'load_from_source_test', 'x = 1')
+        loaded = load_from_source('load_from_source_test', orig.__file__,
+                                  cache=False)
+
+        self.assertEqual(loaded.x, 1)
+
+    def test_load_from_source_sourceless(self):
+        source = _create_module_file(self, 'sourceless_test.py', 'x = 1')
+        filename = source + 'c'
+        py_compile.compile(source, filename, doraise=True)
+        os.unlink(source)
+        cache = CodeCache()
+        loaded = load_from_source('sourceless_test', filename, cache=cache)
+
+        self.assertEqual(loaded.x, 1)
+        self.assertIsInstance(loaded.__spec__.loader,
+                              importlib.machinery.SourcelessFileLoader)
+        self.assertEqual(len(cache._entries), 0)
+        self.assertEqual(load_from_source('sourceless_test', filename).x, 1)
+
+    def test_copy_module_cached(self):
+        orig = create_temp_module(self, 'copy_module_test', 'x = 1')
+        cache = CodeCache()
+        copied1 = copy_module(orig, cache=cache)
+        copied2 = copy_module(orig, cache=cache)
+
+        self.assertIsNot(copied1, copied2)
+        self.assertEqual(copied2.x, 1)
+        self.assertEqual(len(cache._entries), 1)
+
+    def test_copy_module_lazy(self):
+        orig = create_temp_module(self, 'copy_module_test', 'x = 1')
+        copied = copy_module(orig, lazy=True)
+
+        self.assertIsNot(type(copied), types.ModuleType)
+        self.assertEqual(copied.x, 1)
+        self.assertIs(type(copied), types.ModuleType)
+        self.assertIsNot(copied, orig)
+
+
+class CloneModuleTests(unittest.TestCase):
+
+    SOURCE = """if True:
+        import os
+        items = []
+        config = {'name': 'spam'}
+        def add(item):
+            items.append(item)
+            return len(items)
+        def get_items():
+            return items
+        """
+
+    def setUp(self):
+        self.orig = create_temp_module(self, 'clone_module_test',
+                                       self.SOURCE)
+
+    def test_clone_code(self):
+        cache = CodeCache()
+        clone = copy_module(self.orig, clone='code', cache=cache)
+        copy_module(self.orig, clone='code', cache=cache)
+        clone.add(1)
+
+        self.assertIsNot(clone, self.orig)
+        self.assertEqual(clone.items, [1])
+        self.assertEqual(self.orig.items, [])
+        self.assertEqual(clone.__spec__, self.orig.__spec__)
+        self.assertIs(sys.modules['clone_module_test'], self.orig)
+        self.assertEqual(len(cache._entries), 1)
+
+    def test_clone_code_frozen(self):
+        orig = importlib.import_module('zipimport')
+        clone = copy_module('zipimport', clone='code', cache=False)
+
+        self.assertIsNot(clone, orig)
+        self.assertIsNot(clone.zipimporter, orig.zipimporter)
+        self.assertEqual(clone.__spec__.origin, 'frozen')
+
+    def test_clone_code_builtin(self):
+        with self.assertRaises(ValueError):
+            copy_module('sys', clone='code')
+
+    def test_clone_namespace(self):
+        clone = copy_module(self.orig, clone='namespace')
+
+        self.assertIsNot(clone, self.orig)
+        self.assertEqual(clone.__name__, 'clone_module_test')
+        self.assertIs(clone.__spec__, self.orig.__spec__)
+        self.assertIs(clone.os, os)
+        self.assertIs(clone.items, self.orig.items)
+        self.assertIsNot(clone.add, self.orig.add)
+        self.assertIs(clone.add.__globals__, vars(clone))
+
+        clone.items = []
+        clone.add(1)
+        self.assertEqual(clone.get_items(), [1])
+        self.assertEqual(self.orig.get_items(), [])
+
+    def test_clone_namespace_deep(self):
+        clone = copy_module(self.orig, clone='namespace', deep=['items'])
+        clone.add(1)
+
+        self.assertEqual(clone.items, [1])
+        self.assertEqual(self.orig.items, [])
+        self.assertIs(clone.config, self.orig.config)
+
+    def test_clone_namespace_deep_all(self):
+        clone = copy_module(self.orig, clone='namespace', deep=True)
+
+        self.assertIsNot(clone.items, self.orig.items)
+        self.assertEqual(clone.config, self.orig.config)
+        self.assertIsNot(clone.config, self.orig.config)
+        self.assertIs(clone.os, os)
+
+    def test_clone_namespace_builtin(self):
+        clone = copy_module('math', clone='namespace')
+
+        self.assertIsNot(clone, sys.modules['math'])
+        self.assertEqual(clone.pi, sys.modules['math'].pi)
+
+    def test_clone_invalid(self):
+        with self.assertRaises(ValueError):
+            copy_module(self.orig, clone='spam')
+        with self.assertRaises(ValueError):
+            copy_module(self.orig, clone='code', lazy=True)
+
+
+class LazyLoadTests(unittest.TestCase):
+
+    SOURCE = """if True:
+        import builtins
+        builtins.lazy_load_count = getattr(builtins, 'lazy_load_count', 0) + 1
+        x = 1
+        def f():
+            return x
+        """
+
+    def setUp(self):
+        self.filename = _create_module_file(self, 'spam.py', self.SOURCE)
+        builtins.lazy_load_count = 0
+        self.addCleanup(delattr, builtins, 'lazy_load_count')
+
+    def loads(self):
+        return builtins.lazy_load_count
+
+    def test_deferred(self):
+        module = lazy_load_from_source('spam', self.filename)
+
+        self.assertEqual(self.loads(), 0)
+        self.assertEqual(module.f(), 1)
+        self.assertEqual(self.loads(), 1)
+        self.assertEqual(module.x, 1)
+        self.assertEqual(self.loads(), 1)
+        self.assertIs(type(module), types.ModuleType)
+        self.assertEqual(module.__name__, 'spam')
+        self.assertNotIn('spam', sys.modules)
+
+    def test_materialize(self):
+        module = lazy_load_from_source('spam', self.filename)
+        result = materialize(module)
+        materialize(module)
+
+        self.assertIs(result, module)
+        self.assertIs(type(module), types.ModuleType)
+        self.assertEqual(self.loads(), 1)
+        self.assertIs(materialize(sys), sys)
+
+    def test_set_before_load(self):
+        module = lazy_load_from_source('spam', self.filename)
+        module.y = 2
+        module.x = 3
+
+        self.assertEqual(self.loads(), 0)
+        self.assertEqual(module.y, 2)
+        self.assertEqual(module.x, 3)
+
+    def test_delattr(self):
+        module = lazy_load_from_source('spam', self.filename)
+        del module.x
+
+        self.assertFalse(hasattr(module, 'x'))
+        with self.assertRaises(AttributeError):
+            del lazy_load_from_source('spam', self.filename).spam
+
+    def test_cache(self):
+        cache = CodeCache()
+        module = lazy_load_from_source('spam', self.filename, cache=cache)
+
+        self.assertEqual(len(cache._entries), 0)
+        materialize(module)
+        self.assertEqual(list(cache._entries), [self.filename])
+
+    def test_uncached(self):
+        module = lazy_load_from_source('spam', self.filename, cache=False)
+
+        self.assertEqual(module.x, 1)
+
+    def test_threads(self):
+        with open(self.filename, 'a') as outfile:
+            outfile.write('import time\ntime.sleep(0.05)\ny = 2\n')
+        module = lazy_load_from_source('spam', self.filename)
+        results = []
+        barrier = threading.Barrier(5)
+
+        def task():
+            barrier.wait()
+            results.append(module.y)
+        threads = [threading.Thread(target=task) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [2] * 5)
+        self.assertEqual(self.loads(), 1)
+
+    def test_error(self):
+        with open(self.filename, 'a') as outfile:
+            outfile.write('1/0\n')
+        module = lazy_load_from_source('spam', self.filename)
+
+        with self.assertRaises(ZeroDivisionError):
+            module.x
+        self.assertEqual(module.x, 1)
+
+
+class CodeCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = _create_module_file(self, 'spam.py', 'x = 1\n')
+
+    def write(self, source, *, keep_mtime=False):
+        st = os.stat(self.filename)
+        with open(self.filename, 'w') as outfile:
+            outfile.write(source)
+        if keep_mtime:
+            os.utime(self.filename, ns=(st.st_atime_ns, st.st_mtime_ns))
+        else:
+            os.utime(self.filename, ns=(st.st_atime_ns,
+                                        st.st_mtime_ns + 10**9))
+
+    def no_compile(self):
+        return unittest.mock.patch.object(
+                importlib.machinery.SourceFileLoader, 'source_to_code',
+                side_effect=AssertionError('compiled'))
+
+    def test_cached(self):
+        cache = CodeCache()
+        code1 = cache.get_code(self.filename)
+        with self.no_compile():
+            code2 = cache.get_code(self.filename)
+
+        self.assertIs(code2, code1)
+        self.assertEqual(code1.co_filename, self.filename)
+
+    def test_changed(self):
+        cache = CodeCache()
+        code1 = cache.get_code(self.filename)
+        self.write('x = 2\n')
+        code2 = cache.get_code(self.filename)
+        ns = {}
+        exec(code2, ns)
+
+        self.assertIsNot(code2, code1)
+        self.assertEqual(ns['x'], 2)
+
+    def test_touched(self):
+        cache = CodeCache()
+        code1 = cache.get_code(self.filename)
+        self.write('x = 1\n')
+        with self.no_compile():
+            code2 = cache.get_code(self.filename)
+
+        self.assertIs(code2, code1)
+
+    def test_maxsize(self):
+        other = _create_module_file(self, 'eggs.py', 'y = 1\n')
+        cache = CodeCache(1)
+        cache.get_code(self.filename)
+        cache.get_code(other)
+
+        self.assertEqual(list(cache._entries), [other])
+
+    def test_clear(self):
+        cache = CodeCache()
+        cache.get_code(self.filename)
+        cache.clear()
+
+        self.assertEqual(len(cache._entries), 0)
+
+    def test_cache_dir(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_importlib_')
+        self.addCleanup(tmpdir.cleanup)
+        code1 = CodeCache(cache_dir=tmpdir.name).get_code(self.filename)
+        cached = os.listdir(tmpdir.name)
+        with self.no_compile():
+            code2 = CodeCache(cache_dir=tmpdir.name).get_code(self.filename)
+
+        self.assertEqual(len(cached), 1)
+        self.assertTrue(cached[0].startswith('spam.'))
+        self.assertEqual(code2, code1)
+
+    def test_cache_dir_stale(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_importlib_')
+        self.addCleanup(tmpdir.cleanup)
+        CodeCache(cache_dir=tmpdir.name).get_code(self.filename)
+        self.write('x = 3\n')
+        code = CodeCache(cache_dir=tmpdir.name).get_code(self.filename)
+        ns = {}
+        exec(code, ns)
+
+        self.assertEqual(ns['x'], 3)
+
+
+class LoadManyTests(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_importlib_')
+        self.addCleanup(tmpdir.cleanup)
+        self.dirname = tmpdir.name
+
+    def module(self, name, source):
+        filename = os.path.join(self.dirname, name + '.py')
+        with open(filename, 'w') as outfile:
+            outfile.write(source)
+        return name, filename
+
+    def register_cleanup(self, *names):
+        def cleanup():
+            for name in names:
+                sys.modules.pop(name, None)
+        self.addCleanup(cleanup)
+
+    def test_loaded(self):
+        specs = dict([
+            self.module('load_many_a', 'x = 1\n'),
+            self.module('load_many_b', 'x = 2\n'),
+            ])
+        results = load_many(specs)
+
+        self.assertEqual([r.name for r in results],
+                         ['load_many_a', 'load_many_b'])
+        self.assertEqual([r.module.x for r in results], [1, 2])
+        self.assertEqual([r.error for r in results], [None, None])
+        self.assertEqual(results[0].filename, specs['load_many_a'])
+        self.assertNotIn('load_many_a', sys.modules)
+        for result in results:
+            self.assertGreaterEqual(result.compile_time, 0)
+            self.assertGreaterEqual(result.exec_time, 0)
+
+    def test_dependency_order(self):
+        specs = [
+            self.module('load_many_c', 'import load_many_b\n'
+                                       'x = load_many_b.x + 1\n'),
+            self.module('load_many_b', 'from load_many_a import x\n'
+                                       'x += 1\n'),
+            self.module('load_many_a', 'x = 1\n'),
+            ]
+        self.register_cleanup('load_many_a', 'load_many_b', 'load_many_c')
+        results = load_many(specs, register=True)
+
+        self.assertEqual([r.name for r in results],
+                         ['load_many_a', 'load_many_b', 'load_many_c'])
+        self.assertEqual(results[2].module.x, 3)
+        self.assertIs(sys.modules['load_many_c'], results[2].module)
+
+    def test_cycle(self):
+        specs = [
+            self.module('load_many_a', 'import load_many_b\n'),
+            self.module('load_many_b', 'try:\n'
+                                       '    import load_many_a\n'
+                                       'except ImportError:\n'
+                                       '    pass\n'),
+            ]
+        self.register_cleanup('load_many_a', 'load_many_b')
+        results = load_many(specs, register=True)
+
+        self.assertEqual([r.name for r in results],
+                         ['load_many_b', 'load_many_a'])
+        self.assertEqual([r.error for r in results], [None, None])
+
+    def test_errors(self):
+        specs = [
+            self.module('load_many_bad', '1/0\n'),
+            self.module('load_many_syntax', 'def (\n'),
+            self.module('load_many_dep', 'import load_many_bad\n'),
+            self.module('load_many_ok', 'x = 1\n'),
+            ('load_many_missing', os.path.join(self.dirname, 'missing.py')),
+            ]
+        self.register_cleanup('load_many_bad', 'load_many_ok')
+        results = {r.name: r for r in load_many(specs, register=True)}
+
+        self.assertIsInstance(results['load_many_bad'].error,
+                              ZeroDivisionError)
+        self.assertIsInstance(results['load_many_syntax'].error, SyntaxError)
+        self.assertIsInstance(results['load_many_dep'].error, ImportError)
+        self.assertIsInstance(results['load_many_missing'].error, OSError)
+        self.assertEqual(results['load_many_ok'].module.x, 1)
+        for name in ('bad', 'syntax', 'dep', 'missing'):
+            self.assertIsNone(results['load_many_' + name].module)
+        self.assertNotIn('load_many_bad', sys.modules)
+
+    def test_relative_import(self):
+        os.mkdir(os.path.join(self.dirname, 'load_many_pkg'))
+        specs = [
+            self.module('load_many_pkg/spam', 'from . import eggs\n'),
+            self.module('load_many_pkg/eggs', ''),
+            ]
+        specs = [('load_many_pkg.' + os.path.basename(name), filename)
+                 for name, filename in specs]
+        results = load_many(specs)
+
+        self.assertEqual([r.name for r in results],
+                         ['load_many_pkg.eggs', 'load_many_pkg.spam'])
+
+    def test_duplicate_name(self):
+        spec = self.module('load_many_a', 'x = 1\n')
+
+        with self.assertRaises(ValueError):
+            load_many([spec, spec])
+
+    def test_cache(self):
+        specs = [self.module('load_many_a', 'x = 1\n')]
+        cache = CodeCache()
+        load_many(specs, cache=cache)
+
+        self.assertEqual(list(cache._entries), [specs[0][1]])
+
+    def test_processes(self):
+        specs = [
+            self.module('load_many_b', 'import load_many_a\n'),
+            self.module('load_many_a', 'x = 1\n'),
+            self.module('load_many_syntax', 'def (\n'),
+            ]
+        cache = CodeCache()
+        results = load_many(specs, cache=cache, processes=True, workers=2)
+
+        self.assertEqual([r.name for r in results],
+                         ['load_many_a', 'load_many_b', 'load_many_syntax'])
+        self.assertEqual(results[0].module.x, 1)
+        self.assertIsInstance(results[2].error, SyntaxError)
+        self.assertEqual(len(cache._entries), 2)
@@ -2,7 +2,7 @@ import types
 import unittest
 
 import nsl.importlib
-from nsl.inspect import get_caller_module
+from nsl.inspect import get_caller_module, find_caller_module
 
 
 class StubFrame:
@@ -61,3 +61,90 @@ class GetCallerModuleTests(unittest.TestCase):
         module = get_caller_module(called, external=False)
 
         self.assertIsNone(module)
+
+
+def _module_caller(name):
+    # Return a function, living in the named module, that calls func().
+    ns = {'__name__': name}
+    exec('def call(func, *args, **kwargs):\n'
+         '    return func(*args, **kwargs)\n', ns)
+    return ns['call']
+
+
+def _call_in_module(name, func, *args, **kwargs):
+    return _module_caller(name)(func, *args, **kwargs)
+
+
+class FindCallerModuleTests(unittest.TestCase):
+
+    def test_defaults(self):
+        def called():
+            return find_caller_module()
+        module = _call_in_module('spam', called)
+
+        self.assertEqual(module, 'spam')
+
+    def test_depth(self):
+        def called(depth):
+            return find_caller_module(depth)
+        module0 = _call_in_module('spam', called, 0)
+        module1 = _call_in_module('spam', called, 1)
+        module2 = _call_in_module('spam', called, 2)
+
+        self.assertEqual(module0, __name__)
+        self.assertEqual(module1, 'spam')
+        self.assertEqual(module2, __name__)
+
+    def test_too_deep(self):
+        module = find_caller_module(10000)
+
+        self.assertIsNone(module)
+
+    def test_skip_modules(self):
+        def called():
+            return find_caller_module(skip_modules={'spam', 'eggs'})
+        call_ham = _module_caller('ham')
+        call_eggs = _module_caller('eggs')
+        call_spam = _module_caller('spam')
+        module = call_ham(call_eggs, call_spam, called)
+
+        self.assertEqual(module, 'ham')
+
+    def test_skip_all_modules(self):
+        def called():
+            # This test's module is skipped, as is everything above it.
+            return find_caller_module(0, skip_modules=AllModules())
+        module = called()
+
+        self.assertIsNone(module)
+
+    def test_fallback(self):
+        copied = nsl.importlib.copy_module('nsl.inspect')
+        copied._getframe = copied._getframe_fallback
+
+        def called(depth, **kwargs):
+            return copied.find_caller_module(depth, **kwargs)
+        module0 = _call_in_module('spam', called, 0)
+        module1 = _call_in_module('spam', called, 1)
+        module2 = _call_in_module('spam', called, 1, skip_modules={'spam'})
+        module3 = called(10000)
+
+        self.assertEqual(module0, __name__)
+        self.assertEqual(module1, 'spam')
+        self.assertEqual(module2, __name__)
+        self.assertIsNone(module3)
+
+    def test_frames_not_supported(self):
+        copied = nsl.importlib.copy_module('nsl.inspect')
+        copied.inspect = types.SimpleNamespace(currentframe=lambda: None)
+        copied._getframe = copied._getframe_fallback
+
+        module = copied.find_caller_module()
+
+        self.assertIsNone(module)
+
+
+class AllModules:
+
+    def __contains__(self, name):
+        return True
@@ -1,12 +1,20 @@
+import io
 import logging
+from logging import StrFormatStyle
 import os.path
 import sys
+import tempfile
 import types
 import unittest
 
 import nsl.importlib
 from nsl.logging import (
         level_from_verbosity, basic_handler,
+        CompiledFormatter, JSONFormatter, LoggerProxy, LazyAdapter,
+        RateLimitFilter, SamplingFilter,
+        BufferedFileHandler, RotatingFileHandler, QueueingHandler,
+        PerThreadHandler, AsyncioHandler, RingBufferHandler, read_ring,
+        metrics_snapshot,
         # loaded dynamically below to avoid races:
         #get_logger, ensure_logger,
         )
@@ -103,6 +111,58 @@ class GetLoggerTests(unittest.TestCase):
         self.assertEqual(vars(logger), orig_ns)
 
 
+class GetProxyTests(unittest.TestCase):
+
+    def test_defaults(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(
+                logging, get_caller_module=lambda: 'spam')
+        proxy = nsl_logging.get_proxy()
+
+        self.assertIsInstance(proxy, LoggerProxy)
+        self.assertIs(proxy.logger, orig)
+
+    def test_str(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        proxy = nsl_logging.get_proxy('spam')
+
+        self.assertIs(proxy.logger, orig)
+
+    def test_logger(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        proxy = nsl_logging.get_proxy(orig)
+
+        self.assertIs(proxy.logger, orig)
+
+
+class GetLazyLoggerTests(unittest.TestCase):
+
+    def test_defaults(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(
+                logging, get_caller_module=lambda: 'spam')
+        adapter = nsl_logging.get_lazy_logger()
+
+        self.assertIsInstance(adapter, LazyAdapter)
+        self.assertIs(adapter.logger, orig)
+        self.assertIsNone(adapter.extra)
+
+    def test_str(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        adapter = nsl_logging.get_lazy_logger('spam', {'user': 'eggs'})
+
+        self.assertIs(adapter.logger, orig)
+        self.assertEqual(adapter.extra, {'user': 'eggs'})
+
+
 class BasicHandlerTests(unittest.TestCase):
 
     def test_defaults(self):
@@ -141,13 +201,139 @@ class BasicHandlerTests(unittest.TestCase):
 
         self.assertEqual(handler.level, 100)
 
+    def test_with_formatter(self):
+        handler = basic_handler(fmt='{message}', style='{',
+                                formatter=logging.Formatter)
+
+        self.assertIs(type(handler.formatter), logging.Formatter)
+
     def test_with_fmt(self):
         handler = basic_handler(fmt='{message}', datefmt='%y-%m-%d', style='{')
 
+        self.assertIsInstance(handler.formatter, CompiledFormatter)
         self.assertIsInstance(handler.formatter._style, logging.StrFormatStyle)
         self.assertEqual(handler.formatter._fmt, '{message}')
         self.assertEqual(handler.formatter.datefmt, '%y-%m-%d')
 
+    def test_structured(self):
+        handler = basic_handler(structured=True)
+
+        self.assertIs(type(handler.formatter), JSONFormatter)
+
+    def test_structured_with_kwargs(self):
+        handler = basic_handler(structured={'extra': False})
+
+        self.assertIs(type(handler.formatter), JSONFormatter)
+        self.assertFalse(handler.formatter.extra)
+
+    def test_structured_with_fmt(self):
+        with self.assertRaises(TypeError):
+            basic_handler(structured=True, fmt='{message}', style='{')
+
+    def test_buffered(self):
+        handler = basic_handler('spam', buffered=True)
+
+        self.assertIs(type(handler), BufferedFileHandler)
+        self.assertEqual(handler.baseFilename, os.path.abspath('spam'))
+        self.assertIsNone(handler.stream)
+
+    def test_buffered_with_kwargs(self):
+        handler = basic_handler('spam', buffered={'capacity': 10})
+
+        self.assertIs(type(handler), BufferedFileHandler)
+        self.assertEqual(handler.capacity, 10)
+
+    def test_buffered_without_filename(self):
+        with self.assertRaises(ValueError):
+            basic_handler(buffered=True)
+
+    def test_rotate(self):
+        handler = basic_handler('spam', rotate=True)
+
+        self.assertIs(type(handler), RotatingFileHandler)
+        self.assertEqual(handler.baseFilename, os.path.abspath('spam'))
+        self.assertIsNone(handler.stream)
+
+    def test_rotate_with_kwargs(self):
+        handler = basic_handler('spam', rotate={'maxbytes': 10,
+                                                'compress': None})
+
+        self.assertIs(type(handler), RotatingFileHandler)
+        self.assertEqual(handler.maxbytes, 10)
+        self.assertIsNone(handler.compress)
+
+    def test_rotate_without_filename(self):
+        with self.assertRaises(ValueError):
+            basic_handler(rotate=True)
+
+    def test_rotate_with_buffered(self):
+        with self.assertRaises(TypeError):
+            basic_handler('spam', rotate=True, buffered=True)
+
+    def test_queued(self):
+        stream = io.StringIO()
+        handler = basic_handler(stream, queued=True, fmt='{message}',
+                                style='{')
+        self.addCleanup(handler.close)
+        wrapped, = handler.handlers
+
+        self.assertIsInstance(handler, QueueingHandler)
+        self.assertIs(type(wrapped), logging.StreamHandler)
+        self.assertIs(wrapped.stream, stream)
+        self.assertEqual(handler.level, logging.INFO)
+        self.assertEqual(wrapped.level, logging.INFO)
+        self.assertIsNone(handler.formatter)
+        self.assertEqual(wrapped.formatter._fmt, '{message}')
+
+    def test_instrumented(self):
+        stream = io.StringIO()
+        handler = basic_handler(stream, instrumented={'name': 'spam'})
+        handler.handle(logging.makeLogRecord(
+                {'msg': 'eggs', 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+        self.assertEqual(metrics_snapshot()['spam']['records'],
+                         {'INFO': 1})
+
+    def test_not_instrumented(self):
+        handler = basic_handler()
+
+        self.assertNotIn('handle', vars(handler))
+
+    def test_per_thread(self):
+        stream = io.StringIO()
+        handler = basic_handler(stream, per_thread={'ordered': True},
+                                fmt='{message}', style='{')
+        self.addCleanup(handler.close)
+        wrapped, = handler.handlers
+
+        self.assertIsInstance(handler, PerThreadHandler)
+        self.assertTrue(handler.ordered)
+        self.assertIs(wrapped.stream, stream)
+        self.assertEqual(handler.level, logging.INFO)
+
+    def test_per_thread_with_queued(self):
+        with self.assertRaises(TypeError):
+            basic_handler(queued=True, per_thread=True)
+
+    def test_asynchronous(self):
+        handler = basic_handler(asynchronous={'maxsize': 5})
+
+        self.assertIs(type(handler), AsyncioHandler)
+        self.assertIs(handler.stream, sys.stdout)
+        self.assertEqual(handler.maxsize, 5)
+
+    def test_asynchronous_with_filename(self):
+        with self.assertRaises(ValueError):
+            basic_handler('spam', asynchronous=True)
+
+    def test_queued_with_kwargs(self):
+        handler = basic_handler(queued={'maxsize': 5, 'block': True})
+        self.addCleanup(handler.close)
+
+        self.assertIsInstance(handler, QueueingHandler)
+        self.assertEqual(handler.queue.maxsize, 5)
+        self.assertTrue(handler.block)
+
 
 class EnsureLoggerTests(unittest.TestCase):
 
@@ -257,7 +443,8 @@ class EnsureLoggerTests(unittest.TestCase):
                 fmt='{message}', datefmt='%y-%m-%d', style='{')
         formatter = logger.handlers[0].formatter
 
-        self.assertIsInstance(formatter._style, logging.StrFormatStyle)
+        self.assertIsInstance(formatter, CompiledFormatter)
+        self.assertIsInstance(formatter._style, StrFormatStyle)
         self.assertEqual(formatter._fmt, '{message}')
         self.assertEqual(formatter.datefmt, '%y-%m-%d')
 
@@ -270,6 +457,194 @@ class EnsureLoggerTests(unittest.TestCase):
                 orig, logging.ERROR, handler,
                 fmt='{message}', datefmt='%y-%m-%d', style='{')
 
-        self.assertIsInstance(handler.formatter._style, logging.StrFormatStyle)
+        self.assertIsInstance(handler.formatter, CompiledFormatter)
+        self.assertIsInstance(handler.formatter._style, StrFormatStyle)
         self.assertEqual(handler.formatter._fmt, '{message}')
         self.assertEqual(handler.formatter.datefmt, '%y-%m-%d')
+
+    def test_queued_without_handlers(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        logger = nsl_logging.ensure_logger(
+                orig, logging.ERROR, queued=True, fmt='{message}', style='{')
+        handler, = logger.handlers
+        self.addCleanup(handler.close)
+        wrapped, = handler.handlers
+
+        self.assertIsInstance(handler, QueueingHandler)
+        self.assertIsInstance(wrapped, logging.StreamHandler)
+        self.assertIsNone(handler.formatter)
+        self.assertEqual(wrapped.formatter._fmt, '{message}')
+
+    def test_queued_with_handlers(self):
+        handler1 = basic_handler()
+        handler2 = basic_handler()
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        logger = nsl_logging.ensure_logger(
+                orig, logging.INFO, handler1, handler2,
+                queued={'maxsize': 5}, fmt='{message}', style='{')
+        handler, = logger.handlers
+        self.addCleanup(handler.close)
+
+        self.assertIsInstance(handler, QueueingHandler)
+        self.assertEqual(handler.handlers, (handler1, handler2))
+        self.assertEqual(handler.queue.maxsize, 5)
+        self.assertEqual(handler1.formatter._fmt, '{message}')
+
+    def test_structured_without_handlers(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        logger = nsl_logging.ensure_logger(orig, structured=True)
+
+        self.assertIs(type(logger.handlers[0].formatter), JSONFormatter)
+
+    def test_structured_with_handlers(self):
+        handler1 = basic_handler()
+        handler2 = basic_handler(fmt='{message}', style='{')
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO, handler1, handler2,
+                                  structured={'fields': {'msg': 'message'}})
+
+        self.assertIs(type(handler1.formatter), JSONFormatter)
+        self.assertEqual(handler1.formatter.fields, {'msg': 'message'})
+        self.assertIs(type(handler2.formatter), CompiledFormatter)
+
+    def test_structured_with_fmt(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        orig_ns = dict(vars(orig))
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        with self.assertRaises(TypeError):
+            nsl_logging.ensure_logger(orig, structured=True, fmt='{message}')
+
+        self.assertEqual(vars(orig), orig_ns)
+
+    def test_filters(self):
+        handler1 = basic_handler()
+        handler2 = basic_handler()
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO, handler1, handler2,
+                                  rate_limit={'rate': 5},
+                                  sample={logging.DEBUG: 0.1})
+        sample, rate_limit = orig.filters
+
+        self.assertIsInstance(sample, SamplingFilter)
+        self.assertEqual(sample.rates, {logging.DEBUG: 0.1})
+        self.assertIsInstance(rate_limit, RateLimitFilter)
+        self.assertEqual(rate_limit.rate, 5)
+        self.assertEqual(handler1.filters, [])
+        self.assertEqual(handler2.filters, [])
+
+    def test_filters_multiple_handlers(self):
+        stream1 = io.StringIO()
+        stream2 = io.StringIO()
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO,
+                                  logging.StreamHandler(stream1),
+                                  logging.StreamHandler(stream2),
+                                  rate_limit={'rate': 0.001, 'burst': 4},
+                                  sample={logging.INFO: 0.5})
+        for _ in range(40):
+            orig.info('spam')
+
+        self.assertEqual(stream1.getvalue(), 'spam\n' * 4)
+        self.assertEqual(stream2.getvalue(), stream1.getvalue())
+
+    def test_filters_queued(self):
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, queued=True, rate_limit=True)
+        handler, = orig.handlers
+        self.addCleanup(handler.close)
+        wrapped, = handler.handlers
+
+        self.assertIsInstance(orig.filters[0], RateLimitFilter)
+        self.assertEqual(handler.filters, [])
+        self.assertEqual(wrapped.filters, [])
+
+    def test_instrumented(self):
+        handler1 = basic_handler()
+        handler2 = basic_handler()
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO, handler1, handler2,
+                                  instrumented=True)
+        snapshot = metrics_snapshot()
+
+        self.assertIn('spam:0', snapshot)
+        self.assertIn('spam:1', snapshot)
+        self.assertIn('handle', vars(handler1))
+
+    def test_per_thread_with_handlers(self):
+        handler1 = basic_handler()
+        handler2 = basic_handler()
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO, handler1, handler2,
+                                  per_thread=True)
+        handler, = orig.handlers
+        self.addCleanup(handler.close)
+
+        self.assertIsInstance(handler, PerThreadHandler)
+        self.assertEqual(handler.handlers, (handler1, handler2))
+
+    def test_ring(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        filename = os.path.join(tmpdir.name, 'spam.ring')
+        stream = io.StringIO()
+        logging = nsl.importlib.copy_module('logging')
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO,
+                                  logging.StreamHandler(stream),
+                                  ring=filename)
+        handler, ring, _ = orig.handlers
+        self.addCleanup(ring.close)
+        orig.debug('a')
+        orig.info('b')
+
+        self.assertIsInstance(ring, RingBufferHandler)
+        self.assertEqual(orig.level, logging.DEBUG)
+        self.assertEqual(handler.level, logging.INFO)
+        self.assertEqual(stream.getvalue(), 'b\n')
+        self.assertEqual([r.getMessage() for r in read_ring(filename)],
+                         ['a', 'b'])
+
+    def test_ring_parent_handlers(self):
+        tmpdir = tempfile.TemporaryDirectory(prefix='test_logging_')
+        self.addCleanup(tmpdir.cleanup)
+        filename = os.path.join(tmpdir.name, 'spam.ring')
+        stream = io.StringIO()
+        rootstream = io.StringIO()
+        logging = nsl.importlib.copy_module('logging')
+        logging.root.addHandler(logging.StreamHandler(rootstream))
+        logging.root.setLevel(logging.WARNING)
+        orig = logging.getLogger('spam')
+        nsl_logging = monkeypatch_nsl_logging(logging)
+        nsl_logging.ensure_logger(orig, logging.INFO,
+                                  logging.StreamHandler(stream),
+                                  ring=filename)
+        self.addCleanup(orig.handlers[1].close)
+        orig.debug('secret debug')
+        orig.info('b')
+        orig.warning('c')
+
+        self.assertFalse(orig.propagate)
+        self.assertEqual(stream.getvalue(), 'b\nc\n')
+        self.assertEqual(rootstream.getvalue(), 'b\nc\n')
+        self.assertEqual([r.getMessage() for r in read_ring(filename)],
+                         ['secret debug', 'b', 'c'])